@@ -1,33 +1,157 @@
-from fastapi import APIRouter, HTTPException, Header
-from database import db
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import base64
+import json
 import os
 
+from db.client_repo import find_clients, revoke_client
+
 router = APIRouter(prefix="/admin/clients")
 
+# Query param -> document field
+_FILTER_FIELDS = {
+    "user_id": "user_id",
+    "status": "status",
+    "platform": "platform",
+    "app_id": "app_id",
+    "app_version": "app_version",
+    "country": "location_last_seen.country_code",
+}
+
+# Fields a caller may ask for with ?fields=; anything else is rejected rather
+# than handed to Mongo as a projection.
+_PROJECTABLE_FIELDS = {
+    "client_id", "user_id", "public_key", "status",
+    "platform", "app_id", "app_name", "app_version",
+    "ip_first_seen", "ip_last_seen", "ip_history", "location_last_seen",
+    "created_at", "last_seen_at", "revoked_at",
+}
+
+# ip_history can be large; only returned when asked for explicitly.
+_DEFAULT_PROJECTION = {"ip_history": 0}
+_EXPORT_BATCH_DOCS = 200
+
 
 def verify_admin(x_admin_key: str):
     if x_admin_key != os.getenv("ADMIN_API_KEY"):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
-@router.get("/")
-async def list_clients(x_admin_key: str = Header(...)):
+def _build_filters(**params) -> dict:
+    filters = {}
+    for param, value in params.items():
+        if value is not None:
+            filters[_FILTER_FIELDS[param]] = value.upper() if param == "country" else value
+    return filters
+
+
+def _build_projection(fields: str) -> dict:
+    if not fields:
+        return dict(_DEFAULT_PROJECTION)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(names) - _PROJECTABLE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # _id (the keyset) is always included.
+    return {name: 1 for name in names}
+
+
+def _encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return ObjectId(json.loads(raw)["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+@router.get(
+    "/",
+    description="Device links, most recently linked first. Pages are keyed on the link's "
+                "immutable _id, so activity while paging never skips or repeats a row."
+)
+async def list_clients(
+    x_admin_key: str = Header(...),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    fields: str = None,
+    user_id: str = None,
+    status: str = None,
+    platform: str = None,
+    app_id: str = None,
+    app_version: str = None,
+    country: str = None
+):
+    verify_admin(x_admin_key)
+
+    filters = _build_filters(
+        user_id=user_id, status=status, platform=platform,
+        app_id=app_id, app_version=app_version, country=country
+    )
+    after = _decode_cursor(cursor) if cursor else None
+
+    items = await find_clients(
+        filters, _build_projection(fields), after=after, limit=limit, batch_size=limit
+    ).to_list(length=limit)
+
+    next_cursor = _encode_cursor(items[-1]) if len(items) == limit else None
+    for item in items:
+        item.pop("_id", None)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+async def export_clients(
+    x_admin_key: str = Header(...),
+    fields: str = None,
+    user_id: str = None,
+    status: str = None,
+    platform: str = None,
+    app_id: str = None,
+    app_version: str = None,
+    country: str = None
+):
+    """NDJSON export of every matching link, written as the cursor yields them."""
     verify_admin(x_admin_key)
 
-    clients = []
-    async for c in db.clients.find({}, {"_id": 0}):
-        clients.append(c)
+    filters = _build_filters(
+        user_id=user_id, status=status, platform=platform,
+        app_id=app_id, app_version=app_version, country=country
+    )
+    cursor = find_clients(filters, _build_projection(fields), batch_size=1000)
+
+    async def ndjson():
+        lines = []
+        async for doc in cursor:
+            doc.pop("_id", None)
+            lines.append(json.dumps(doc, default=_json_default))
+            if len(lines) >= _EXPORT_BATCH_DOCS:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
 
-    return clients
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @router.post("/revoke/{client_id}")
 async def revoke(client_id: str, x_admin_key: str = Header(...)):
     verify_admin(x_admin_key)
 
-    await db.clients.update_many(
-        {"client_id": client_id},
-        {"$set": {"status": "revoked"}}
-    )
+    await revoke_client(client_id)
 
     return {"message": "Client revoked"}
@@ -1,17 +1,21 @@
 from fastapi import APIRouter, HTTPException, Header, Request
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 import os
 import time
 
-from services.auth_services import register_user, verify_registration_otp, login_user, login_google_user, AuthError
+from services.auth_services import verify_registration_otp, login_user, login_google_user, AuthError
+from services.registration_admission import admit_registration, RegistrationThrottled
 from services.password_reset import request_password_reset, reset_password, PasswordResetError
-from services.token_service import refresh_access_token
-from security.client_crypto import derive_client_id, verify_signature
+from services.token_service import refresh_access_token, introspect_tokens
+from security.client_crypto import client_id_for_public_key, verify_signature
 from rate_limit import limiter
+from ustils import spans
 from ustils.client_ip import get_client_ip
 
 router = APIRouter()
 
+INTROSPECT_MAX_TOKENS = int(os.getenv("INTROSPECT_MAX_TOKENS", "100"))
+
 
 # ---------- MODELS ----------
 class RegisterReq(BaseModel):
@@ -38,6 +42,9 @@ class ResetPasswordReq(BaseModel):
     otp: str
     new_password: str
 
+class IntrospectReq(BaseModel):
+    tokens: list[str] = Field(..., max_length=INTROSPECT_MAX_TOKENS)
+
 
 # ---------- REGISTER ----------
 @router.post("/register")
@@ -51,7 +58,9 @@ async def register(
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     try:
-        return await register_user(data, ip_address=get_client_ip(request))
+        return await admit_registration(data, ip_address=get_client_ip(request))
+    except RegistrationThrottled as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except AuthError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -86,14 +95,16 @@ async def login(
             raise HTTPException(status_code=401, detail="Stale login request")
 
         message = f"{x_client_timestamp}:{data.sidhi_id}".encode()
-        if not verify_signature(
-            public_key_hex=x_client_public_key,
-            message=message,
-            signature_hex=x_client_signature
-        ):
+        with spans.span("ed25519"):
+            signature_ok = verify_signature(
+                public_key_hex=x_client_public_key,
+                message=message,
+                signature_hex=x_client_signature
+            )
+        if not signature_ok:
             raise HTTPException(status_code=401, detail="Invalid client signature")
 
-        client_id = derive_client_id(bytes.fromhex(x_client_public_key))
+        client_id = client_id_for_public_key(x_client_public_key)
 
         return await login_user(
             data=data,
@@ -130,14 +141,16 @@ async def login_google(
             raise HTTPException(status_code=401, detail="Stale login request")
 
         message = f"{x_client_timestamp}:{data.google_token}".encode()
-        if not verify_signature(
-            public_key_hex=x_client_public_key,
-            message=message,
-            signature_hex=x_client_signature
-        ):
+        with spans.span("ed25519"):
+            signature_ok = verify_signature(
+                public_key_hex=x_client_public_key,
+                message=message,
+                signature_hex=x_client_signature
+            )
+        if not signature_ok:
             raise HTTPException(status_code=401, detail="Invalid client signature")
 
-        client_id = derive_client_id(bytes.fromhex(x_client_public_key))
+        client_id = client_id_for_public_key(x_client_public_key)
 
         return await login_google_user(
             google_token=data.google_token,
@@ -169,27 +182,39 @@ async def refresh_token(
         raise HTTPException(status_code=401, detail="Stale refresh request")
 
     message = f"{x_client_timestamp}:{refresh_token}".encode()
-    if not verify_signature(
-        public_key_hex=x_client_public_key,
-        message=message,
-        signature_hex=x_client_signature
-    ):
+    with spans.span("ed25519"):
+        signature_ok = verify_signature(
+            public_key_hex=x_client_public_key,
+            message=message,
+            signature_hex=x_client_signature
+        )
+    if not signature_ok:
         raise HTTPException(status_code=401, detail="Invalid client signature")
 
-    client_id = derive_client_id(bytes.fromhex(x_client_public_key))
+    client_id = client_id_for_public_key(x_client_public_key)
 
-    token = await refresh_access_token(
+    tokens = await refresh_access_token(
         refresh_token=refresh_token,
         client_id=client_id
     )
 
-    if not token:
+    if not tokens:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    return {
-        "access_token": token,
-        "token_type": "bearer"
-    }
+    return tokens
+
+
+# ---------- INTROSPECT ----------
+@router.post("/introspect")
+async def introspect(
+    data: IntrospectReq,
+    x_introspect_key: str = Header(...)
+):
+    # Called by the gateway and resource servers, not end users: keyed rather than IP rate-limited.
+    if x_introspect_key != os.getenv("INTROSPECT_API_KEY"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return {"results": await introspect_tokens(data.tokens)}
 
 
 # ---------- FORGOT PASSWORD ----------
@@ -2,29 +2,78 @@ from jose import jwt, JWTError
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta
+import hashlib
 import os
 
+from security import jwt_keys
+from ustils.lru import LRUCache
+
+# HS256 with the shared secret is the legacy scheme. Once JWT_KEYS_DIR holds an
+# ES256 key, new tokens are signed with it and resource servers verify them
+# locally against /.well-known/jwks.json. HS256 tokens keep verifying until
+# JWT_ACCEPT_HS256=0, which should be set once they have all expired.
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-if not SECRET_KEY:
+if not SECRET_KEY and jwt_keys.signing_key()[0] is None:
     raise RuntimeError("JWT_SECRET_KEY not set")
 
 ALGORITHM = "HS256"
+JWT_ACCEPT_HS256 = os.getenv("JWT_ACCEPT_HS256", "1") == "1"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 def create_access_token(data: dict, expires_delta: timedelta):
     to_encode = data.copy()
     to_encode["exp"] = datetime.utcnow() + expires_delta
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    kid, key = jwt_keys.signing_key()
+    if key is None:
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, key, algorithm=jwt_keys.JWT_ALGORITHM, headers={"kid": kid})
+
+def _verify(token: str) -> dict:
+    header = jwt.get_unverified_header(token)
+    alg = header.get("alg")
+    if alg == jwt_keys.JWT_ALGORITHM:
+        key = jwt_keys.verification_key(header.get("kid"))
+        if key is None:
+            raise JWTError("Unknown kid")
+        return jwt.decode(token, key, algorithms=[jwt_keys.JWT_ALGORITHM])
+    if alg == ALGORITHM and JWT_ACCEPT_HS256 and SECRET_KEY:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    raise JWTError("Unsupported algorithm")
 
 def verify_token(token: str = Depends(oauth2_scheme)):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return _verify(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 def decode_access_token(token: str):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return _verify(token)
     except JWTError:
         return None
+
+
+# =========================
+# VERIFIED TOKEN CACHE
+# =========================
+# Protected routes see the same access token many times over its lifetime;
+# keep decoded payloads until their exp instead of re-verifying every request.
+# Keys only change with a restart (see security/jwt_keys.py), so entries never outlive their key.
+_token_cache = LRUCache(maxsize=int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", "10000")))
+
+
+def decode_access_token_cached(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = decode_access_token(token)
+    if payload and "exp" in payload:
+        _token_cache.set(key, payload, expires_at=payload["exp"])
+    return payload
+
+
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
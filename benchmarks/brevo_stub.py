@@ -0,0 +1,78 @@
+"""
+Local stand-in for Brevo's transactional email endpoint
+(POST /v3/smtp/email). Point the service at it with
+BREVO_API_URL=http://127.0.0.1:<port>/v3.
+
+    python -m benchmarks.brevo_stub --port 8025 --latency-ms 80 --fail-rate 0.1
+
+It can also run in-process via start_stub(); accepted messages are
+kept on the returned server's `messages` list.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.latency:
+            time.sleep(server.latency)
+
+        if self.path != "/v3/smtp/email":
+            return self._reply(404, {"code": "not_found"})
+        if random.random() < server.fail_rate:
+            return self._reply(server.fail_status, {"code": "stub_failure"})
+
+        message = json.loads(body)
+        with server.lock:
+            server.messages.append(message)
+        self._reply(201, {"messageId": f"<stub-{len(server.messages)}@brevo-stub>"})
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *_):
+        pass
+
+
+def start_stub(port: int = 0, latency_ms: float = 0, fail_rate: float = 0.0, fail_status: int = 503):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.latency = latency_ms / 1000
+    server.fail_rate = fail_rate
+    server.fail_status = fail_status
+    server.messages = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v3"
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency_ms, args.fail_rate, args.fail_status)
+    print(f"Brevo stub listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory and lookup cost of the disposable-domain matcher over the full
+bundled upstream list, against the previous exact-match set of strings.
+The lookup mix covers listed domains, subdomains of listed domains (which
+the old set missed) and ordinary domains.
+
+    python -m benchmarks.disposable_domains --lookups 200000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from ustils import disposable_email
+
+
+def _old_set() -> set:
+    domains = set(disposable_email._EXTRA_BLOCKED_DOMAINS)
+    with open(disposable_email._LIST_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().lower()
+            if line and not line.startswith("#"):
+                domains.add(line)
+    return domains
+
+
+def _traced(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def _rate(check, emails: list) -> float:
+    start = time.perf_counter()
+    for email in emails:
+        check(email)
+    return len(emails) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    old, old_bytes = _traced(_old_set)
+    new, new_bytes = _traced(disposable_email._load_blocked_domains)
+
+    listed = sorted(old)
+    clean = ["gmail.com", "outlook.com", "sidhi.xyz", "mail.example.org", "students.uni.ac.in"]
+    emails = []
+    for _ in range(args.lookups):
+        kind = random.random()
+        if kind < 0.3:
+            emails.append(f"user@{random.choice(listed)}")
+        elif kind < 0.5:
+            emails.append(f"user@x{random.randint(0, 99)}.{random.choice(listed)}")
+        else:
+            emails.append(f"user@{random.choice(clean)}")
+
+    old_check = lambda email: email.strip().lower().rsplit("@", 1)[-1] in old
+    old_rate = _rate(old_check, emails)
+    disposable_email.warm_up()
+    new_rate = _rate(disposable_email.is_disposable_email, emails)
+
+    subdomains = [e for e in emails if e.split("@")[1].startswith("x") and e.split("@")[1].split(".", 1)[1] in old]
+    missed_before = sum(not old_check(e) for e in subdomains)
+    missed_now = sum(not disposable_email.is_disposable_email(e) for e in subdomains)
+
+    print(f"domains={len(old)} ({len(new)} hashes) lookups={args.lookups}")
+    print(f"set of str:   {old_bytes / 1024:8.1f} KiB  {old_rate:>10,.0f} lookups/s")
+    print(f"hash array:   {new_bytes / 1024:8.1f} KiB  {new_rate:>10,.0f} lookups/s  ({old_bytes / new_bytes:.1f}x smaller)")
+    print(f"subdomain probes: {len(subdomains)}, missed by set {missed_before}, missed now {missed_now}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Local stand-in for Google's ID-token signing keys
+(GET /oauth2/v3/certs). It holds locally generated RSA keys, serves them
+as a JWKS with a Cache-Control max-age, and mints ID tokens signed by
+them. Point the service at it with
+GOOGLE_JWKS_URL=http://127.0.0.1:<port>/oauth2/v3/certs.
+
+    python -m benchmarks.google_jwks_stub --port 8026 --audience my-client-id --email a@example.com
+
+It can also run in-process via start_stub(); the returned server has
+mint(claims), rotate() and a `fetches` counter.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        if self.path != "/oauth2/v3/certs":
+            return self._reply(404, {"error": "not_found"})
+        with server.lock:
+            server.fetches += 1
+            keys = [dict(entry) for entry, _ in server.keys.values()]
+        self._reply(200, {"keys": keys}, {"Cache-Control": f"public, max-age={server.max_age}, must-revalidate"})
+
+    def _reply(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *_):
+        pass
+
+
+def _new_key() -> tuple:
+    kid = uuid.uuid4().hex
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    public.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return kid, public, pem
+
+
+def start_stub(port: int = 0, max_age: int = 3600, keys: int = 2):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.max_age = max_age
+    server.fetches = 0
+    server.lock = threading.Lock()
+    server.keys = {}
+    server.active_kid = None
+
+    def rotate() -> str:
+        """Adds a key and signs with it from now on; keeps the last `keys` published."""
+        kid, public, pem = _new_key()
+        with server.lock:
+            server.keys[kid] = (public, pem)
+            while len(server.keys) > keys:
+                server.keys.pop(next(iter(server.keys)))
+            server.active_kid = kid
+        return kid
+
+    def mint(claims: dict, audience: str = "stub-client-id", ttl: int = 3600, kid: str = None) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": audience,
+            "iat": now,
+            "exp": now + ttl,
+            "sub": uuid.uuid4().hex,
+            **claims,
+        }
+        kid = kid or server.active_kid
+        with server.lock:
+            pem = server.keys[kid][1]
+        return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid})
+
+    server.rotate = rotate
+    server.mint = mint
+    for _ in range(keys):
+        rotate()
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/oauth2/v3/certs"
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--max-age", type=int, default=3600)
+    parser.add_argument("--audience", default="stub-client-id")
+    parser.add_argument("--email", default="stub.user@example.com")
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.max_age)
+    print(f"GOOGLE_JWKS_URL={server.url}")
+    print(f"GOOGLE_CLIENT_ID={args.audience}")
+    print("sample id token:")
+    print(server.mint({"email": args.email, "email_verified": True, "name": "Stub User"}, audience=args.audience))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
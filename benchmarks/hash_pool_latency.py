@@ -0,0 +1,92 @@
+"""
+Login / refresh latency under mixed load, with Argon2 on the event loop
+("inline", the old behaviour) versus in the hashing pool ("pool").
+
+    python -m benchmarks.hash_pool_latency --mode inline
+    python -m benchmarks.hash_pool_latency --mode pool --workers 4
+
+Mongo round trips are simulated with a fixed sleep so only the hashing
+strategy differs between runs.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from ustils.percentiles import percentiles
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+
+def _percentiles(samples: list) -> str:
+    if not samples:
+        return "n=0"
+    p50, p95, p99 = percentiles(samples, 0.50, 0.95, 0.99, scale=1000)
+    return f"n={len(samples)} p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms"
+
+
+async def _run(args):
+    from datetime import timedelta
+    from auth_utils import create_access_token
+    from ustils.security import hash_password, verify_password
+    from services import password_hasher
+
+    stored_hash = hash_password("correct horse battery staple")
+    login_latencies, refresh_latencies = [], []
+    deadline = time.perf_counter() + args.duration
+    db_rtt = args.db_rtt_ms / 1000
+
+    async def login_worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(db_rtt)    # get_user_by_sidhi_id
+            if args.mode == "inline":
+                verify_password("correct horse battery staple", stored_hash)
+            else:
+                await password_hasher.verify_password_async("correct horse battery staple", stored_hash)
+            await asyncio.sleep(db_rtt)    # client + login writes
+            login_latencies.append(time.perf_counter() - start)
+
+    async def refresh_worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(db_rtt)    # get_refresh_token
+            create_access_token({"sub": "u", "cid": "c"}, timedelta(minutes=5))
+            refresh_latencies.append(time.perf_counter() - start)
+
+    if args.mode == "pool":
+        password_hasher.start()
+        # Warm the workers so process spawn doesn't land in the measurement.
+        await asyncio.gather(*[
+            password_hasher.verify_password_async("x", stored_hash) for _ in range(args.workers)
+        ])
+
+    await asyncio.gather(
+        *[login_worker() for _ in range(args.logins)],
+        *[refresh_worker() for _ in range(args.refreshes)],
+    )
+
+    print(f"mode={args.mode} workers={args.workers}")
+    print(f"  login   {_percentiles(login_latencies)}")
+    print(f"  refresh {_percentiles(refresh_latencies)}")
+    if args.mode == "pool":
+        print(f"  pool    {password_hasher.stats()}")
+        password_hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["inline", "pool"], default="pool")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--logins", type=int, default=8, help="concurrent login loops")
+    parser.add_argument("--refreshes", type=int, default=32, help="concurrent refresh loops")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--db-rtt-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    os.environ["HASH_POOL_WORKERS"] = str(args.workers)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
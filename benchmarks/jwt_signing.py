@@ -0,0 +1,60 @@
+"""
+Per-core cost of signing and verifying access tokens: the legacy HS256
+shared-secret path against ES256 with a key from a throwaway JWT_KEYS_DIR.
+Verification goes through decode_access_token (header parse, kid lookup,
+signature, claims) with the payload cache out of the picture.
+
+    python -m benchmarks.jwt_signing --iterations 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+_CLAIMS = {"sub": "SIDHI_BENCH", "cid": "c" * 64, "scope": ["sidhilynx"]}
+
+
+def _rate(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def _measure(auth_utils, iterations: int) -> tuple:
+    token = auth_utils.create_access_token(_CLAIMS, timedelta(minutes=5))
+    assert auth_utils.decode_access_token(token)["sub"] == _CLAIMS["sub"]
+    sign = _rate(lambda: auth_utils.create_access_token(_CLAIMS, timedelta(minutes=5)), iterations)
+    verify = _rate(lambda: auth_utils.decode_access_token(token), iterations)
+    return sign, verify, len(token)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    import auth_utils
+    from security import jwt_keys
+
+    with tempfile.TemporaryDirectory() as keys_dir:
+        jwt_keys.reload(keys_dir)
+        hs = _measure(auth_utils, args.iterations)
+
+        kid = jwt_keys.generate(keys_dir)
+        jwt_keys.reload(keys_dir)
+        es = _measure(auth_utils, args.iterations)
+
+    print(f"iterations={args.iterations} es256_kid={kid}")
+    print(f"HS256  sign {hs[0]:>9,.0f}/s  verify {hs[1]:>9,.0f}/s  token {hs[2]} bytes")
+    print(f"ES256  sign {es[0]:>9,.0f}/s  verify {es[1]:>9,.0f}/s  token {es[2]} bytes")
+    print(f"ES256/HS256  sign {es[0] / hs[0]:.2f}x  verify {es[1] / hs[1]:.2f}x")
+    body, _ = jwt_keys.jwks()
+    print(f"JWKS document {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,568 @@
+"""
+End-to-end load test of the FastAPI app in main.py.
+
+Every load process boots its own copy of the app (full lifespan, real
+middleware, rate limiter and routers) on the in-memory repositories
+(db/memory_repository.py), each call delayed by a simulated --latency-ms
+round trip, with the Brevo and Google key-set stubs running in the same
+process, and drives it through an in-process ASGI client with
+`--concurrency` closed-loop virtual users. Each virtual user owns one seeded account and one Ed25519 device
+key and repeatedly picks a flow from `--mix`:
+
+    register   POST /register, read the OTP from the Brevo stub, POST /verify-registration
+    login      POST /login with signed client headers
+    refresh    POST /refresh-token with the user's current (rotating) refresh token
+    reset      POST /forgot-password, read the OTP, POST /reset-password
+    protected  GET a route guarded by client_bound_auth
+    google     POST /login/google with an ID token minted by the stub
+
+    python -m benchmarks.load_suite --processes 4 --concurrency 16 --duration 20 --latency-ms 2
+    python -m benchmarks.load_suite ... --save-baseline benchmarks/baselines/load_suite.json
+    python -m benchmarks.load_suite ... --baseline benchmarks/baselines/load_suite.json
+
+Results are per request type: RPS, p50/p95/p99 and errors, plus CPU per
+request. CPU is the load process's own CPU time, so it includes the ASGI
+client and the stubs but not a --hash-workers pool; compare it against a baseline taken with the same
+flags rather than reading it as an absolute. Time spent waiting for an
+OTP email is think time and is not counted as request latency. Password
+hashing uses the production Argon2 cost unless --cheap-argon2 is given. Each
+request comes from its own random public IP (X-Forwarded-For), so the
+limiter runs on every request without tripping.
+
+With --baseline, a request type regresses when its p95 or CPU per request
+grows, or its RPS drops, by more than --tolerance; the exit status is 1
+if anything regressed.
+
+benchmarks/baselines/load_suite.json is the committed reference, taken with
+
+    python -m benchmarks.load_suite --processes 2 --concurrency 8 --duration 15 --cheap-argon2
+
+(1 ms simulated DB latency, default mix). Its numbers are
+from one developer machine: compare against it only with the same flags on
+comparable hardware, and otherwise save a fresh baseline from the base
+branch first. Flows with few requests (register, reset, google) have noisy
+p95s over a 15 s run.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from ustils.percentiles import percentiles
+
+DEFAULT_MIX = "login=30,protected=40,refresh=15,register=5,reset=5,google=5"
+PROTECTED_PATH = "/api/v1/bench/protected"
+PASSWORD = "load-suite-password"
+GOOGLE_AUDIENCE = "load-suite-client"
+REGISTER_KEY = "load-suite-register-key"
+
+_OTP = re.compile(r">\s*(\d{6})\s*<")
+
+
+def _parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(FLOWS)
+    if unknown:
+        raise SystemExit(f"unknown flows in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+# =========================
+# VIRTUAL USER
+# =========================
+class VirtualUser:
+    def __init__(self, harness, index: int):
+        from nacl.signing import SigningKey
+
+        self.harness = harness
+        self.index = index
+        self.sidhi_id = f"load{harness.worker}x{index}@sidhilynx.id"
+        self.email = f"load{harness.worker}x{index}@loadtest.sidhi.xyz"
+        self.key = SigningKey.generate()
+        self.public_key = self.key.verify_key.encode().hex()
+        self.access_token = None
+        self.refresh_token = None
+        self.registered = 0
+
+    def signed(self, payload: str, device: bool = True) -> dict:
+        ts = str(time.time())
+        headers = {
+            "X-Client-Public-Key": self.public_key,
+            "X-Client-Signature": self.key.sign(f"{ts}:{payload}".encode()).signature.hex(),
+            "X-Client-Timestamp": ts,
+            "X-Forwarded-For": _random_ip(),
+        }
+        if device:
+            headers.update({
+                "X-Platform": "android",
+                "X-App-Id": "load-suite",
+                "X-App-Name": "load-suite",
+                "X-App-Version": "1.0",
+            })
+        return headers
+
+    def keep_tokens(self, body: dict):
+        self.access_token = body["access_token"]
+        self.refresh_token = body.get("refresh_token", self.refresh_token)
+
+
+def _random_ip() -> str:
+    return f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+
+
+async def flow_login(h, user: VirtualUser):
+    response = await h.request(
+        "login", "POST", "/api/v1/auth/login",
+        json={"sidhi_id": user.sidhi_id, "password": PASSWORD},
+        headers=user.signed(user.sidhi_id)
+    )
+    if response.status_code == 200:
+        user.keep_tokens(response.json())
+
+
+async def flow_refresh(h, user: VirtualUser):
+    if user.refresh_token is None:
+        return await flow_login(h, user)
+    response = await h.request(
+        "refresh-token", "POST", "/api/v1/auth/refresh-token",
+        params={"refresh_token": user.refresh_token},
+        headers=user.signed(user.refresh_token, device=False)
+    )
+    if response.status_code == 200:
+        user.keep_tokens(response.json())
+    else:
+        await flow_login(h, user)
+
+
+async def flow_protected(h, user: VirtualUser):
+    headers = user.signed(PROTECTED_PATH, device=False)
+    headers["Authorization"] = f"Bearer {user.access_token}"
+    await h.request("protected", "GET", PROTECTED_PATH, headers=headers)
+
+
+async def flow_register(h, user: VirtualUser):
+    user.registered += 1
+    email = f"new{h.worker}x{user.index}x{user.registered}@loadtest.sidhi.xyz"
+    response = await h.request(
+        "register", "POST", "/api/v1/auth/register",
+        json={"username": f"new{h.worker}x{user.index}x{user.registered}", "email": email, "password": PASSWORD},
+        headers={"X-Forwarded-For": _random_ip(), "X-Register-Key": REGISTER_KEY}
+    )
+    if response.status_code != 200:
+        return
+    otp = await h.inbox.wait(email)
+    if otp is None:
+        h.errors["verify-registration"] += 1
+        return
+    await h.request(
+        "verify-registration", "POST", "/api/v1/auth/verify-registration",
+        json={"email": email, "otp": otp},
+        headers={"X-Forwarded-For": _random_ip()}
+    )
+
+
+async def flow_reset(h, user: VirtualUser):
+    response = await h.request(
+        "forgot-password", "POST", "/api/v1/auth/forgot-password",
+        json={"identifier": user.sidhi_id},
+        headers={"X-Forwarded-For": _random_ip()}
+    )
+    if response.status_code != 200:
+        return
+    otp = await h.inbox.wait(user.email)
+    if otp is None:
+        h.errors["reset-password"] += 1
+        return
+    # Same password again, so the account stays usable for the login flow.
+    await h.request(
+        "reset-password", "POST", "/api/v1/auth/reset-password",
+        json={"identifier": user.sidhi_id, "otp": otp, "new_password": PASSWORD},
+        headers={"X-Forwarded-For": _random_ip()}
+    )
+
+
+async def flow_google(h, user: VirtualUser):
+    token = h.google.mint(
+        {"email": user.email, "email_verified": True, "name": f"load{h.worker}x{user.index}"},
+        audience=GOOGLE_AUDIENCE
+    )
+    response = await h.request(
+        "login-google", "POST", "/api/v1/auth/login/google",
+        json={"google_token": token},
+        headers=user.signed(token)
+    )
+    if response.status_code == 200:
+        user.keep_tokens(response.json())
+
+
+FLOWS = {
+    "login": flow_login,
+    "refresh": flow_refresh,
+    "protected": flow_protected,
+    "register": flow_register,
+    "reset": flow_reset,
+    "google": flow_google,
+}
+
+
+# =========================
+# INBOX (OTPs from the Brevo stub)
+# =========================
+class Inbox:
+    """Hands each waiting virtual user the OTP from the next email the Brevo stub accepted for them."""
+
+    def __init__(self, brevo, timeout: float):
+        self.brevo = brevo
+        self.timeout = timeout
+        self.seen = 0
+        self.mail = defaultdict(list)
+        self.waiters = {}
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    async def _poll(self):
+        while True:
+            with self.brevo.lock:
+                fresh = self.brevo.messages[self.seen:]
+            self.seen += len(fresh)
+            for message in fresh:
+                to = message["to"][0]["email"]
+                match = _OTP.search(message["htmlContent"])
+                self.mail[to].append(match.group(1) if match else None)
+                waiter = self.waiters.pop(to, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+            await asyncio.sleep(0.005)
+
+    async def wait(self, email: str):
+        if not self.mail[email]:
+            waiter = self.waiters[email] = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(waiter, self.timeout)
+            except asyncio.TimeoutError:
+                self.waiters.pop(email, None)
+                return None
+        return self.mail[email].pop(0)
+
+
+# =========================
+# LOAD PROCESS
+# =========================
+class Harness:
+    def __init__(self, worker: int, client, inbox: Inbox, google):
+        self.worker = worker
+        self.client = client
+        self.inbox = inbox
+        self.google = google
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, name: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, path, **kwargs)
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies[name].append(elapsed)
+            if response.status_code >= 400:
+                self.errors[name] += 1
+                self.statuses[name][response.status_code] += 1
+        return response
+
+
+def _configure_env(args, brevo_url: str, google_url: str):
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("JWT_SECRET_KEY", "load-suite-secret")
+    os.environ["HASH_POOL_WORKERS"] = str(args.hash_workers)
+    os.environ["REPOSITORY_BACKEND"] = "memory"
+    os.environ["MEMORY_REPOSITORY_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["MEMORY_REPOSITORY_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["BREVO_API_URL"] = brevo_url
+    os.environ["GOOGLE_JWKS_URL"] = google_url
+    os.environ["GOOGLE_CLIENT_ID"] = GOOGLE_AUDIENCE
+    os.environ["REGISTER_API_KEY"] = REGISTER_KEY
+    os.environ.setdefault("EMAIL_ID", "load-suite@sidhi.xyz")
+    # One login per device per worker start; keep the suite from re-fetching keys mid-run.
+    os.environ.setdefault("GOOGLE_JWKS_MIN_REFETCH_SECONDS", "3600")
+
+
+async def _seed(users: list):
+    from db.user_repo import create_user
+    from services.password_hasher import hash_password_async
+    from ustils.id_generator import generate_user_id
+
+    password_hash = await hash_password_async(PASSWORD)
+    for user in users:
+        await create_user({
+            "user_id": generate_user_id(),
+            "sidhi_id": user.sidhi_id,
+            "username": user.sidhi_id.split("@")[0],
+            "email": user.email,
+            "password_hash": password_hash,
+            "created_at": datetime.utcnow(),
+            "is_active": True,
+            "auth_provider": "email",
+        })
+
+
+async def _virtual_user(h: Harness, user: VirtualUser, flows: list, weights: list, deadline: float):
+    while time.perf_counter() < deadline:
+        flow = random.choices(flows, weights)[0]
+        try:
+            await flow(h, user)
+        except Exception as e:
+            h.errors[f"{flow.__name__}:exception"] += 1
+            if h.errors[f"{flow.__name__}:exception"] == 1:
+                print(f"[load worker {h.worker}] {flow.__name__} raised {e!r}", file=sys.stderr)
+
+
+async def _run_worker(worker: int, args, barrier) -> dict:
+    import httpx
+    from fastapi import Depends, Request
+
+    from benchmarks import brevo_stub, google_jwks_stub
+
+    brevo = brevo_stub.start_stub(latency_ms=args.brevo_latency_ms)
+    google = google_jwks_stub.start_stub()
+    _configure_env(args, brevo.url, google.url)
+
+    import main
+    import metrics
+    from middleware.client_auth import client_bound_auth
+
+    async def protected(request: Request):
+        return {"user_id": request.state.user_id, "client_id": request.state.client_id}
+
+    if args.cheap_argon2:
+        # Only reaches hashing done in this process, i.e. with --hash-workers 0.
+        from ustils.security import pwd_context
+        pwd_context.update(argon2__time_cost=1, argon2__memory_cost=8, argon2__parallelism=1)
+
+    main.app.add_api_route(PROTECTED_PATH, protected, methods=["GET"], dependencies=[Depends(client_bound_auth)])
+
+    mix = _parse_mix(args.mix)
+    flows, weights = [FLOWS[name] for name in mix], list(mix.values())
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-suite") as client:
+            inbox = Inbox(brevo, timeout=args.otp_timeout)
+            inbox.start()
+            h = Harness(worker, client, inbox, google)
+            users = [VirtualUser(h, i) for i in range(args.concurrency)]
+            await _seed(users)
+            await asyncio.gather(*[flow_login(h, user) for user in users])
+
+            await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+            warmup_end = time.perf_counter() + args.warmup
+            await asyncio.gather(*[_virtual_user(h, u, flows, weights, warmup_end) for u in users])
+
+            h.recording = True
+            db_calls_start = metrics.db_call_count()
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            deadline = wall_start + args.duration
+            await asyncio.gather(*[_virtual_user(h, u, flows, weights, deadline) for u in users])
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            db_calls = metrics.db_call_count() - db_calls_start
+            await inbox.stop()
+
+    brevo.shutdown()
+    google.shutdown()
+    return {
+        "wall": wall,
+        "cpu": cpu,
+        "latencies": dict(h.latencies),
+        "errors": dict(h.errors),
+        "statuses": {name: dict(codes) for name, codes in h.statuses.items()},
+        "db_calls": db_calls,
+    }
+
+
+def _worker_main(worker: int, args, barrier, results):
+    random.seed(os.getpid() ^ time.time_ns())
+    try:
+        results.put((worker, asyncio.run(_run_worker(worker, args, barrier))))
+    except Exception as e:
+        barrier.abort()
+        results.put((worker, {"failed": repr(e)}))
+        raise
+
+
+# =========================
+# REPORTING
+# =========================
+def _summarize(outputs: list) -> dict:
+    wall = statistics.mean(o["wall"] for o in outputs)
+    cpu = sum(o["cpu"] for o in outputs)
+    latencies, errors = defaultdict(list), defaultdict(int)
+    statuses = defaultdict(lambda: defaultdict(int))
+    for o in outputs:
+        for name, values in o["latencies"].items():
+            latencies[name].extend(values)
+        for name, count in o["errors"].items():
+            errors[name] += count
+        for name, codes in o["statuses"].items():
+            for code, count in codes.items():
+                statuses[name][code] += count
+
+    total = sum(len(v) for v in latencies.values())
+    ops = {}
+    for name in sorted(latencies):
+        values = latencies[name]
+        p50, p95, p99 = percentiles(values, 0.50, 0.95, 0.99, scale=1000, ndigits=2)
+        ops[name] = {
+            "requests": len(values),
+            "rps": round(len(values) / wall, 1),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "errors": errors.get(name, 0),
+            "statuses": dict(statuses.get(name, {})),
+        }
+    p50, p95, p99 = percentiles((v for values in latencies.values() for v in values), 0.50, 0.95, 0.99,
+                                scale=1000, ndigits=2)
+    return {
+        "total": {
+            "requests": total,
+            "rps": round(total / wall, 1),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "cpu_ms_per_request": round(cpu / total * 1000, 3) if total else 0.0,
+            "db_calls_per_request": round(sum(o["db_calls"] for o in outputs) / total, 2) if total else 0.0,
+            "errors": sum(errors.values()),
+        },
+        "ops": ops,
+        "exceptions": {name: count for name, count in errors.items() if name.endswith(":exception")},
+    }
+
+
+def _print_summary(summary: dict):
+    print(f"{'request':<22}{'count':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, op in summary["ops"].items():
+        print(
+            f"{name:<22}{op['requests']:>8}{op['rps']:>10.1f}{op['p50_ms']:>10.2f}"
+            f"{op['p95_ms']:>10.2f}{op['p99_ms']:>10.2f}{op['errors']:>8}"
+        )
+        if op["statuses"]:
+            print(f"{'':<22}statuses: {op['statuses']}")
+    total = summary["total"]
+    print(
+        f"{'all':<22}{total['requests']:>8}{total['rps']:>10.1f}{total['p50_ms']:>10.2f}"
+        f"{total['p95_ms']:>10.2f}{total['p99_ms']:>10.2f}{total['errors']:>8}"
+    )
+    print(f"cpu per request: {total['cpu_ms_per_request']:.3f} ms   db calls per request: {total['db_calls_per_request']}")
+    for name, count in summary["exceptions"].items():
+        print(f"exceptions in {name}: {count}")
+
+
+def _compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """Returns (name, metric, baseline, current) for every metric outside the tolerance."""
+    regressions = []
+    rows = [("all", summary["total"], baseline["total"])]
+    rows += [(name, op, baseline["ops"][name]) for name, op in summary["ops"].items() if name in baseline["ops"]]
+    for name, current, before in rows:
+        for metric, higher_is_worse in (("p95_ms", True), ("rps", False), ("cpu_ms_per_request", True)):
+            if metric not in current or not before.get(metric):
+                continue
+            change = current[metric] / before[metric] - 1
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append((name, metric, before[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users per process")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"flow=weight list (default {DEFAULT_MIX})")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="simulated latency per repository call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--brevo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--otp-timeout", type=float, default=10.0)
+    parser.add_argument("--hash-workers", type=int, default=0, help="HASH_POOL_WORKERS inside each load process")
+    parser.add_argument(
+        "--cheap-argon2", action="store_true",
+        help="minimal Argon2 cost, so the run measures everything but password hashing"
+    )
+    parser.add_argument("--baseline", help="compare against this baseline JSON")
+    parser.add_argument("--save-baseline", help="write this run's summary as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative change before flagging")
+    parser.add_argument("--json", help="write the full summary here")
+    args = parser.parse_args()
+    _parse_mix(args.mix)
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.processes)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker_main, args=(i, args, barrier, results)) for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    outputs = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    failed = {worker: o["failed"] for worker, o in outputs.items() if "failed" in o}
+    if failed:
+        raise SystemExit(f"load processes failed: {failed}")
+
+    summary = _summarize(list(outputs.values()))
+    summary["config"] = {
+        key: getattr(args, key)
+        for key in ("processes", "concurrency", "duration", "mix", "latency_ms", "jitter_ms", "brevo_latency_ms", "hash_workers", "cheap_argon2")
+    }
+    print(
+        f"processes={args.processes} users/process={args.concurrency} duration={args.duration}s "
+        f"db_latency={args.latency_ms}ms mix={args.mix}"
+    )
+    _print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != summary["config"]:
+            print(f"note: baseline was taken with {baseline.get('config')}")
+        regressions = _compare(summary, baseline, args.tolerance)
+        if not regressions:
+            print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+            return
+        print(f"regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for name, metric, before, current in regressions:
+            print(f"  {name:<22}{metric:<20}{before:>10} -> {current}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
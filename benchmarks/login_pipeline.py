@@ -0,0 +1,100 @@
+"""
+Login / registration latency against the in-memory repositories with a
+fixed simulated latency per call, reporting wall time next to the number of
+repository calls each flow issues.
+
+    python -m benchmarks.login_pipeline --latency-ms 5 --iterations 50
+
+"serial" is what the same calls would cost if issued one after
+another; the gap between the two is what the concurrent pipeline saves.
+Logins verify against a minimal-cost Argon2 hash so DB round trips
+dominate; registration still pays the production hashing cost.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("HASH_POOL_WORKERS", "0")
+os.environ["REPOSITORY_BACKEND"] = "memory"
+
+
+async def _timed(coro_factory, iterations: int):
+    from metrics import db_call_count
+
+    latencies, trips = [], []
+    for i in range(iterations):
+        before = db_call_count()
+        start = time.perf_counter()
+        await coro_factory(i)
+        latencies.append(time.perf_counter() - start)
+        trips.append(db_call_count() - before)
+    return latencies, trips
+
+
+def _report(name: str, latencies: list, trips: list, latency_s: float):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    db_calls = statistics.mean(trips)
+    print(
+        f"{name:<22} p50={statistics.median(latencies) * 1000:6.1f}ms "
+        f"p99={p99 * 1000:6.1f}ms  db_calls={db_calls:.1f}  "
+        f"serial={db_calls * latency_s * 1000:6.1f}ms"
+    )
+
+
+async def _run(args):
+    from passlib.hash import argon2
+
+    from api.v1.users import LoginReq
+    from db import repository
+    from models.users import UserRegister
+    from services.auth_services import login_user, register_user
+
+    latency = args.latency_ms / 1000
+
+    cheap_hash = argon2.using(time_cost=1, memory_cost=8, parallelism=1).hash("benchmark-password")
+    await repository.active().users.create_user({
+        "user_id": "SIDHI_BENCH",
+        "sidhi_id": "bench@sidhilynx.id",
+        "email": "bench@example.com",
+        "password_hash": cheap_hash,
+        "is_active": True,
+    })
+
+    device = dict(
+        public_key="00" * 32, platform="android", app_id="bench",
+        app_name="bench", app_version="1.0", ip_address="8.8.8.8",
+    )
+    login = LoginReq(sidhi_id="bench@sidhilynx.id", password="benchmark-password")
+
+    new_device = await _timed(lambda i: login_user(data=login, client_id=f"new-{i}", **device), args.iterations)
+    _report("login (new device)", *new_device, latency)
+
+    known_device = await _timed(lambda i: login_user(data=login, client_id="new-0", **device), args.iterations)
+    _report("login (known device)", *known_device, latency)
+
+    register = await _timed(
+        lambda i: register_user(
+            UserRegister(username=f"bench{i}", email=f"bench{i}@example.com", password="benchmark-password"),
+            ip_address="8.8.8.8"
+        ),
+        args.iterations
+    )
+    _report("register", *register, latency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    # Read when the repository is first created, inside _run.
+    os.environ["MEMORY_REPOSITORY_LATENCY_MS"] = str(args.latency_ms)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Throughput of middleware.client_auth.client_bound_auth for a single
+device re-presenting the same access token.
+
+    python -m benchmarks.middleware_throughput --iterations 20000
+
+Runs the middleware with the verified-token cache enabled and disabled.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+
+def _build_request(token: str, signing_key, path: str = "/api/v1/protected"):
+    from starlette.requests import Request
+
+    ts = str(time.time())
+    sig = signing_key.sign(f"{ts}:{path}".encode()).signature.hex()
+    pub = signing_key.verify_key.encode().hex()
+    headers = [
+        (b"authorization", f"Bearer {token}".encode()),
+        (b"x-client-public-key", pub.encode()),
+        (b"x-client-signature", sig.encode()),
+        (b"x-client-timestamp", ts.encode()),
+    ]
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("bench", 80),
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+    })
+
+
+async def _measure(iterations: int, request) -> float:
+    from middleware.client_auth import client_bound_auth
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await client_bound_auth(request)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    from datetime import timedelta
+    from nacl.signing import SigningKey
+    import auth_utils
+    from security.client_crypto import derive_client_id
+
+    signing_key = SigningKey.generate()
+    client_id = derive_client_id(signing_key.verify_key.encode())
+    token = auth_utils.create_access_token(
+        {"sub": "SIDHI_BENCH", "cid": client_id, "scope": ["sidhilynx"]},
+        timedelta(minutes=300)
+    )
+    request = _build_request(token, signing_key)
+
+    cache_size = auth_utils._token_cache.maxsize
+
+    auth_utils._token_cache.maxsize = 0
+    auth_utils._token_cache.clear()
+    off = asyncio.run(_measure(args.iterations, request))
+
+    auth_utils._token_cache.maxsize = cache_size
+    on = asyncio.run(_measure(args.iterations, request))
+
+    print(f"token cache off: {off:,.0f} req/s")
+    print(f"token cache on:  {on:,.0f} req/s ({on / off:.2f}x)")
+    print(f"cache stats:     {auth_utils.token_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
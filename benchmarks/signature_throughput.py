@@ -0,0 +1,65 @@
+"""
+Per-core throughput of the client signature check (verify_signature +
+client_id_for_public_key) over a fleet of devices, and what each step of it
+costs: hex decoding and VerifyKey construction, the client_id SHA-256, and
+the Ed25519 verify itself.
+
+    python -m benchmarks.signature_throughput --devices 2000 --iterations 50000
+
+Key parsing is a rounding error next to the verify, which is why parsed keys
+aren't cached.
+"""
+import argparse
+import hashlib
+import random
+import time
+
+from nacl.signing import SigningKey, VerifyKey
+
+from security import client_crypto
+
+
+def _run(requests: list) -> float:
+    start = time.perf_counter()
+    for pub, message, sig in requests:
+        client_crypto.verify_signature(public_key_hex=pub, message=message, signature_hex=sig)
+        client_crypto.client_id_for_public_key(pub)
+    return len(requests) / (time.perf_counter() - start)
+
+
+def _per_call_us(fn, requests: list) -> float:
+    start = time.perf_counter()
+    for request in requests:
+        fn(*request)
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    devices = []
+    for _ in range(args.devices):
+        key = SigningKey.generate()
+        message = f"{time.time()}:/api/v1/protected".encode()
+        devices.append((key.verify_key.encode().hex(), message, key.sign(message).signature.hex()))
+    requests = [random.choice(devices) for _ in range(args.iterations)]
+    parsed = [(VerifyKey(bytes.fromhex(pub)), message, bytes.fromhex(sig)) for pub, message, sig in requests]
+
+    _run(requests[:1000])   # warm
+    throughput = _run(requests)
+    parse_us = _per_call_us(lambda pub, message, sig: VerifyKey(bytes.fromhex(pub)), requests)
+    client_id_us = _per_call_us(lambda pub, message, sig: hashlib.sha256(bytes.fromhex(pub)).hexdigest(), requests)
+    verify_us = _per_call_us(lambda key, message, sig: key.verify(message, sig), parsed)
+
+    print(f"devices={args.devices} iterations={args.iterations}")
+    print(f"signature checks: {throughput:,.0f} checks/s/core")
+    print(f"key parse       {parse_us:8.2f} us")
+    print(f"client_id       {client_id_us:8.2f} us")
+    print(f"ed25519 verify  {verify_us:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold-start cost of the service: a `python -X importtime` breakdown of
+`import main`, plus how much of the first request is spent loading lazy
+dependencies when no warm-up has run.
+
+    python -m benchmarks.startup_time --runs 5 --top 15
+
+Every measurement runs in a fresh interpreter so module caches don't leak
+between runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_ENV = {
+    **os.environ,
+    "MONGO_URI": os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+    "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY", "benchmark-secret"),
+}
+
+_FIRST_USE = """
+import json, time
+t = time.perf_counter(); import main; import_ms = (time.perf_counter() - t) * 1000
+from ustils.geo import lookup_location
+from ustils.disposable_email import is_disposable_email
+out = {"import_main": import_ms}
+for name, fn in [
+    ("geoip", lambda: lookup_location("8.8.8.8")),
+    ("disposable_domains", lambda: is_disposable_email("a@example.com")),
+]:
+    t = time.perf_counter(); fn(); out[name] = (time.perf_counter() - t) * 1000
+print(json.dumps(out))
+"""
+
+
+def _importtime() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=_ENV, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        modules[name] = int(cumulative_us)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [_importtime() for _ in range(args.runs)]
+    names = set().union(*runs)
+    median = {name: statistics.median(run.get(name, 0) for run in runs) for name in names}
+
+    print(f"import main: median {median.get('main', 0) / 1000:.1f} ms over {args.runs} runs")
+    print(f"top {args.top} modules by cumulative import time:")
+    for name, us in sorted(median.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    first_use = []
+    for _ in range(args.runs):
+        proc = subprocess.run([sys.executable, "-c", _FIRST_USE], env=_ENV, capture_output=True, text=True, check=True)
+        first_use.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print("first use without warm-up (median ms):")
+    for key in first_use[0]:
+        print(f"  {statistics.median(r[key] for r in first_use):8.1f} ms  {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Size, build time and accuracy of the users Bloom filter (db/user_filter.py).
+Seeds the in-memory repository with synthetic users, builds the filter the
+way a worker does at startup, then probes it with sidhi_ids and emails that
+don't exist to measure the false-positive rate against the configured target.
+
+    python -m benchmarks.user_filter --users 200000 --probes 100000
+
+A probe that passes the filter costs a Mongo round trip in production; one
+that doesn't is answered in-process.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ["REPOSITORY_BACKEND"] = "memory"
+
+
+async def _seed(users, count: int):
+    for i in range(count):
+        await users.create_user({
+            "user_id": f"SIDHI{i:012d}",
+            "sidhi_id": f"user{i}@sidhilynx.id",
+            "email": f"user{i}@example.com",
+            "password_hash": "x",
+            "is_active": True,
+        })
+
+
+async def _run(args):
+    from db import repository, user_filter
+
+    await _seed(repository.active().users, args.users)
+
+    start = time.perf_counter()
+    bloom = await user_filter.build()
+    build_s = time.perf_counter() - start
+
+    probes = [f"sidhi_id:ghost{i}@sidhilynx.id" for i in range(args.probes // 2)]
+    probes += [f"email:ghost{i}@example.com" for i in range(args.probes - len(probes))]
+    start = time.perf_counter()
+    false_positives = sum(1 for key in probes if key in bloom)
+    lookup_us = (time.perf_counter() - start) / len(probes) * 1e6
+
+    missing = sum(1 for i in range(0, args.users, max(1, args.users // 1000))
+                  if f"email:user{i}@example.com" not in bloom)
+
+    print(f"users={args.users} keys={bloom.count} capacity={bloom.capacity} hashes={bloom.num_hashes}")
+    print(f"build      {build_s * 1000:8.1f} ms  ({build_s / max(1, args.users) * 1e6:.2f} us/user)")
+    print(f"memory     {bloom.nbytes / 1024:8.1f} KiB ({bloom.nbytes * 8 / max(1, bloom.count):.1f} bits/key)")
+    print(f"lookup     {lookup_us:8.2f} us")
+    print(f"fp rate    measured {false_positives / len(probes):.4%}  estimated {bloom.estimated_fp_rate():.4%}  "
+          f"target {user_filter.USER_FILTER_FP_RATE:.4%}")
+    print(f"false negatives among sampled existing users: {missing}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--probes", type=int, default=100000, help="lookups for accounts that don't exist")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
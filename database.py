@@ -1,12 +1,169 @@
+import asyncio
+import contextlib
 import os
+import time
+from collections import deque
+
+import pymongo
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from ustils.percentiles import percentiles
 
+# Required unless REPOSITORY_BACKEND=memory; checked when the client is created.
 MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise RuntimeError("MONGO_URI not set")
 
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "app_db")
 
+# =====================
+# Pool configuration
+# =====================
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Deadline for each request-path repository call (see operation_timeout); 0
+# disables it. Not a client-wide timeoutMS: the NDJSON export cursor, the Bloom
+# filter build and change-stream getMores legitimately run longer.
+MONGO_MAX_TIME_MS = int(os.getenv("MONGO_MAX_TIME_MS", "15000"))
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+    """Records how long requests wait to check a connection out of the pool."""
+
+    def __init__(self):
+        self.waits = deque(maxlen=2048)
+        self.checked_out = 0
+        self.checkout_failures = 0
+        self.created = 0
+        self.closed = 0
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        if event.duration is not None:
+            self.waits.append(event.duration)
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+pool_listener = _PoolListener()
+client = None
+_db = None
+
+
+def connect():
+    """Creates the client. Called from the app lifespan; also on first use for scripts."""
+    global client, _db
+    if client is None:
+        if not MONGO_URI:
+            raise RuntimeError("MONGO_URI not set")
+        options = {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "event_listeners": [pool_listener],
+        }
+        client = AsyncIOMotorClient(MONGO_URI, **options)
+        _db = client[MONGO_DB_NAME]
+    return _db
+
+
+def operation_timeout():
+    """
+    `with database.operation_timeout():` bounds every Mongo call inside the
+    block to MONGO_MAX_TIME_MS in total (pymongo's client-side timeout, which
+    Motor carries into its worker threads). Applied by metrics.timed_db.
+    """
+    if not MONGO_MAX_TIME_MS:
+        return contextlib.nullcontext()
+    return pymongo.timeout(MONGO_MAX_TIME_MS / 1000)
+
+
+def close():
+    global client, _db
+    if client is not None:
+        client.close()
+        client = None
+        _db = None
+
+
+async def ping(timeout: float = 2.0) -> float:
+    """Round trip to the primary in milliseconds; raises on failure."""
+    start = time.perf_counter()
+    await asyncio.wait_for(connect().command("ping"), timeout)
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def warm_up() -> bool:
+    """Opens minPoolSize connections up front so the first requests don't pay for handshakes."""
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[connect().command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))])
+    except PyMongoError as e:
+        # Not fatal: /health/ready keeps reporting the outage until Mongo answers.
+        print(f"[mongo] warm-up failed: {e!r}")
+        return False
+    print(f"[mongo] pool warmed in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return True
+
+
+class _Database:
+    """
+    Stand-in for the Motor database that repositories bind with
+    `from database import db`; resolves to the lifespan-managed client.
+    """
+
+    def __getattr__(self, name):
+        return getattr(connect(), name)
+
+    def __getitem__(self, name):
+        return connect()[name]
+
+
+db = _Database()
+
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[MONGO_DB_NAME]
+def pool_stats() -> dict:
+    wait_p50, wait_p99 = percentiles(pool_listener.waits, 0.50, 0.99, scale=1000, ndigits=2)
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "checked_out": pool_listener.checked_out,
+        "checkout_failures": pool_listener.checkout_failures,
+        "connections_created": pool_listener.created,
+        "connections_closed": pool_listener.closed,
+        "checkout_wait_p50_ms": wait_p50,
+        "checkout_wait_p99_ms": wait_p99,
+    }
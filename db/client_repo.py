@@ -1,36 +1,55 @@
-from datetime import datetime
-from database import db
-from ustils.geo import lookup_location
+from bson import ObjectId
 
+from db import repository
+from db.token_repo import revoke_client_tokens
+from metrics import timed_db
 
+
+def _clients():
+    return repository.active().clients
+
+
+@timed_db
 async def get_client_by_id(client_id: str):
     """Returns the most recently active account link for this device, if any."""
-    return await db.clients.find_one(
-        {"client_id": client_id},
-        sort=[("last_seen_at", -1)]
-    )
+    return await _clients().get_client_by_id(client_id)
 
 
+@timed_db
 async def get_client_link(client_id: str, user_id: str):
     """Returns the link record for this specific device+account pair."""
-    return await db.clients.find_one({"client_id": client_id, "user_id": user_id})
+    return await _clients().get_client_link(client_id, user_id)
+
+
+def find_clients(filters: dict, projection: dict, after: ObjectId = None, limit: int = 0, batch_size: int = 500):
+    """
+    Cursor over client links, most recently linked first, keyset-paginated
+    on _id, which (unlike last_seen_at) never changes under a paging client.
+    `after` is the _id of the last row already returned. Callers iterate the
+    cursor directly, so memory stays at one batch.
+    """
+    return _clients().find_clients(filters, projection, after=after, limit=limit, batch_size=batch_size)
+
+
+@timed_db
+async def get_link_statuses(client_ids: list[str]) -> dict:
+    """(client_id, user_id) -> status for every link of these devices, in one $in query."""
+    return await _clients().get_link_statuses(client_ids)
 
 
+@timed_db
 async def revoke_client(client_id: str):
-    await db.clients.update_many(
-        {"client_id": client_id},
-        {"$set": {"status": "revoked"}}
-    )
+    await _clients().revoke_client(client_id)
+    # Refresh tokens carry a copy of the status; keep it in step.
+    await revoke_client_tokens(client_id)
 
 
+@timed_db
 async def is_client_active(client_id: str, user_id: str) -> bool:
-    client = await db.clients.find_one(
-        {"client_id": client_id, "user_id": user_id, "status": "active"},
-        {"status": 1}
-    )
-    return bool(client)
+    return await _clients().is_client_active(client_id, user_id)
 
 
+@timed_db
 async def create_client(
     client_id: str,
     user_id: str,
@@ -41,69 +60,29 @@ async def create_client(
     ip_address: str,
     public_key: str
 ):
-
-    now = datetime.utcnow()
-    location = lookup_location(ip_address)
-
-    await db.clients.update_one(
-        {"client_id": client_id, "user_id": user_id},
-        {
-            "$set": {
-                "client_id": client_id,
-                "user_id": user_id,
-                "public_key": public_key,
-
-                "platform": platform,
-                "app_id": app_id,
-                "app_name": app_name,
-                "app_version": app_version,
-
-                "ip_first_seen": ip_address,
-                "ip_last_seen": ip_address,
-                "location_last_seen": location,
-
-                "last_seen_at": now,
-                "status": "active"
-            },
-            "$setOnInsert": {
-                "created_at": now
-            },
-            "$push": {
-                "ip_history": {
-                    "ip": ip_address,
-                    "location": location,
-                    "seen_at": now
-                }
-            }
-        },
-        upsert=True
+    await _clients().create_client(
+        client_id=client_id,
+        user_id=user_id,
+        platform=platform,
+        app_id=app_id,
+        app_name=app_name,
+        app_version=app_version,
+        ip_address=ip_address,
+        public_key=public_key
     )
 
 
+@timed_db
 async def update_client_activity(client_id: str, ip_address: str, user_id: str):
-    now = datetime.utcnow()
-    location = lookup_location(ip_address)
-
-    await db.clients.update_one(
-        {"client_id": client_id, "user_id": user_id},
-        {
-            "$set": {
-                "ip_last_seen": ip_address,
-                "location_last_seen": location,
-                "last_seen_at": now
-            },
-            "$push": {
-                "ip_history": {
-                    "$each": [
-                        {
-                            "ip": ip_address,
-                            "location": location,
-                            "seen_at": now
-                        }
-                    ],
-                    "$slice": -10   # keep last 10 IPs only
-                }
-            }
-        },
-        upsert=True
-    )
+    """Last-seen/IP telemetry for an existing link; the Mongo backend writes it behind via the telemetry buffer."""
+    await _clients().update_client_activity(client_id, ip_address, user_id)
+
+
+def revoked_links():
+    """Async iterator of (client_id, user_id) for every revoked link."""
+    return _clients().revoked_links()
+
+
+def watch_link_status():
+    """Stream of link documents whose status may have changed (a change stream on Mongo)."""
+    return _clients().watch_link_status()
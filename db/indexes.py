@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from database import db
+
+
+# =========================
+# INDEX REGISTRY
+# =========================
+# Every query the repositories run must be backed by one of these.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("sidhi_id", ASCENDING)], name="sidhi_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "clients": [
+        IndexModel(
+            [("client_id", ASCENDING), ("user_id", ASCENDING)],
+            name="client_user_unique",
+            unique=True
+        ),
+        IndexModel(
+            [("client_id", ASCENDING), ("last_seen_at", DESCENDING)],
+            name="client_last_seen"
+        ),
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_keyset"),
+        IndexModel(
+            [("status", ASCENDING)],
+            name="revoked_only",
+            partialFilterExpression={"status": "revoked"}
+        ),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("client_id", ASCENDING)], name="client_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "pending_registrations": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("otp_expires", ASCENDING)], name="otp_expires_ttl", expireAfterSeconds=0),
+    ],
+    "email_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("claim_id", ASCENDING)], name="claim_id", sparse=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Representative shape of each repository query, used by --check to
+# confirm the planner picks an index instead of a collection scan.
+QUERIES = [
+    ("users", {"email": "probe@example.com"}, None),
+    ("users", {"sidhi_id": "probe@sidhilynx.id"}, None),
+    ("users", {"user_id": "SIDHI_PROBE"}, None),
+    ("clients", {"client_id": "probe"}, [("last_seen_at", DESCENDING)]),
+    ("clients", {"client_id": "probe", "user_id": "SIDHI_PROBE"}, None),
+    ("clients", {"client_id": "probe", "user_id": "SIDHI_PROBE", "status": "active"}, None),
+    ("clients", {"status": "revoked"}, None),
+    ("clients", {}, [("_id", DESCENDING)]),
+    ("clients", {"user_id": "SIDHI_PROBE"}, [("_id", DESCENDING)]),
+    ("refresh_tokens", {"token_hash": "probe"}, None),
+    ("refresh_tokens", {"user_id": "SIDHI_PROBE"}, None),
+    ("refresh_tokens", {"client_id": "probe"}, None),
+    ("pending_registrations", {"email": "probe@example.com"}, None),
+    ("email_outbox", {"status": "pending", "next_attempt_at": {"$lte": 0}}, [("next_attempt_at", ASCENDING)]),
+    ("email_outbox", {"claim_id": "probe"}, None),
+]
+
+
+async def ensure_indexes():
+    """Creates any missing registry indexes. Failures are reported, not fatal, so a bad index never blocks boot."""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except PyMongoError as e:
+            print(f"[indexes] failed to create indexes on {collection}: {e}")
+
+
+# =========================
+# CHECK MODE
+# =========================
+def _winning_stages(plan: dict) -> list:
+    stages = []
+    while plan:
+        stages.append(plan.get("stage"))
+        plan = plan.get("inputStage")
+    return stages
+
+
+async def check_indexes() -> bool:
+    healthy = True
+
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        for model in models:
+            name = model.document["name"]
+            if name not in existing:
+                healthy = False
+                print(f"MISSING  {collection}.{name}")
+
+        async for usage in db[collection].aggregate([{"$indexStats": {}}]):
+            if usage["name"] != "_id_" and usage["accesses"]["ops"] == 0:
+                print(f"UNUSED   {collection}.{usage['name']} (since {usage['accesses']['since']})")
+
+    for collection, query, sort in QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _winning_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            healthy = False
+            print(f"COLLSCAN {collection} {query} sort={sort}")
+        else:
+            print(f"OK       {collection} {query} -> {' <- '.join(stages)}")
+
+    return healthy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or verify MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="report missing/unused indexes and query plans")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if asyncio.run(check_indexes()) else 1)
+
+    asyncio.run(ensure_indexes())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+import asyncio
+import inspect
+import os
+import random
+import uuid
+from collections import defaultdict
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from db.repository import Backend, ClientRepository, OutboxRepository, TokenRepository, UserRepository
+from ustils.geo import lookup_location
+
+# =====================
+# In-memory repositories
+# =====================
+# Same behaviour as the Mongo backend, held in dicts with the secondary
+# indexes the queries need (email, sidhi_id, user_id, client_id, token hash).
+# Documents are copied on the way in and out, like a round trip through BSON.
+# TTL'd records (pending registrations, refresh tokens, outbox) are dropped
+# when read after they expire. Single process only.
+#
+# For load tests (benchmarks/load_suite.py) every repository call can be made
+# to wait a simulated Mongo round trip first; it shows up in the
+# db_operation_duration_seconds histogram like a real one.
+MEMORY_REPOSITORY_LATENCY_MS = float(os.getenv("MEMORY_REPOSITORY_LATENCY_MS", "0"))
+MEMORY_REPOSITORY_JITTER_MS = float(os.getenv("MEMORY_REPOSITORY_JITTER_MS", "0"))
+
+_MISSING = object()
+
+
+def _clone(value):
+    # Mappings (including read-only geo results) become plain dicts, as BSON would make them.
+    if isinstance(value, Mapping):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+def _get(doc, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _project(doc: dict, projection: dict) -> dict:
+    if not projection:
+        return _clone(doc)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        out = {}
+        for field in fields:
+            value = _get(doc, field)
+            if value is not _MISSING:
+                target = out
+                parts = field.split(".")
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                target[parts[-1]] = _clone(value)
+    else:
+        out = _clone(doc)
+        for field in fields:
+            target = out
+            parts = field.split(".")
+            for part in parts[:-1]:
+                target = target.get(part) if isinstance(target, dict) else None
+            if isinstance(target, dict):
+                target.pop(parts[-1], None)
+    if projection.get("_id", 1) and "_id" in doc:
+        out["_id"] = doc["_id"]
+    else:
+        out.pop("_id", None)
+    return out
+
+
+def _push(doc: dict, field: str, entry: dict, keep_last: int = None):
+    items = doc.setdefault(field, [])
+    items.append(_clone(entry))
+    if keep_last is not None and len(items) > keep_last:
+        del items[:-keep_last]
+
+
+class _ListCursor:
+    """The slice of the Motor cursor API callers use: async iteration and to_list."""
+
+    def __init__(self, docs: list):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs[:length] if length else list(self._docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+class _ChangeStream:
+    """Change-stream stand-in: the repository pushes change-stream-shaped events to every open stream."""
+
+    def __init__(self, subscribers: set):
+        self._subscribers = subscribers
+        self._queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        self._subscribers.add(self._queue)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._subscribers.discard(self._queue)
+        return False
+
+    async def try_next(self):
+        try:
+            return await asyncio.wait_for(self._queue.get(), 1.0)
+        except asyncio.TimeoutError:
+            return None
+
+
+# =========================
+# USERS
+# =========================
+class MemoryUserRepository(UserRepository):
+    def __init__(self):
+        self._users = {}            # user_id -> doc
+        self._by_email = {}         # email -> user_id
+        self._by_sidhi_id = {}      # sidhi_id -> user_id
+        self._pending = {}          # email -> pending registration
+        self._watchers = set()
+
+    def _find(self, user_id):
+        return self._users.get(user_id) if user_id is not None else None
+
+    def _notify(self, operation: str, user: dict):
+        event = {"operationType": operation, "documentKey": {"_id": user["_id"]}}
+        if operation == "insert":
+            event["fullDocument"] = {"sidhi_id": user["sidhi_id"], "email": user["email"]}
+        for queue in self._watchers:
+            queue.put_nowait(event)
+
+    def _read(self, user, fields: tuple):
+        if user is None:
+            return None
+        return _project(user, {field: 1 for field in fields} if fields else None)
+
+    async def get_user_by_email(self, email: str, fields: tuple = None):
+        return self._read(self._find(self._by_email.get(email)), fields)
+
+    async def get_user_by_id(self, user_id: str):
+        return _clone(self._find(user_id))
+
+    async def get_user_by_sidhi_id(self, sidhi_id: str, fields: tuple = None):
+        return self._read(self._find(self._by_sidhi_id.get(sidhi_id)), fields)
+
+    async def create_user(self, user: dict):
+        for index, key in ((self._users, user["user_id"]), (self._by_email, user["email"]),
+                           (self._by_sidhi_id, user["sidhi_id"])):
+            if key in index:
+                raise DuplicateKeyError(f"duplicate key: {key}")
+        user.setdefault("_id", ObjectId())
+        self._users[user["user_id"]] = _clone(user)
+        self._by_email[user["email"]] = user["user_id"]
+        self._by_sidhi_id[user["sidhi_id"]] = user["user_id"]
+        self._notify("insert", user)
+
+    async def set_password_hash(self, user_id: str, password_hash: str):
+        user = self._find(user_id)
+        if user:
+            user["password_hash"] = password_hash
+            self._notify("update", user)
+
+    async def set_registration_otp(self, email: str, otp_hash: str, expires_at: datetime, user_data: dict):
+        pending = self._pending.setdefault(email, {"_id": ObjectId(), "email": email})
+        pending.update({
+            "otp_hash": otp_hash,
+            "otp_expires": expires_at,
+            "otp_attempts": 0,
+            "user_data": _clone(user_data),
+            "created_at": _now()
+        })
+
+    def _live_pending(self, email: str):
+        pending = self._pending.get(email)
+        if pending and pending["otp_expires"] <= _now():
+            del self._pending[email]
+            return None
+        return pending
+
+    async def get_pending_registration(self, email: str):
+        return _clone(self._live_pending(email))
+
+    async def increment_registration_otp_attempts(self, email: str):
+        pending = self._live_pending(email)
+        if pending:
+            pending["otp_attempts"] = pending.get("otp_attempts", 0) + 1
+
+    async def delete_pending_registration(self, email: str):
+        self._pending.pop(email, None)
+
+    async def set_reset_otp(self, user_id: str, otp_hash: str, expires_at: datetime):
+        user = self._find(user_id)
+        if user:
+            user.update({"reset_otp_hash": otp_hash, "reset_otp_expires": expires_at, "reset_otp_attempts": 0})
+
+    async def increment_otp_attempts(self, user_id: str):
+        user = self._find(user_id)
+        if user:
+            user["reset_otp_attempts"] = user.get("reset_otp_attempts", 0) + 1
+
+    async def clear_reset_otp(self, user_id: str):
+        user = self._find(user_id)
+        if user:
+            for field in ("reset_otp_hash", "reset_otp_expires", "reset_otp_attempts"):
+                user.pop(field, None)
+
+    async def record_login(self, user_id: str, ip_address: str, location: dict):
+        user = self._find(user_id)
+        if not user:
+            return
+        now = _now()
+        user.update({"last_login_ip": ip_address, "last_login_location": _clone(location), "last_login_at": now})
+        _push(user, "login_history", {"ip": ip_address, "location": location, "at": now}, keep_last=20)
+
+    async def count_users(self) -> int:
+        return len(self._users)
+
+    async def user_keys(self):
+        for user in list(self._users.values()):
+            yield user["sidhi_id"], user["email"]
+
+    def watch_user_changes(self):
+        return _ChangeStream(self._watchers)
+
+
+# =========================
+# CLIENTS
+# =========================
+class MemoryClientRepository(ClientRepository):
+    def __init__(self):
+        self._links = {}                    # (client_id, user_id) -> doc
+        self._by_client = defaultdict(set)  # client_id -> {user_id}
+        self._watchers = set()
+
+    def _notify(self, link: dict):
+        for queue in self._watchers:
+            queue.put_nowait({"operationType": "update", "fullDocument": _clone(link), "wallTime": _now()})
+
+    def _links_for(self, client_id: str) -> list:
+        return [self._links[(client_id, user_id)] for user_id in self._by_client.get(client_id, ())]
+
+    def _link(self, client_id: str, user_id: str) -> dict:
+        link = self._links.get((client_id, user_id))
+        if link is None:
+            link = self._links[(client_id, user_id)] = {"_id": ObjectId(), "client_id": client_id, "user_id": user_id}
+            self._by_client[client_id].add(user_id)
+        return link
+
+    async def get_client_by_id(self, client_id: str):
+        links = self._links_for(client_id)
+        if not links:
+            return None
+        return _clone(max(links, key=lambda link: link.get("last_seen_at") or datetime.min))
+
+    async def get_client_link(self, client_id: str, user_id: str):
+        return _clone(self._links.get((client_id, user_id)))
+
+    def find_clients(self, filters: dict, projection: dict, after: ObjectId = None, limit: int = 0, batch_size: int = 500):
+        # Equality filters only, which is all the admin API builds.
+        links = [
+            link for link in self._links.values()
+            if all(_get(link, field) == value for field, value in filters.items())
+        ]
+        links.sort(key=lambda link: link["_id"], reverse=True)
+        if after:
+            links = [link for link in links if link["_id"] < after]
+        if limit:
+            links = links[:limit]
+        return _ListCursor([_project(link, projection) for link in links])
+
+    async def get_link_statuses(self, client_ids: list[str]) -> dict:
+        return {
+            (link["client_id"], link["user_id"]): link.get("status")
+            for client_id in client_ids
+            for link in self._links_for(client_id)
+        }
+
+    async def revoke_client(self, client_id: str):
+        now = _now()
+        for link in self._links_for(client_id):
+            link.update({"status": "revoked", "revoked_at": now})
+            self._notify(link)
+
+    async def is_client_active(self, client_id: str, user_id: str) -> bool:
+        link = self._links.get((client_id, user_id))
+        return bool(link) and link.get("status") == "active"
+
+    async def create_client(self, client_id: str, user_id: str, platform: str, app_id: str, app_name: str,
+                            app_version: str, ip_address: str, public_key: str):
+        now = _now()
+        location = lookup_location(ip_address)
+        link = self._link(client_id, user_id)
+        link.setdefault("created_at", now)
+        link.update({
+            "public_key": public_key,
+            "platform": platform,
+            "app_id": app_id,
+            "app_name": app_name,
+            "app_version": app_version,
+            "ip_first_seen": ip_address,
+            "ip_last_seen": ip_address,
+            "location_last_seen": _clone(location),
+            "last_seen_at": now,
+            "status": "active"
+        })
+        _push(link, "ip_history", {"ip": ip_address, "location": location, "seen_at": now})
+        self._notify(link)
+
+    async def update_client_activity(self, client_id: str, ip_address: str, user_id: str):
+        now = _now()
+        location = lookup_location(ip_address)
+        link = self._link(client_id, user_id)
+        link.update({"ip_last_seen": ip_address, "location_last_seen": _clone(location), "last_seen_at": now})
+        _push(link, "ip_history", {"ip": ip_address, "location": location, "seen_at": now}, keep_last=10)
+
+    async def revoked_links(self):
+        for (client_id, user_id), link in list(self._links.items()):
+            if link.get("status") == "revoked":
+                yield client_id, user_id
+
+    def watch_link_status(self):
+        return _ChangeStream(self._watchers)
+
+
+# =========================
+# REFRESH TOKENS
+# =========================
+class MemoryTokenRepository(TokenRepository):
+    def __init__(self):
+        self._tokens = {}                   # _id -> doc
+        self._by_hash = {}                  # token_hash -> _id
+        self._by_client = defaultdict(set)  # client_id -> {_id}
+        self._by_user = defaultdict(set)    # user_id -> {_id}
+
+    def _live(self, record_id):
+        token = self._tokens.get(record_id)
+        if token and token["expires_at"] <= _now():
+            self._remove(record_id)
+            return None
+        return token
+
+    def _remove(self, record_id):
+        token = self._tokens.pop(record_id, None)
+        if token:
+            self._by_hash.pop(token["token_hash"], None)
+            self._by_client[token["client_id"]].discard(record_id)
+            self._by_user[token["user_id"]].discard(record_id)
+
+    async def save_refresh_token(self, record_id, user_id: str, client_id: str, token_hash: str,
+                                 scopes: list[str], expires_at: datetime):
+        if record_id in self._tokens or token_hash in self._by_hash:
+            raise DuplicateKeyError(f"duplicate key: {record_id}")
+        self._tokens[record_id] = {
+            "_id": record_id,
+            "user_id": user_id,
+            "client_id": client_id,
+            "client_status": "active",
+            "token_hash": token_hash,
+            "scope": list(scopes),
+            "expires_at": expires_at,
+            "created_at": _now()
+        }
+        self._by_hash[token_hash] = record_id
+        self._by_client[client_id].add(record_id)
+        self._by_user[user_id].add(record_id)
+
+    async def get_refresh_token_by_id(self, record_id):
+        return _clone(self._live(record_id))
+
+    async def rotate_refresh_token(self, record_id, old_hash: str, new_hash: str, expires_at: datetime) -> bool:
+        token = self._live(record_id)
+        if not token or token["token_hash"] != old_hash:
+            return False
+        del self._by_hash[old_hash]
+        self._by_hash[new_hash] = record_id
+        token.update({"token_hash": new_hash, "expires_at": expires_at, "rotated_at": _now()})
+        return True
+
+    async def revoke_client_tokens(self, client_id: str):
+        for record_id in self._by_client.get(client_id, ()):
+            self._tokens[record_id]["client_status"] = "revoked"
+
+    async def get_refresh_token(self, token_hash: str):
+        return _clone(self._live(self._by_hash.get(token_hash)))
+
+    async def delete_refresh_token(self, token_hash: str):
+        record_id = self._by_hash.get(token_hash)
+        if record_id is not None:
+            self._remove(record_id)
+
+    async def delete_all_user_tokens(self, user_id: str):
+        for record_id in list(self._by_user.get(user_id, ())):
+            self._remove(record_id)
+
+
+# =========================
+# EMAIL OUTBOX
+# =========================
+class MemoryOutboxRepository(OutboxRepository):
+    def __init__(self):
+        self._messages = {}     # _id -> doc, in enqueue order
+
+    def _claimable(self, now: datetime) -> list:
+        due = []
+        for message_id, message in list(self._messages.items()):
+            if message["expires_at"] <= now:
+                del self._messages[message_id]
+            elif (message["status"] == "pending" and message["next_attempt_at"] <= now) or \
+                    (message["status"] == "sending" and message["locked_until"] <= now):
+                due.append(message)
+        return due
+
+    async def enqueue_email(self, template: str, to: str, params: dict, expires_at: datetime):
+        now = _now()
+        message_id = ObjectId()
+        self._messages[message_id] = {
+            "_id": message_id,
+            "template": template,
+            "to": to,
+            "params": _clone(params),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "expires_at": expires_at,
+        }
+
+    async def claim_batch(self, limit: int, lease_seconds: int) -> list:
+        now = _now()
+        batch = sorted(self._claimable(now), key=lambda message: message["next_attempt_at"])[:limit]
+        claim_id = uuid.uuid4().hex
+        for message in batch:
+            message.update({"status": "sending", "claim_id": claim_id, "locked_until": now + timedelta(seconds=lease_seconds)})
+        return _clone(batch)
+
+    async def complete_batch(self, sent_ids: list, retries: list, dead_ids: list):
+        for message_id in sent_ids:
+            self._messages.pop(message_id, None)
+        for message_id, next_attempt_at, error in retries:
+            message = self._messages.get(message_id)
+            if message:
+                message.update({"status": "pending", "next_attempt_at": next_attempt_at, "last_error": error})
+                message["attempts"] = message.get("attempts", 0) + 1
+                message.pop("claim_id", None)
+                message.pop("locked_until", None)
+        for message_id in dead_ids:
+            message = self._messages.get(message_id)
+            if message:
+                message["status"] = "dead"
+                for field in ("params", "claim_id", "locked_until"):
+                    message.pop(field, None)
+
+    async def count_pending(self) -> int:
+        return sum(1 for message in self._messages.values() if message["status"] in ("pending", "sending"))
+
+
+class _WithLatency:
+    """Delays each coroutine method by one simulated round trip; cursors and streams pass straight through."""
+
+    def __init__(self, repository, latency: float, jitter: float):
+        self._repository = repository
+        self._latency = latency
+        self._jitter = jitter
+
+    def __getattr__(self, name):
+        attr = getattr(self._repository, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def delayed(*args, **kwargs):
+            await asyncio.sleep(self._latency + random.uniform(0, self._jitter))
+            return await attr(*args, **kwargs)
+
+        return delayed
+
+
+def create_backend() -> Backend:
+    repositories = {
+        "users": MemoryUserRepository(),
+        "clients": MemoryClientRepository(),
+        "tokens": MemoryTokenRepository(),
+        "outbox": MemoryOutboxRepository(),
+    }
+    if MEMORY_REPOSITORY_LATENCY_MS or MEMORY_REPOSITORY_JITTER_MS:
+        latency, jitter = MEMORY_REPOSITORY_LATENCY_MS / 1000, MEMORY_REPOSITORY_JITTER_MS / 1000
+        repositories = {name: _WithLatency(repo, latency, jitter) for name, repo in repositories.items()}
+    return Backend("memory", **repositories)
@@ -0,0 +1,418 @@
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+
+from database import db
+from db import telemetry_buffer
+from db.repository import Backend, ClientRepository, OutboxRepository, TokenRepository, UserRepository
+from ustils.geo import lookup_location
+
+# Only events that can change a link's status; telemetry updates are filtered out server-side.
+_LINK_STATUS_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace"]}},
+                {"updateDescription.updatedFields.status": {"$exists": True}},
+            ]
+        }
+    }
+]
+
+# Changes the user cache has to hear about; login telemetry and reset OTP writes are filtered out server-side.
+_USER_CHANGE_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace", "delete"]}},
+                {"updateDescription.updatedFields.password_hash": {"$exists": True}},
+                {"updateDescription.updatedFields.is_active": {"$exists": True}},
+                {"updateDescription.updatedFields.email": {"$exists": True}},
+                {"updateDescription.updatedFields.sidhi_id": {"$exists": True}},
+            ]
+        }
+    },
+    {
+        "$project": {
+            "documentKey": 1,
+            "operationType": 1,
+            "fullDocument.sidhi_id": 1,
+            "fullDocument.email": 1,
+            "updateDescription.updatedFields.sidhi_id": 1,
+            "updateDescription.updatedFields.email": 1,
+        }
+    },
+]
+
+
+def _projection(fields: tuple):
+    return {field: 1 for field in fields} if fields else None
+
+
+# =========================
+# USERS
+# =========================
+class MongoUserRepository(UserRepository):
+    async def get_user_by_email(self, email: str, fields: tuple = None):
+        return await db.users.find_one({"email": email}, _projection(fields))
+
+    async def get_user_by_id(self, user_id: str):
+        return await db.users.find_one({"user_id": user_id})
+
+    async def get_user_by_sidhi_id(self, sidhi_id: str, fields: tuple = None):
+        return await db.users.find_one({"sidhi_id": sidhi_id}, _projection(fields))
+
+    async def create_user(self, user: dict):
+        await db.users.insert_one(user)
+
+    async def set_password_hash(self, user_id: str, password_hash: str):
+        await db.users.update_one(
+            {"user_id": user_id},
+            {"$set": {"password_hash": password_hash}}
+        )
+
+    async def set_registration_otp(self, email: str, otp_hash: str, expires_at: datetime, user_data: dict):
+        await db.pending_registrations.update_one(
+            {"email": email},
+            {
+                "$set": {
+                    "otp_hash": otp_hash,
+                    "otp_expires": expires_at,
+                    "otp_attempts": 0,
+                    "user_data": user_data,
+                    "created_at": datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+
+    async def get_pending_registration(self, email: str):
+        return await db.pending_registrations.find_one({"email": email})
+
+    async def increment_registration_otp_attempts(self, email: str):
+        await db.pending_registrations.update_one(
+            {"email": email},
+            {"$inc": {"otp_attempts": 1}}
+        )
+
+    async def delete_pending_registration(self, email: str):
+        await db.pending_registrations.delete_one({"email": email})
+
+    async def set_reset_otp(self, user_id: str, otp_hash: str, expires_at: datetime):
+        await db.users.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "reset_otp_hash": otp_hash,
+                    "reset_otp_expires": expires_at,
+                    "reset_otp_attempts": 0
+                }
+            }
+        )
+
+    async def increment_otp_attempts(self, user_id: str):
+        await db.users.update_one(
+            {"user_id": user_id},
+            {"$inc": {"reset_otp_attempts": 1}}
+        )
+
+    async def clear_reset_otp(self, user_id: str):
+        await db.users.update_one(
+            {"user_id": user_id},
+            {
+                "$unset": {
+                    "reset_otp_hash": "",
+                    "reset_otp_expires": "",
+                    "reset_otp_attempts": ""
+                }
+            }
+        )
+
+    async def record_login(self, user_id: str, ip_address: str, location: dict):
+        # Login-history telemetry; written behind via the telemetry buffer.
+        now = datetime.utcnow()
+        await telemetry_buffer.submit(
+            "users",
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "last_login_ip": ip_address,
+                    "last_login_location": location,
+                    "last_login_at": now
+                },
+                "$push": {
+                    "login_history": {
+                        "$each": [{"ip": ip_address, "location": location, "at": now}],
+                        "$slice": -20
+                    }
+                }
+            }
+        )
+
+    async def count_users(self) -> int:
+        return await db.users.estimated_document_count()
+
+    async def user_keys(self):
+        cursor = db.users.find({}, {"sidhi_id": 1, "email": 1, "_id": 0}).batch_size(5000)
+        async for doc in cursor:
+            yield doc.get("sidhi_id"), doc.get("email")
+
+    def watch_user_changes(self):
+        return db.users.watch(_USER_CHANGE_PIPELINE, max_await_time_ms=1000)
+
+
+# =========================
+# CLIENTS
+# =========================
+class MongoClientRepository(ClientRepository):
+    async def get_client_by_id(self, client_id: str):
+        return await db.clients.find_one(
+            {"client_id": client_id},
+            sort=[("last_seen_at", -1)]
+        )
+
+    async def get_client_link(self, client_id: str, user_id: str):
+        return await db.clients.find_one({"client_id": client_id, "user_id": user_id})
+
+    def find_clients(self, filters: dict, projection: dict, after: ObjectId = None, limit: int = 0, batch_size: int = 500):
+        # Keyset on _id; the Motor cursor keeps memory at one batch.
+        query = {"$and": [filters, {"_id": {"$lt": after}}]} if after else filters
+        cursor = db.clients.find(query, projection).sort("_id", -1).batch_size(batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def get_link_statuses(self, client_ids: list[str]) -> dict:
+        statuses = {}
+        cursor = db.clients.find(
+            {"client_id": {"$in": client_ids}},
+            {"client_id": 1, "user_id": 1, "status": 1, "_id": 0}
+        )
+        async for doc in cursor:
+            statuses[(doc["client_id"], doc["user_id"])] = doc.get("status")
+        return statuses
+
+    async def revoke_client(self, client_id: str):
+        await db.clients.update_many(
+            {"client_id": client_id},
+            {"$set": {"status": "revoked", "revoked_at": datetime.utcnow()}}
+        )
+
+    async def is_client_active(self, client_id: str, user_id: str) -> bool:
+        client = await db.clients.find_one(
+            {"client_id": client_id, "user_id": user_id, "status": "active"},
+            {"status": 1}
+        )
+        return bool(client)
+
+    async def create_client(self, client_id: str, user_id: str, platform: str, app_id: str, app_name: str,
+                            app_version: str, ip_address: str, public_key: str):
+        now = datetime.utcnow()
+        location = lookup_location(ip_address)
+
+        await db.clients.update_one(
+            {"client_id": client_id, "user_id": user_id},
+            {
+                "$set": {
+                    "client_id": client_id,
+                    "user_id": user_id,
+                    "public_key": public_key,
+
+                    "platform": platform,
+                    "app_id": app_id,
+                    "app_name": app_name,
+                    "app_version": app_version,
+
+                    "ip_first_seen": ip_address,
+                    "ip_last_seen": ip_address,
+                    "location_last_seen": location,
+
+                    "last_seen_at": now,
+                    "status": "active"
+                },
+                "$setOnInsert": {
+                    "created_at": now
+                },
+                "$push": {
+                    "ip_history": {
+                        "ip": ip_address,
+                        "location": location,
+                        "seen_at": now
+                    }
+                }
+            },
+            upsert=True
+        )
+
+    async def update_client_activity(self, client_id: str, ip_address: str, user_id: str):
+        # Last-seen/IP telemetry; written behind via the telemetry buffer.
+        now = datetime.utcnow()
+        location = lookup_location(ip_address)
+
+        await telemetry_buffer.submit(
+            "clients",
+            {"client_id": client_id, "user_id": user_id},
+            {
+                "$set": {
+                    "ip_last_seen": ip_address,
+                    "location_last_seen": location,
+                    "last_seen_at": now
+                },
+                "$push": {
+                    "ip_history": {
+                        "$each": [
+                            {
+                                "ip": ip_address,
+                                "location": location,
+                                "seen_at": now
+                            }
+                        ],
+                        "$slice": -10   # keep last 10 IPs only
+                    }
+                }
+            },
+            upsert=True
+        )
+
+    async def revoked_links(self):
+        async for doc in db.clients.find({"status": "revoked"}, {"client_id": 1, "user_id": 1, "_id": 0}):
+            yield doc["client_id"], doc["user_id"]
+
+    def watch_link_status(self):
+        return db.clients.watch(_LINK_STATUS_PIPELINE, full_document="updateLookup", max_await_time_ms=1000)
+
+
+# =========================
+# REFRESH TOKENS
+# =========================
+class MongoTokenRepository(TokenRepository):
+    async def save_refresh_token(self, record_id, user_id: str, client_id: str, token_hash: str,
+                                 scopes: list[str], expires_at: datetime):
+        # client_status is denormalized from clients so a refresh is a single _id read.
+        await db.refresh_tokens.insert_one({
+            "_id": record_id,
+            "user_id": user_id,
+            "client_id": client_id,
+            "client_status": "active",
+            "token_hash": token_hash,
+            "scope": scopes,
+            "expires_at": expires_at,
+            "created_at": datetime.utcnow()
+        })
+
+    async def get_refresh_token_by_id(self, record_id):
+        return await db.refresh_tokens.find_one({"_id": record_id})
+
+    async def rotate_refresh_token(self, record_id, old_hash: str, new_hash: str, expires_at: datetime) -> bool:
+        result = await db.refresh_tokens.update_one(
+            {"_id": record_id, "token_hash": old_hash},
+            {"$set": {"token_hash": new_hash, "expires_at": expires_at, "rotated_at": datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+
+    async def revoke_client_tokens(self, client_id: str):
+        await db.refresh_tokens.update_many(
+            {"client_id": client_id},
+            {"$set": {"client_status": "revoked"}}
+        )
+
+    async def get_refresh_token(self, token_hash: str):
+        return await db.refresh_tokens.find_one({"token_hash": token_hash})
+
+    async def delete_refresh_token(self, token_hash: str):
+        await db.refresh_tokens.delete_one({"token_hash": token_hash})
+
+    async def delete_all_user_tokens(self, user_id: str):
+        await db.refresh_tokens.delete_many({"user_id": user_id})
+
+
+# =========================
+# EMAIL OUTBOX
+# =========================
+def _claimable(now: datetime) -> dict:
+    # Pending and due, or claimed by a dispatcher whose lease ran out (crashed worker).
+    # Expired messages are left for the TTL monitor, which can lag by a minute or more.
+    return {
+        "expires_at": {"$gt": now},
+        "$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_until": {"$lte": now}},
+        ]
+    }
+
+
+class MongoOutboxRepository(OutboxRepository):
+    async def enqueue_email(self, template: str, to: str, params: dict, expires_at: datetime):
+        now = datetime.utcnow()
+        await db.email_outbox.insert_one({
+            "template": template,
+            "to": to,
+            "params": params,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "expires_at": expires_at,
+        })
+
+    async def claim_batch(self, limit: int, lease_seconds: int) -> list:
+        # Three round trips regardless of batch size.
+        now = datetime.utcnow()
+        ids = [
+            doc["_id"]
+            async for doc in db.email_outbox.find(_claimable(now), {"_id": 1})
+            .sort("next_attempt_at", 1)
+            .limit(limit)
+        ]
+        if not ids:
+            return []
+
+        claim_id = uuid.uuid4().hex
+        await db.email_outbox.update_many(
+            {"_id": {"$in": ids}, **_claimable(now)},
+            {
+                "$set": {
+                    "status": "sending",
+                    "claim_id": claim_id,
+                    "locked_until": now + timedelta(seconds=lease_seconds)
+                }
+            }
+        )
+        return await db.email_outbox.find({"claim_id": claim_id}).to_list(length=limit)
+
+    async def complete_batch(self, sent_ids: list, retries: list, dead_ids: list):
+        ops = []
+        if sent_ids:
+            ops.append(DeleteMany({"_id": {"$in": sent_ids}}))
+        for message_id, next_attempt_at, error in retries:
+            ops.append(UpdateOne(
+                {"_id": message_id},
+                {
+                    "$set": {"status": "pending", "next_attempt_at": next_attempt_at, "last_error": error},
+                    "$inc": {"attempts": 1},
+                    "$unset": {"claim_id": "", "locked_until": ""}
+                }
+            ))
+        if dead_ids:
+            ops.append(UpdateMany(
+                {"_id": {"$in": dead_ids}},
+                {"$set": {"status": "dead"}, "$unset": {"params": "", "claim_id": "", "locked_until": ""}}
+            ))
+
+        if ops:
+            await db.email_outbox.bulk_write(ops, ordered=False)
+
+    async def count_pending(self) -> int:
+        return await db.email_outbox.count_documents({"status": {"$in": ["pending", "sending"]}})
+
+
+def create_backend() -> Backend:
+    return Backend(
+        "mongo",
+        users=MongoUserRepository(),
+        clients=MongoClientRepository(),
+        tokens=MongoTokenRepository(),
+        outbox=MongoOutboxRepository(),
+    )
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from db import repository
+from metrics import timed_db
+
+
+def _outbox():
+    return repository.active().outbox
+
+
+@timed_db
+async def enqueue_email(template: str, to: str, params: dict, expires_at: datetime):
+    """Queue an email for the dispatcher. Params may hold an OTP, so the doc is TTL'd at expires_at."""
+    await _outbox().enqueue_email(template, to, params, expires_at)
+
+
+@timed_db
+async def claim_batch(limit: int, lease_seconds: int) -> list:
+    """Atomically claims up to `limit` due messages for this dispatcher, in three round trips regardless of size."""
+    return await _outbox().claim_batch(limit, lease_seconds)
+
+
+@timed_db
+async def complete_batch(sent_ids: list, retries: list, dead_ids: list):
+    """
+    Records a delivery round in one bulk write.
+    retries: (id, next_attempt_at, error) tuples.
+    Sent messages are deleted and dead ones lose their params, so OTPs don't linger.
+    """
+    await _outbox().complete_batch(sent_ids, retries, dead_ids)
+
+
+@timed_db
+async def count_pending() -> int:
+    return await _outbox().count_pending()
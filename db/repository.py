@@ -0,0 +1,192 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from bson import ObjectId
+
+# =====================
+# Repository backend
+# =====================
+# db/user_repo.py, client_repo.py, token_repo.py and outbox_repo.py are the
+# API the services call; they delegate to the backend chosen here.
+#   mongo    Motor (db/mongo_repository.py), the production store
+#   memory   process-local dicts with secondary indexes (db/memory_repository.py),
+#            for tests, CI and benchmarks; nothing survives a restart
+REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "mongo")
+
+
+class UserRepository(ABC):
+    # `fields` limits the returned document to those fields (plus _id); None returns all of it.
+    @abstractmethod
+    async def get_user_by_email(self, email: str, fields: tuple = None): ...
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: str): ...
+
+    @abstractmethod
+    async def get_user_by_sidhi_id(self, sidhi_id: str, fields: tuple = None): ...
+
+    @abstractmethod
+    async def create_user(self, user: dict): ...
+
+    @abstractmethod
+    async def set_password_hash(self, user_id: str, password_hash: str): ...
+
+    @abstractmethod
+    async def set_registration_otp(self, email: str, otp_hash: str, expires_at: datetime, user_data: dict): ...
+
+    @abstractmethod
+    async def get_pending_registration(self, email: str): ...
+
+    @abstractmethod
+    async def increment_registration_otp_attempts(self, email: str): ...
+
+    @abstractmethod
+    async def delete_pending_registration(self, email: str): ...
+
+    @abstractmethod
+    async def set_reset_otp(self, user_id: str, otp_hash: str, expires_at: datetime): ...
+
+    @abstractmethod
+    async def increment_otp_attempts(self, user_id: str): ...
+
+    @abstractmethod
+    async def clear_reset_otp(self, user_id: str): ...
+
+    @abstractmethod
+    async def record_login(self, user_id: str, ip_address: str, location: dict): ...
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        """May be an estimate; used for sizing."""
+
+    @abstractmethod
+    def user_keys(self):
+        """Async iterator of (sidhi_id, email) for every user."""
+
+    @abstractmethod
+    def watch_user_changes(self):
+        """
+        Async context manager yielding a stream whose try_next() returns
+        change-stream-shaped events ({"documentKey": {"_id": ...}, ...}) for
+        inserts, deletes and changes to the auth fields, or None. Inserts carry
+        fullDocument.sidhi_id / email; updates to those carry them in
+        updateDescription.updatedFields.
+        """
+
+
+class ClientRepository(ABC):
+    @abstractmethod
+    async def get_client_by_id(self, client_id: str): ...
+
+    @abstractmethod
+    async def get_client_link(self, client_id: str, user_id: str): ...
+
+    @abstractmethod
+    def find_clients(self, filters: dict, projection: dict, after: ObjectId = None, limit: int = 0, batch_size: int = 500):
+        """Cursor (async iterable with to_list) over links, newest activity first."""
+
+    @abstractmethod
+    async def get_link_statuses(self, client_ids: list[str]) -> dict: ...
+
+    @abstractmethod
+    async def revoke_client(self, client_id: str): ...
+
+    @abstractmethod
+    async def is_client_active(self, client_id: str, user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def create_client(self, client_id: str, user_id: str, platform: str, app_id: str, app_name: str,
+                            app_version: str, ip_address: str, public_key: str): ...
+
+    @abstractmethod
+    async def update_client_activity(self, client_id: str, ip_address: str, user_id: str): ...
+
+    @abstractmethod
+    def revoked_links(self):
+        """Async iterator of (client_id, user_id) for every revoked link."""
+
+    @abstractmethod
+    def watch_link_status(self):
+        """
+        Async context manager yielding a stream whose try_next() returns
+        change-stream-shaped events ({"fullDocument": link, ...}) or None.
+        """
+
+
+class TokenRepository(ABC):
+    @abstractmethod
+    async def save_refresh_token(self, record_id, user_id: str, client_id: str, token_hash: str,
+                                 scopes: list[str], expires_at: datetime): ...
+
+    @abstractmethod
+    async def get_refresh_token_by_id(self, record_id): ...
+
+    @abstractmethod
+    async def rotate_refresh_token(self, record_id, old_hash: str, new_hash: str, expires_at: datetime) -> bool: ...
+
+    @abstractmethod
+    async def revoke_client_tokens(self, client_id: str): ...
+
+    @abstractmethod
+    async def get_refresh_token(self, token_hash: str): ...
+
+    @abstractmethod
+    async def delete_refresh_token(self, token_hash: str): ...
+
+    @abstractmethod
+    async def delete_all_user_tokens(self, user_id: str): ...
+
+
+class OutboxRepository(ABC):
+    @abstractmethod
+    async def enqueue_email(self, template: str, to: str, params: dict, expires_at: datetime): ...
+
+    @abstractmethod
+    async def claim_batch(self, limit: int, lease_seconds: int) -> list: ...
+
+    @abstractmethod
+    async def complete_batch(self, sent_ids: list, retries: list, dead_ids: list): ...
+
+    @abstractmethod
+    async def count_pending(self) -> int: ...
+
+
+class Backend:
+    def __init__(self, name: str, users: UserRepository, clients: ClientRepository,
+                 tokens: TokenRepository, outbox: OutboxRepository):
+        self.name = name
+        self.users = users
+        self.clients = clients
+        self.tokens = tokens
+        self.outbox = outbox
+
+
+_backend = None
+
+
+def create(name: str) -> Backend:
+    if name == "mongo":
+        from db import mongo_repository
+        return mongo_repository.create_backend()
+    if name == "memory":
+        from db import memory_repository
+        return memory_repository.create_backend()
+    raise RuntimeError(f"Unknown REPOSITORY_BACKEND {name!r} (expected 'mongo' or 'memory')")
+
+
+def active() -> Backend:
+    global _backend
+    if _backend is None:
+        _backend = create(REPOSITORY_BACKEND)
+    return _backend
+
+
+def use(backend: Backend):
+    """Swaps the backend in place (tests, benchmarks)."""
+    global _backend
+    _backend = backend
+
+
+def uses_mongo() -> bool:
+    return active().name == "mongo"
@@ -0,0 +1,247 @@
+import asyncio
+import fcntl
+import glob
+import os
+import time
+from collections import deque
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import db
+from metrics import timed_db
+from ustils.percentiles import percentiles
+
+# =====================
+# Write-behind configuration
+# =====================
+# Device and login telemetry (ip_history, login_history, last-seen fields) is
+# for fraud monitoring only, so logins hand it to this buffer instead of
+# waiting on Mongo. It is flushed as unordered bulk_writes per collection.
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "500"))
+TELEMETRY_FLUSH_MS = int(os.getenv("TELEMETRY_FLUSH_MS", "250"))
+TELEMETRY_MAX_PENDING = int(os.getenv("TELEMETRY_MAX_PENDING", "20000"))
+TELEMETRY_BACKPRESSURE_MS = int(os.getenv("TELEMETRY_BACKPRESSURE_MS", "50"))
+TELEMETRY_SPILL_PATH = os.getenv("TELEMETRY_SPILL_PATH", "/tmp/sidhilynx-telemetry.spill")
+
+_pending = deque()
+_wakeup = asyncio.Event()
+_drained = asyncio.Event()
+_task = None
+_stopping = False
+_flush_times = deque(maxlen=512)
+_counters = {
+    "submitted": 0,
+    "flushed": 0,
+    "spilled": 0,
+    "replayed": 0,
+    "failed_flushes": 0,
+}
+
+
+# =====================
+# DISK SPILL
+# =====================
+def _spill(entries: list):
+    """Appends entries as extended-JSON lines; shared by all workers, so appends hold an flock."""
+    if not entries:
+        return
+    lines = "".join(
+        json_util.dumps({"c": c, "f": f, "u": u, "upsert": upsert}) + "\n"
+        for c, f, u, upsert in entries
+    )
+    with open(TELEMETRY_SPILL_PATH, "a", encoding="utf-8") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            fh.write(lines)
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+    _counters["spilled"] += len(entries)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _take_spill() -> list:
+    """
+    Claims spilled entries by renaming the file to <path>.<pid>.replay (atomic,
+    so one worker wins). Replay files of live workers are theirs; those left by
+    dead workers are claimed the same way, by renaming them to this pid first.
+    """
+    pid = os.getpid()
+    try:
+        os.rename(TELEMETRY_SPILL_PATH, f"{TELEMETRY_SPILL_PATH}.{pid}.replay")
+    except FileNotFoundError:
+        pass
+
+    prefix = f"{TELEMETRY_SPILL_PATH}."
+    for path in glob.glob(f"{prefix}*.replay"):
+        owner = path[len(prefix):].split(".", 1)[0]
+        if not owner.isdigit() or int(owner) == pid or _pid_alive(int(owner)):
+            continue
+        try:
+            os.rename(path, f"{prefix}{pid}.{path[len(prefix):]}")
+        except FileNotFoundError:
+            continue    # another worker claimed it first
+
+    entries = []
+    for path in glob.glob(f"{prefix}{pid}.*replay"):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                doc = json_util.loads(line)
+                entries.append((doc["c"], doc["f"], doc["u"], doc["upsert"]))
+        os.remove(path)
+    return entries
+
+
+# =====================
+# PRODUCER SIDE
+# =====================
+async def submit(collection: str, filter: dict, update: dict, upsert: bool = False):
+    """Queues an update for write-behind. Waits briefly if the buffer is full, then spills to disk."""
+    _counters["submitted"] += 1
+    entry = (collection, filter, update, upsert)
+
+    if len(_pending) >= TELEMETRY_MAX_PENDING:
+        _drained.clear()
+        _wakeup.set()
+        try:
+            await asyncio.wait_for(_drained.wait(), TELEMETRY_BACKPRESSURE_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        if len(_pending) >= TELEMETRY_MAX_PENDING:
+            _spill([entry])
+            return
+
+    _pending.append(entry)
+    if len(_pending) >= TELEMETRY_BATCH_SIZE:
+        _wakeup.set()
+
+
+# =====================
+# FLUSHING
+# =====================
+def _failed_entries(entries: list, error: Exception) -> list:
+    # An unordered bulk_write reports exactly which ops failed; the rest are
+    # committed and must not be replayed ($push isn't idempotent).
+    if isinstance(error, BulkWriteError):
+        return [entries[e["index"]] for e in error.details.get("writeErrors", [])]
+    return entries
+
+
+@timed_db
+async def _write(entries: list) -> tuple:
+    """One unordered bulk_write per collection. Returns (entries that weren't written, first error)."""
+    by_collection = {}
+    for entry in entries:
+        by_collection.setdefault(entry[0], []).append(entry)
+
+    results = await asyncio.gather(*[
+        db[collection].bulk_write(
+            [UpdateOne(filter, update, upsert=upsert) for _, filter, update, upsert in group],
+            ordered=False
+        )
+        for collection, group in by_collection.items()
+    ], return_exceptions=True)
+
+    failed, error = [], None
+    for group, result in zip(by_collection.values(), results):
+        if isinstance(result, Exception):
+            failed.extend(_failed_entries(group, result))
+            error = error or result
+    return failed, error
+
+
+async def _flush_once() -> int:
+    batch = []
+    while _pending and len(batch) < TELEMETRY_BATCH_SIZE:
+        batch.append(_pending.popleft())
+    if not batch:
+        return 0
+
+    start = time.perf_counter()
+    try:
+        failed, error = await _write(batch)
+    finally:
+        _flush_times.append(time.perf_counter() - start)
+
+    _counters["flushed"] += len(batch) - len(failed)
+    if failed:
+        # Mongo is slow or down: keep the data on disk rather than holding it in memory.
+        _counters["failed_flushes"] += 1
+        print(f"[telemetry] {len(failed)} of {len(batch)} updates failed, spilling: {error!r}")
+        _spill(failed)
+        return 0
+
+    if len(_pending) < TELEMETRY_MAX_PENDING:
+        _drained.set()
+    return len(batch)
+
+
+async def _replay_spill():
+    if not os.path.exists(TELEMETRY_SPILL_PATH) and not glob.glob(f"{TELEMETRY_SPILL_PATH}.*.replay"):
+        return
+    entries = _take_spill()
+    for i in range(0, len(entries), TELEMETRY_BATCH_SIZE):
+        chunk = entries[i:i + TELEMETRY_BATCH_SIZE]
+        failed, error = await _write(chunk)
+        _counters["replayed"] += len(chunk) - len(failed)
+        if failed:
+            print(f"[telemetry] spill replay failed, keeping on disk: {error!r}")
+            _spill(failed + entries[i + TELEMETRY_BATCH_SIZE:])
+            return
+
+
+async def _run():
+    while not _stopping:
+        _wakeup.clear()
+        try:
+            # Keep draining while there's a full batch waiting.
+            while await _flush_once() == TELEMETRY_BATCH_SIZE:
+                pass
+            if not _pending:
+                await _replay_spill()
+        except Exception as e:
+            print(f"[telemetry] flush loop error: {e!r}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), TELEMETRY_FLUSH_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start():
+    global _task, _stopping
+    if _task is None:
+        _stopping = False
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    """Flushes everything still buffered; whatever can't be written is spilled for the next start."""
+    global _task, _stopping
+    _stopping = True
+    _wakeup.set()
+    if _task is not None:
+        await _task
+        _task = None
+    while _pending:
+        await _flush_once()
+
+
+def stats() -> dict:
+    flush_p50, flush_p99 = percentiles(_flush_times, 0.50, 0.99, scale=1000, ndigits=2)
+    return {
+        **_counters,
+        "queue_depth": len(_pending),
+        "flush_p50_ms": flush_p50,
+        "flush_p99_ms": flush_p99,
+    }
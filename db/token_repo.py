@@ -1,29 +1,52 @@
-from database import db
 from datetime import datetime
 
+from db import repository
+from metrics import timed_db
 
+
+def _tokens():
+    return repository.active().tokens
+
+
+@timed_db
 async def save_refresh_token(
+    record_id,
     user_id: str,
     client_id: str,
     token_hash: str,
+    scopes: list[str],
     expires_at: datetime
 ):
-    await db.refresh_tokens.insert_one({
-        "user_id": user_id,
-        "client_id": client_id,
-        "token_hash": token_hash,
-        "expires_at": expires_at,
-        "created_at": datetime.utcnow()
-    })
+    await _tokens().save_refresh_token(record_id, user_id, client_id, token_hash, scopes, expires_at)
+
+
+@timed_db
+async def get_refresh_token_by_id(record_id):
+    return await _tokens().get_refresh_token_by_id(record_id)
+
+
+@timed_db
+async def rotate_refresh_token(record_id, old_hash: str, new_hash: str, expires_at: datetime) -> bool:
+    """Swaps the secret in place. Matching on the old hash makes each secret single-use."""
+    return await _tokens().rotate_refresh_token(record_id, old_hash, new_hash, expires_at)
+
+
+@timed_db
+async def revoke_client_tokens(client_id: str):
+    await _tokens().revoke_client_tokens(client_id)
 
 
+# Legacy user_id.client_id.timestamp tokens, addressable only by hash.
+@timed_db
 async def get_refresh_token(token_hash: str):
-    return await db.refresh_tokens.find_one({"token_hash": token_hash})
+    return await _tokens().get_refresh_token(token_hash)
 
 
+@timed_db
 async def delete_refresh_token(token_hash: str):
-    await db.refresh_tokens.delete_one({"token_hash": token_hash})
+    await _tokens().delete_refresh_token(token_hash)
 
 
+@timed_db
 async def delete_all_user_tokens(user_id: str):
-    await db.refresh_tokens.delete_many({"user_id": user_id})
+    await _tokens().delete_all_user_tokens(user_id)
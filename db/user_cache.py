@@ -0,0 +1,126 @@
+import os
+
+from db import user_changes
+from ustils.lru import LRUCache
+
+# =====================
+# User cache configuration
+# =====================
+# Read-through cache of the auth projection of user records (user_repo.AUTH_FIELDS),
+# looked up by sidhi_id or email. Writes through user_repo invalidate the
+# entry locally. Changes made by other workers arrive on the shared users
+# change stream (db/user_changes.py). Without a change stream (standalone
+# mongod) nothing would tell this worker about a password reset done
+# elsewhere, so the cache stays off until the stream is open.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+# user_id -> projected record
+_records = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+# ("sidhi_id" | "email" | "_id", value) -> user_id; pruned when it outgrows the records.
+_aliases = {}
+# Bumped by every invalidation, so a read that raced a write doesn't cache the old record.
+_generation = 0
+_enabled = False
+_metrics = {
+    "mode": "off",
+    "invalidations": 0,
+    "remote_invalidations": 0,
+    "stale_puts_skipped": 0,
+}
+
+
+def generation() -> int:
+    return _generation
+
+
+def get(field: str, value: str):
+    if not _enabled:
+        return None
+    user_id = _aliases.get((field, value))
+    if user_id is None:
+        _records.misses += 1
+        return None
+    record = _records.get(user_id)
+    return dict(record) if record is not None else None
+
+
+def put(record: dict, read_generation: int):
+    """Caches a record read while the generation was `read_generation`."""
+    if not _enabled:
+        return
+    if read_generation != _generation:
+        _metrics["stale_puts_skipped"] += 1
+        return
+    user_id = record["user_id"]
+    _records.set(user_id, dict(record))
+    for field in ("sidhi_id", "email", "_id"):
+        if record.get(field) is not None:
+            _aliases[(field, record[field])] = user_id
+    if len(_aliases) > 4 * max(1, USER_CACHE_SIZE):
+        _prune_aliases()
+
+
+def _prune_aliases():
+    for key in [key for key, user_id in _aliases.items() if user_id not in _records]:
+        del _aliases[key]
+
+
+def invalidate(user_id: str = None, **aliases):
+    """Drops a user by user_id and/or any alias (sidhi_id=, email=, _id=)."""
+    global _generation
+    _generation += 1
+    _metrics["invalidations"] += 1
+    user_ids = {user_id} if user_id is not None else set()
+    for field, value in aliases.items():
+        if value is not None:
+            aliased = _aliases.pop((field, value), None)
+            if aliased is not None:
+                user_ids.add(aliased)
+    for uid in user_ids:
+        _records.pop(uid)
+
+
+def clear():
+    global _generation
+    _generation += 1
+    _records.clear()
+    _aliases.clear()
+
+
+# =====================
+# CROSS-WORKER INVALIDATION
+# =====================
+def _apply_event(event: dict):
+    document_key = event.get("documentKey") or {}
+    if "_id" in document_key:
+        _metrics["remote_invalidations"] += 1
+        invalidate(_id=document_key["_id"])
+
+
+async def _opened():
+    global _enabled
+    # Anything cached before the stream opened may have missed a change.
+    clear()
+    _enabled = True
+    _metrics["mode"] = "change_stream"
+
+
+async def _changed(event):
+    if event is not None:
+        _apply_event(event)
+
+
+async def _closed():
+    global _enabled
+    _enabled = False
+    _metrics["mode"] = "off"
+    clear()
+
+
+if USER_CACHE_SIZE > 0:
+    user_changes.listen(_opened, _changed, _closed)
+
+
+def stats() -> dict:
+    return {**_metrics, **_records.stats(), "aliases": len(_aliases)}
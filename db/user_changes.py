@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+from pymongo.errors import PyMongoError
+
+from db import repository
+
+# =====================
+# Users change stream
+# =====================
+# One change stream on users per worker, fanned out to the modules that
+# mirror user state in memory (db/user_cache.py, db/user_filter.py). Each
+# registers three coroutines with listen():
+#   opened()        the stream is open; state built before now may be stale
+#   changed(event)  every event, and None about once a second when idle
+#   closed()        the stream dropped; stop trusting in-memory state
+# Without change streams (standalone mongod) the stream never opens and the
+# listeners stay off; it is retried every USER_CHANGES_RETRY_SECONDS.
+USER_CHANGES_RETRY_SECONDS = float(os.getenv("USER_CHANGES_RETRY_SECONDS", "60"))
+
+_listeners = []
+_task = None
+_metrics = {"mode": "off", "events": 0, "opens": 0}
+
+
+def listen(opened, changed, closed):
+    _listeners.append((opened, changed, closed))
+
+
+async def _watch():
+    async with repository.active().users.watch_user_changes() as stream:
+        _metrics["opens"] += 1
+        for opened, _, _ in _listeners:
+            await opened()
+        _metrics["mode"] = "change_stream"
+        while True:
+            event = await stream.try_next()
+            if event is not None:
+                _metrics["events"] += 1
+            for _, changed, _ in _listeners:
+                await changed(event)
+
+
+async def _run():
+    while True:
+        try:
+            await _watch()
+        except PyMongoError as e:
+            print(f"[user_changes] change stream unavailable, retrying in {USER_CHANGES_RETRY_SECONDS}s: {e!r}")
+        finally:
+            _metrics["mode"] = "off"
+            for _, _, closed in _listeners:
+                await closed()
+        await asyncio.sleep(USER_CHANGES_RETRY_SECONDS)
+
+
+def start():
+    global _task
+    if _task is None and _listeners:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def stats() -> dict:
+    return {**_metrics, "listeners": len(_listeners)}
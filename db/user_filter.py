@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+
+from pymongo.errors import PyMongoError
+
+from db import repository, user_changes
+from ustils.bloom import BloomFilter
+
+# =====================
+# User filter configuration
+# =====================
+# Per-worker Bloom filter over every sidhi_id and email, so lookups for
+# accounts that don't exist (credential stuffing on /login, enumeration on
+# /forgot-password) are answered without a Mongo round trip. Built in bulk
+# when the shared users change stream (db/user_changes.py) opens, extended by
+# local create_user calls and by that stream for accounts created on other
+# workers, and rebuilt periodically to shed deleted accounts. Without a
+# change stream this worker couldn't see new accounts created elsewhere, so
+# the filter stays off (every lookup goes to Mongo) until the stream is open.
+USER_FILTER_ENABLED = os.getenv("USER_FILTER_ENABLED", "1") == "1"
+USER_FILTER_FP_RATE = float(os.getenv("USER_FILTER_FP_RATE", "0.01"))
+# Sized for this many keys (two per user) or 1.5x the current count, whichever is larger.
+USER_FILTER_MIN_CAPACITY = int(os.getenv("USER_FILTER_MIN_CAPACITY", "100000"))
+USER_FILTER_REBUILD_SECONDS = float(os.getenv("USER_FILTER_REBUILD_SECONDS", "3600"))
+USER_FILTER_BUILD_RETRY_SECONDS = float(os.getenv("USER_FILTER_BUILD_RETRY_SECONDS", "60"))
+
+_KEY_FIELDS = ("sidhi_id", "email")
+
+# None while off or still building: every lookup may exist.
+_filter = None
+# Builds run beside the stream so they never hold up cache invalidations.
+# Keys that arrive meanwhile are kept in the backlog and added to the new filter.
+_building = None
+_backlog = None
+_next_build_at = 0.0    # monotonic
+_metrics = {
+    "mode": "off",
+    "checks": 0,
+    "definite_misses": 0,
+    "false_positives": 0,
+    "events": 0,
+    "rebuilds": 0,
+    "last_build_ms": None,
+}
+
+
+def _key(field: str, value: str) -> str:
+    return f"{field}:{value}"
+
+
+def might_exist(field: str, value: str) -> bool:
+    """False only if no user has this sidhi_id / email."""
+    bloom = _filter
+    if bloom is None:
+        return True
+    _metrics["checks"] += 1
+    if _key(field, value) in bloom:
+        return True
+    _metrics["definite_misses"] += 1
+    return False
+
+
+def false_positive():
+    """The filter said maybe and the repository found nobody."""
+    if _filter is not None:
+        _metrics["false_positives"] += 1
+
+
+def add(user: dict):
+    keys = [_key(field, user[field]) for field in _KEY_FIELDS if user.get(field)]
+    if _backlog is not None:
+        _backlog.extend(keys)
+    bloom = _filter
+    if bloom is not None:
+        for key in keys:
+            bloom.add(key)
+
+
+async def build() -> BloomFilter:
+    """A fresh filter over every user in the repository; the caller swaps it in."""
+    start = time.perf_counter()
+    users = repository.active().users
+    expected = 2 * await users.count_users()
+    bloom = BloomFilter(max(USER_FILTER_MIN_CAPACITY, int(expected * 1.5)), USER_FILTER_FP_RATE)
+    added = 0
+    async for sidhi_id, email in users.user_keys():
+        bloom.add(_key("sidhi_id", sidhi_id))
+        bloom.add(_key("email", email))
+        added += 1
+        if added % 1000 == 0:
+            # A large users collection would otherwise hold the event loop for seconds.
+            await asyncio.sleep(0)
+    _metrics["rebuilds"] += 1
+    _metrics["last_build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return bloom
+
+
+# =====================
+# CROSS-WORKER UPDATES
+# =====================
+def _apply_event(event: dict):
+    doc = event.get("fullDocument") or {}
+    updated = (event.get("updateDescription") or {}).get("updatedFields") or {}
+    user = {field: doc.get(field) or updated.get(field) for field in _KEY_FIELDS}
+    if any(user.values()):
+        _metrics["events"] += 1
+        add(user)
+
+
+async def _rebuild():
+    global _filter, _building, _backlog, _next_build_at
+    try:
+        bloom = await build()
+    except PyMongoError as e:
+        print(f"[user_filter] build failed, retrying in {USER_FILTER_BUILD_RETRY_SECONDS}s: {e!r}")
+        _next_build_at = time.monotonic() + USER_FILTER_BUILD_RETRY_SECONDS
+    else:
+        for key in _backlog:
+            bloom.add(key)
+        _filter = bloom
+        _metrics["mode"] = "change_stream"
+    finally:
+        _building = None
+        _backlog = None
+
+
+def _start_build():
+    global _building, _backlog, _next_build_at
+    _next_build_at = time.monotonic() + USER_FILTER_REBUILD_SECONDS
+    _backlog = []
+    _building = asyncio.create_task(_rebuild())
+
+
+async def _opened():
+    # The stream is open first, so accounts created during the build reach the backlog.
+    if _building is None:
+        _metrics["mode"] = "building"
+        _start_build()
+
+
+async def _changed(event):
+    if event is not None:
+        _apply_event(event)
+    # Deleted accounts only leave the filter on a rebuild; so does overfilling.
+    bloom = _filter
+    if _building is None and (time.monotonic() >= _next_build_at or (bloom is not None and bloom.count > bloom.capacity)):
+        _start_build()
+
+
+async def _closed():
+    global _filter, _building, _backlog
+    _filter = None
+    _metrics["mode"] = "off"
+    if _building is not None:
+        _building.cancel()
+        try:
+            await _building
+        except asyncio.CancelledError:
+            pass
+        # A build cancelled before it started never reached its finally.
+        _building = _backlog = None
+
+
+if USER_FILTER_ENABLED:
+    user_changes.listen(_opened, _changed, _closed)
+
+
+def stats() -> dict:
+    bloom = _filter
+    # Among lookups for absent keys, the share the filter let through to Mongo.
+    absent = _metrics["definite_misses"] + _metrics["false_positives"]
+    return {
+        **_metrics,
+        "keys": bloom.count if bloom else 0,
+        "capacity": bloom.capacity if bloom else 0,
+        "bytes": bloom.nbytes if bloom else 0,
+        "hashes": bloom.num_hashes if bloom else 0,
+        "target_fp_rate": USER_FILTER_FP_RATE,
+        "estimated_fp_rate": round(bloom.estimated_fp_rate(), 6) if bloom else None,
+        "observed_fp_rate": round(_metrics["false_positives"] / absent, 6) if absent else None,
+    }
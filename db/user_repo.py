@@ -1,97 +1,112 @@
-from database import db
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+
+from db import repository, user_cache, user_filter
+from metrics import timed_db
+from ustils.percentiles import percentiles
+
+# What login, registration and Google sign-in read; these lookups go through db/user_cache.py.
+AUTH_FIELDS = ("user_id", "sidhi_id", "email", "password_hash", "is_active")
+# Password reset also needs the OTP state, which is always read fresh.
+RESET_FIELDS = AUTH_FIELDS + ("reset_otp_hash", "reset_otp_expires", "reset_otp_attempts")
+
+# Recent repository lookup times. A definite Bloom-filter miss waits the median
+# of these before answering, so skipping Mongo doesn't make unknown IDs faster
+# than real ones by a round trip.
+_fetch_times = deque(maxlen=256)
+
+
+def _users():
+    return repository.active().users
+
 
-async def get_user_by_email(email: str):
-    return await db.users.find_one({"email": email})
+async def _lookup(field: str, value: str, fields: tuple, fetch):
+    # Cache (auth projection only), then the Bloom filter, then the repository.
+    cacheable = fields == AUTH_FIELDS
+    if cacheable:
+        user = user_cache.get(field, value)
+        if user is not None:
+            return user
+    if not user_filter.might_exist(field, value):
+        await asyncio.sleep(percentiles(_fetch_times, 0.50)[0])
+        return None
+    read_generation = user_cache.generation()
+    start = time.perf_counter()
+    user = await fetch(value, fields)
+    _fetch_times.append(time.perf_counter() - start)
+    if user is None:
+        user_filter.false_positive()
+    elif cacheable:
+        user_cache.put(user, read_generation)
+    return user
 
+
+async def get_user_by_email(email: str, fields: tuple = AUTH_FIELDS):
+    return await _lookup("email", email, fields, _fetch_user_by_email)
+
+@timed_db
+async def _fetch_user_by_email(email: str, fields: tuple):
+    return await _users().get_user_by_email(email, fields)
+
+@timed_db
 async def get_user_by_id(user_id: str):
-    return await db.users.find_one({"user_id": user_id})
+    return await _users().get_user_by_id(user_id)
 
+@timed_db
 async def create_user(user: dict):
-    await db.users.insert_one(user)
+    await _users().create_user(user)
+    user_filter.add(user)
+    user_cache.invalidate(user["user_id"], email=user.get("email"), sidhi_id=user.get("sidhi_id"))
 
-async def get_user_by_sidhi_id(sidhi_id: str):
-    return await db.users.find_one({"sidhi_id": sidhi_id})
+async def get_user_by_sidhi_id(sidhi_id: str, fields: tuple = AUTH_FIELDS):
+    return await _lookup("sidhi_id", sidhi_id, fields, _fetch_user_by_sidhi_id)
 
+@timed_db
+async def _fetch_user_by_sidhi_id(sidhi_id: str, fields: tuple):
+    return await _users().get_user_by_sidhi_id(sidhi_id, fields)
+
+@timed_db
+async def set_password_hash(user_id: str, password_hash: str):
+    await _users().set_password_hash(user_id, password_hash)
+    user_cache.invalidate(user_id)
 
-from database import db
-from datetime import datetime
-# Add to user_repo.py (at the bottom)
 
+@timed_db
 async def set_registration_otp(email: str, otp_hash: str, expires_at: datetime, user_data: dict):
     """Store pending registration with OTP"""
-    await db.pending_registrations.update_one(
-        {"email": email},
-        {
-            "$set": {
-                "otp_hash": otp_hash,
-                "otp_expires": expires_at,
-                "otp_attempts": 0,
-                "user_data": user_data,
-                "created_at": datetime.utcnow()
-            }
-        },
-        upsert=True
-    )
+    await _users().set_registration_otp(email, otp_hash, expires_at, user_data)
 
+@timed_db
 async def get_pending_registration(email: str):
     """Get pending registration by email"""
-    return await db.pending_registrations.find_one({"email": email})
+    return await _users().get_pending_registration(email)
 
+@timed_db
 async def increment_registration_otp_attempts(email: str):
     """Increment failed OTP attempts"""
-    await db.pending_registrations.update_one(
-        {"email": email},
-        {"$inc": {"otp_attempts": 1}}
-    )
+    await _users().increment_registration_otp_attempts(email)
 
+@timed_db
 async def delete_pending_registration(email: str):
     """Remove pending registration after success"""
-    await db.pending_registrations.delete_one({"email": email})
+    await _users().delete_pending_registration(email)
+
+@timed_db
 async def set_reset_otp(user_id: str, otp_hash: str, expires_at: datetime):
-    await db.users.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "reset_otp_hash": otp_hash,
-                "reset_otp_expires": expires_at,
-                "reset_otp_attempts": 0
-            }
-        }
-    )
+    await _users().set_reset_otp(user_id, otp_hash, expires_at)
 
+@timed_db
 async def increment_otp_attempts(user_id: str):
-    await db.users.update_one(
-        {"user_id": user_id},
-        {"$inc": {"reset_otp_attempts": 1}}
-    )
+    await _users().increment_otp_attempts(user_id)
 
+@timed_db
 async def clear_reset_otp(user_id: str):
-    await db.users.update_one(
-        {"user_id": user_id},
-        {
-            "$unset": {
-                "reset_otp_hash": "",
-                "reset_otp_expires": "",
-                "reset_otp_attempts": ""
-            }
-        }
-    )
+    await _users().clear_reset_otp(user_id)
 
 
+@timed_db
 async def record_login(user_id: str, ip_address: str, location: dict):
-    await db.users.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "last_login_ip": ip_address,
-                "last_login_location": location,
-                "last_login_at": datetime.utcnow()
-            },
-            "$push": {
-                "login_history": {
-                    "$each": [{"ip": ip_address, "location": location, "at": datetime.utcnow()}],
-                    "$slice": -20
-                }
-            }
-        }
-    )
+    """Login-history telemetry; the Mongo backend writes it behind via the telemetry buffer."""
+    await _users().record_login(user_id, ip_address, location)
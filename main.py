@@ -1,18 +1,79 @@
+import asyncio
+import hmac
 import os
+import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+import auth_utils
+import database
+import metrics
 from rate_limit import limiter
+from security import jwt_keys
 from api.v1.users import router as auth_router
 from api.v1.admin_clients import router as admin_clients_router
+from db import repository, telemetry_buffer, user_changes
+from db.indexes import ensure_indexes
+from services import client_revocations, email_outbox, google_id_token, password_hasher, warmup
+from services.password_hasher import HashingBusyError
+from ustils import geo, request_profiler, spans
 
 
-app = FastAPI(title="CLG Project")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    use_mongo = repository.uses_mongo()
+    if use_mongo:
+        database.connect()
+    warmup_task = asyncio.create_task(warmup.warm_up())
+    if not use_mongo:
+        print(f"[repository] using the {repository.active().name} backend; Mongo is not used")
+    elif await database.warm_up():
+        await ensure_indexes()
+    else:
+        print("[indexes] skipped: Mongo unreachable at startup (run python -m db.indexes once it is back)")
+    password_hasher.start()
+    email_outbox.start()
+    if use_mongo:
+        telemetry_buffer.start()
+    client_revocations.start()
+    user_changes.start()
+    google_id_token.start()
+    metrics.start()
+    yield
+    warmup_task.cancel()
+    await metrics.stop()
+    await google_id_token.stop()
+    await user_changes.stop()
+    await client_revocations.stop()
+    await telemetry_buffer.stop()
+    await email_outbox.stop()
+    password_hasher.shutdown()
+    database.close()
+
+
+app = FastAPI(title="CLG Project", lifespan=lifespan)
 
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    metrics.rate_limit_child(request.scope.get("route")).inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -30,6 +91,52 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    metrics.observe_request(
+        request.scope.get("route"), request.method, response.status_code, time.perf_counter() - start
+    )
+    return response
+
+
+# Span names reveal which stages ran (e.g. whether Argon2 was reached on a
+# login), so the breakdown is only returned to callers holding this key.
+DEBUG_TIMING_KEY = os.getenv("DEBUG_TIMING_KEY")
+
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    flag = request.headers.get("X-Debug-Timing")
+    # Compared as bytes: compare_digest raises on non-ASCII str, and any client can send the header.
+    debug = bool(DEBUG_TIMING_KEY and flag) and hmac.compare_digest(flag.encode(), DEBUG_TIMING_KEY.encode())
+    profiler = request_profiler.start(forced=debug and request.headers.get("X-Debug-Profile") == "1")
+    token = spans.start_recording() if debug else None
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        elapsed = time.perf_counter() - start
+        recorded = spans.stop_recording(token) if token is not None else None
+        profile_path = await request_profiler.finish(profiler, request.method, request.url.path, elapsed) if profiler else None
+
+    if recorded is not None:
+        response.headers["Server-Timing"] = spans.server_timing(recorded, elapsed)
+        if profile_path:
+            response.headers["X-Debug-Profile"] = os.path.basename(profile_path)
+    return response
+
+
+@app.middleware("http")
+async def geo_request_memo(request: Request, call_next):
+    token = geo.start_request_memo()
+    try:
+        return await call_next(request)
+    finally:
+        geo.end_request_memo(token)
+
+
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     response = await call_next(request)
@@ -49,6 +156,69 @@ app.include_router(
     tags=["Auth"]
 )
 
+metrics.bind_routes(app, [("/api/v1/auth", auth_router), ("", admin_clients_router)])
+
+
+# Queue depths, rejection counts and pool waits are for the scraper, not the
+# public: Prometheus sends this as a bearer token (authorization.credentials).
+# Unset, /metrics answers 401 to everyone.
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN")
+
+
+@app.get("/metrics")
+def prometheus_metrics(request: Request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if not (METRICS_SCRAPE_TOKEN and scheme.lower() == "bearer"
+            and hmac.compare_digest(token.encode(), METRICS_SCRAPE_TOKEN.encode())):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+# =====================
+# JWKS
+# =====================
+# Resource servers verify access tokens locally against these keys. A short
+# max-age keeps rotations visible; clients should also refetch on an unknown kid.
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+
+
+@app.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    body, etag = jwt_keys.jwks()
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_MAX_AGE}, stale-while-revalidate={JWKS_MAX_AGE}",
+        "ETag": etag,
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/health")
+@app.get("/health/live")
 def health():
     return {"ok": True}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    checks = {}
+    if repository.uses_mongo():
+        try:
+            checks["mongo_ping_ms"] = await database.ping()
+        except Exception as e:
+            checks["mongo"] = repr(e)
+    else:
+        checks["repository"] = repository.active().name
+    checks["geo_loaded"] = geo.is_loaded()
+    checks["signing_key"] = jwt_keys.signing_key()[0] or ("hs256" if auth_utils.SECRET_KEY else None)
+
+    ready = (
+        warmup.is_ready()
+        and "mongo" not in checks
+        and checks["geo_loaded"]
+        and checks["signing_key"] is not None
+    )
+    body = {"ready": ready, "checks": checks, "warmup": warmup.timings}
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
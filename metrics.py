@@ -0,0 +1,276 @@
+import asyncio
+import functools
+import os
+import time
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from ustils import spans
+
+# =====================
+# Metric definitions
+# =====================
+# Hot paths only ever touch label children bound once (at import, at route
+# registration or on first use of a label value); nothing is allocated per
+# request. Pool/queue/cache sizes are read from the existing stats()
+# functions at scrape time instead of being tracked on every call.
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status class",
+    ["route", "method", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_LATENCY = Histogram(
+    "db_operation_duration_seconds", "Repository call latency",
+    ["op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+DB_ERRORS = Counter("db_operation_errors_total", "Repository calls that raised", ["op"])
+ARGON2_LATENCY = Histogram(
+    "argon2_duration_seconds", "Argon2 work, measured in the hashing worker",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+ARGON2_QUEUE_WAIT = Histogram(
+    "argon2_queue_wait_seconds", "Time hashing jobs waited for a free worker",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+GEO_LOOKUP = Histogram(
+    "geo_lookup_duration_seconds", "GeoIP database lookups (cache misses only)",
+    buckets=(0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.001, 0.01)
+)
+EMAIL_SEND = Histogram(
+    "email_send_duration_seconds", "Brevo send latency by template and outcome",
+    ["template", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter", ["route"]
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+ARGON2_HASH = ARGON2_LATENCY.labels("hash")
+ARGON2_VERIFY = ARGON2_LATENCY.labels("verify")
+
+_STATUS_CLASSES = ("2xx", "3xx", "4xx", "5xx")
+_UNMATCHED = "unmatched"
+_route_children = {}
+_route_paths = {}
+_email_children = {}
+_rate_limit_children = {}
+
+
+# =====================
+# HTTP
+# =====================
+def _children(path: str, method: str) -> tuple:
+    return (
+        HTTP_LATENCY.labels(path, method),
+        {cls: HTTP_REQUESTS.labels(path, method, cls) for cls in _STATUS_CLASSES},
+    )
+
+
+def bind_routes(app, routers: list):
+    """
+    Pre-binds children for every route of the given (prefix, APIRouter) pairs.
+    Keyed by route object identity, since the matched route in the request
+    scope may carry only the router-relative path.
+    """
+    endpoints = {}
+    for prefix, router in routers:
+        for route in router.routes:
+            endpoints[route.endpoint] = prefix
+            _route_paths[id(route)] = prefix + route.path
+            for method in route.methods:
+                _route_children[(id(route), method)] = _children(prefix + route.path, method)
+    # Some FastAPI versions copy included routes onto the app with the prefix applied.
+    for route in app.routes:
+        if getattr(route, "endpoint", None) in endpoints:
+            _route_paths[id(route)] = route.path
+            for method in route.methods:
+                _route_children[(id(route), method)] = _children(route.path, method)
+
+
+def observe_request(route, method: str, status_code: int, seconds: float):
+    children = _route_children.get((id(route), method))
+    if children is None:
+        if route is not None:
+            return    # not an instrumented router (health, metrics, JWKS)
+        children = _route_children[(id(None), method)] = _children(_UNMATCHED, method)
+    latency, counters = children
+    latency.observe(seconds)
+    counters[_STATUS_CLASSES[min(3, max(0, status_code // 100 - 2))]].inc()
+
+
+# =====================
+# DEPENDENCIES
+# =====================
+def timed_db(fn):
+    """
+    Latency histogram (and request span) for a repository coroutine, labelled
+    <module>.<function>. Each call also runs under database.operation_timeout().
+    """
+    # Imported here, not at the top: hashing workers import this module too.
+    import database
+
+    op = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+    span_name = f"db.{op}"
+    latency = DB_LATENCY.labels(op)
+    errors = DB_ERRORS.labels(op)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with database.operation_timeout():
+                return await fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            latency.observe(elapsed)
+            spans.add(span_name, elapsed)
+
+    return wrapper
+
+
+def db_call_count() -> int:
+    """Repository calls timed so far in this process; benchmarks diff it around a run."""
+    return int(sum(
+        sample.value
+        for metric in DB_LATENCY.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_count")
+    ))
+
+
+def email_child(template: str, outcome: str):
+    child = _email_children.get((template, outcome))
+    if child is None:
+        child = _email_children[(template, outcome)] = EMAIL_SEND.labels(template, outcome)
+    return child
+
+
+def rate_limit_child(route):
+    child = _rate_limit_children.get(id(route))
+    if child is None:
+        path = _route_paths.get(id(route), _UNMATCHED)
+        child = _rate_limit_children[id(route)] = RATE_LIMIT_REJECTIONS.labels(path)
+    return child
+
+
+# =====================
+# EVENT LOOP LAG
+# =====================
+_lag_task = None
+
+
+async def _watch_loop_lag():
+    while True:
+        expected = time.perf_counter() + METRICS_LOOP_LAG_INTERVAL
+        await asyncio.sleep(METRICS_LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(max(0.0, time.perf_counter() - expected))
+
+
+def start():
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_watch_loop_lag())
+
+
+async def stop():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        try:
+            await _lag_task
+        except asyncio.CancelledError:
+            pass
+        _lag_task = None
+
+
+# =====================
+# SCRAPE-TIME GAUGES
+# =====================
+class _StatsCollector:
+    """Turns the modules' existing stats() dicts into gauges when Prometheus scrapes."""
+
+    def describe(self):
+        # Without this, register() calls collect() right away, importing the
+        # services mid-import (e.g. in a hashing worker that loads password_hasher first).
+        return []
+
+    def collect(self):
+        import database
+        import rate_limit
+        from auth_utils import token_cache_stats
+        from db import telemetry_buffer, user_cache, user_filter
+        from services import client_revocations, password_hasher, registration_admission
+        from ustils import geo
+
+        pool = database.pool_stats()
+        yield _gauge("mongo_pool_checkout_failures", "Pool checkouts that timed out or failed", pool["checkout_failures"])
+        yield _gauge("mongo_pool_connections_created", "Connections opened since start", pool["connections_created"])
+        yield _gauge("mongo_pool_checkout_wait_p50_ms", "Median wait for a pooled connection (recent checkouts)", pool["checkout_wait_p50_ms"])
+        yield _gauge("mongo_pool_checkout_wait_p99_ms", "p99 wait for a pooled connection (recent checkouts)", pool["checkout_wait_p99_ms"])
+        yield _gauge("argon2_pending_jobs", "Hashing jobs queued or running", password_hasher.stats()["pending"])
+        yield _gauge("telemetry_queue_depth", "Buffered telemetry updates", telemetry_buffer.stats()["queue_depth"])
+        revocations = client_revocations.stats()
+        yield _gauge("revoked_clients", "Entries in the in-memory revocation set", revocations["size"])
+        yield _gauge("revocation_event_lag_ms", "Commit-to-apply lag of the last revocation change event", revocations["last_event_lag_ms"])
+        yield _gauge("access_token_cache_hit_ratio", "Verified-token cache hit ratio", token_cache_stats()["hit_rate"])
+        yield _gauge("user_cache_hit_ratio", "Auth user record cache hit ratio", user_cache.stats()["hit_rate"])
+        user_filter_stats = user_filter.stats()
+        yield _gauge("user_filter_estimated_fp_rate", "Users Bloom filter false-positive rate estimated from its fill", user_filter_stats["estimated_fp_rate"])
+        yield _gauge("user_filter_bytes", "Users Bloom filter bit array size", user_filter_stats["bytes"])
+        yield _gauge("geo_ip_cache_hit_ratio", "GeoIP per-address cache hit ratio", geo.stats()["ip_cache"]["hit_rate"])
+
+        layers = GaugeMetricFamily(
+            "rate_limit_layer_rejections", "Rejections by limiter layer when the prefilter is on", labels=["layer"]
+        )
+        for layer, count in rate_limit.rejections.items():
+            layers.add_metric([layer], count)
+        yield layers
+
+        admissions = GaugeMetricFamily(
+            "registration_admission_outcomes", "Registration requests by admission outcome", labels=["outcome"]
+        )
+        for outcome, count in registration_admission.stats().items():
+            if outcome not in ("inflight", "recent"):
+                admissions.add_metric([outcome], count)
+        yield admissions
+
+
+def _gauge(name: str, documentation: str, value) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, documentation, value=value or 0)
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render() -> bytes:
+    # With several uvicorn workers, PROMETHEUS_MULTIPROC_DIR aggregates the
+    # counters and histograms; scrape-time gauges are this worker's view.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_StatsCollector())
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -1,8 +1,9 @@
 from fastapi import Request, HTTPException
 import time
 
-from auth_utils import decode_access_token
-from security.client_crypto import derive_client_id, verify_signature
+from auth_utils import decode_access_token_cached
+from security.client_crypto import client_id_for_public_key, verify_signature
+from services.client_revocations import is_revoked
 
 
 async def client_bound_auth(request: Request):
@@ -14,7 +15,7 @@ async def client_bound_auth(request: Request):
     token = auth.split(" ", 1)[1]
 
     # 2️⃣ Decode JWT
-    payload = decode_access_token(token)
+    payload = decode_access_token_cached(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
 
@@ -46,11 +47,15 @@ async def client_bound_auth(request: Request):
         raise HTTPException(status_code=401, detail="Invalid client signature")
 
     # 6️⃣ Derive client_id and compare
-    derived_client_id = derive_client_id(bytes.fromhex(pub))
+    derived_client_id = client_id_for_public_key(pub)
 
     if derived_client_id != token_client_id:
         raise HTTPException(status_code=401, detail="Client mismatch")
 
-    # 7️⃣ Attach auth info to request
+    # 7️⃣ Revocation check (in-memory set, no DB round trip)
+    if is_revoked(token_client_id, payload["sub"]):
+        raise HTTPException(status_code=401, detail="Client revoked")
+
+    # 8️⃣ Attach auth info to request
     request.state.user_id = payload["sub"]
     request.state.client_id = token_client_id
@@ -1,5 +1,89 @@
+import os
+import time
+
+from limits.strategies import STRATEGIES, SlidingWindowCounterRateLimiter
 from slowapi import Limiter
 
 from ustils.client_ip import get_client_ip
+from ustils.lru import LRUCache
+from ustils.shm_rate_storage import SharedMemoryStorage
+
+# memory://                      single process only (dev)
+# shm:///dev/shm/<name>          shared by every worker on one host (recommended)
+# redis://host:6379              shared across hosts; keep Redis close, each hit is a round trip
+# slowapi calls the storage synchronously on the event loop. Don't use
+# mongodb://: limits drives it with blocking pymongo, so every rate-limited
+# request would stall the loop for a full Mongo round trip.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# Defining SharedMemoryStorage is what registers shm:// with limits.
+RATE_LIMIT_SCHEMES = ("memory", "redis", "rediss", *SharedMemoryStorage.STORAGE_SCHEME)
+RATE_LIMIT_PREFILTER = os.getenv("RATE_LIMIT_PREFILTER", "1") == "1"
+RATE_LIMIT_PREFILTER_SIZE = int(os.getenv("RATE_LIMIT_PREFILTER_SIZE", "50000"))
+
+rejections = {"prefilter": 0, "shared": 0}
+
+_scheme = RATE_LIMIT_STORAGE_URI.partition("://")[0]
+if _scheme not in RATE_LIMIT_SCHEMES:
+    print(f"[rate-limit] WARNING: {_scheme}:// storage is unsupported and may block the event loop on every "
+          "limited request; use shm:// (one host) or redis:// (several hosts)")
+
+
+class PrefilteredRateLimiter(SlidingWindowCounterRateLimiter):
+    """
+    Sliding-window limiter with a per-process token bucket in front of the
+    shared store. The bucket refills at the limit's own rate and is only
+    charged for hits the shared store also accepts, so anything it rejects
+    would also be over the shared limit; floods are answered locally without
+    a storage round trip.
+    """
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self._buckets = LRUCache(maxsize=RATE_LIMIT_PREFILTER_SIZE)
+
+    def _take_local(self, key: str, item, cost: int) -> bool:
+        now = time.monotonic()
+        capacity = item.amount
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(capacity), now]
+            self._buckets.set(key, bucket)
+
+        tokens, last = bucket
+        tokens = min(capacity, tokens + (now - last) * capacity / item.get_expiry())
+        if tokens < cost:
+            bucket[0], bucket[1] = tokens, now
+            return False
+        bucket[0], bucket[1] = tokens - cost, now
+        return True
+
+    def _refund_local(self, key: str, item, cost: int):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(item.amount, bucket[0] + cost)
+
+    def hit(self, item, *identifiers: str, cost: int = 1) -> bool:
+        key = item.key_for(*identifiers)
+        if not self._take_local(key, item, cost):
+            rejections["prefilter"] += 1
+            return False
+        if not super().hit(item, *identifiers, cost=cost):
+            # The shared store didn't count this hit, so neither does the bucket;
+            # otherwise a client hammering past the limit would drain it below
+            # the shared allowance.
+            self._refund_local(key, item, cost)
+            rejections["shared"] += 1
+            return False
+        return True
+
+
+# slowapi builds its limiter from limits' STRATEGIES table by name, so the
+# prefilter is registered there rather than patched into the Limiter.
+STRATEGIES["prefiltered-sliding-window-counter"] = PrefilteredRateLimiter
+
 
-limiter = Limiter(key_func=get_client_ip)
+limiter = Limiter(
+    key_func=get_client_ip,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="prefiltered-sliding-window-counter" if RATE_LIMIT_PREFILTER else "sliding-window-counter"
+)
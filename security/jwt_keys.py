@@ -0,0 +1,152 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwk
+
+# =====================
+# ES256 signing keys
+# =====================
+# JWT_KEYS_DIR holds one PEM per key, named <kid>.pem (private, can sign) or
+# <kid>.pub.pem (public only, kept so tokens signed before a rotation still
+# verify). Every key is published in the JWKS; the active one signs.
+# Generated kids start with a UTC timestamp, so by default the newest key is
+# active. Workers read the directory once, at startup.
+#
+# Rotation must publish before it signs: a worker only knows the keys that
+# existed when it started, so during a rolling restart a new worker signing
+# with a fresh kid would issue tokens the old workers reject ("Unknown kid").
+#   1. Pin JWT_ACTIVE_KID to the current kid (if it isn't already).
+#   2. generate the new key and restart every worker: it is verified and
+#      published in the JWKS, but nothing signs with it yet.
+#   3. Set JWT_ACTIVE_KID to the new kid and restart again.
+#   4. Once tokens signed by the old key have expired, retire it and restart.
+JWT_ALGORITHM = "ES256"
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+
+_verify_keys = {}
+_signing_keys = {}
+_active_kid = None
+_jwks_body = b'{"keys":[]}'
+_jwks_etag = None
+
+
+def reload(directory: str = None):
+    """(Re)reads the key directory and rebuilds the published JWKS."""
+    global _verify_keys, _signing_keys, _active_kid, _jwks_body, _jwks_etag
+    directory = directory or JWT_KEYS_DIR
+
+    verify_keys, signing_keys = {}, {}
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.pem"))):
+            name = os.path.basename(path)
+            with open(path, "rb") as fh:
+                pem = fh.read()
+            if name.endswith(".pub.pem"):
+                kid = name[:-len(".pub.pem")]
+                verify_keys[kid] = jwk.construct(pem, JWT_ALGORITHM)
+            else:
+                kid = name[:-len(".pem")]
+                signing_keys[kid] = jwk.construct(pem, JWT_ALGORITHM)
+                verify_keys[kid] = signing_keys[kid].public_key()
+
+    active = JWT_ACTIVE_KID or (max(signing_keys) if signing_keys else None)
+    if active is not None and active not in signing_keys:
+        raise RuntimeError(f"JWT_ACTIVE_KID {active!r} has no private key in {directory}")
+
+    published = []
+    for kid, key in verify_keys.items():
+        entry = key.to_dict()
+        entry.update({"kid": kid, "use": "sig", "alg": JWT_ALGORITHM})
+        published.append(entry)
+    body = json.dumps({"keys": published}, separators=(",", ":")).encode()
+
+    if not JWT_ACTIVE_KID and len(signing_keys) > 1:
+        print(f"[jwt-keys] JWT_ACTIVE_KID not set, signing with the newest key {active}; "
+              "pin it so a rolling restart doesn't sign with a kid older workers haven't loaded")
+
+    _verify_keys, _signing_keys, _active_kid = verify_keys, signing_keys, active
+    _jwks_body = body
+    _jwks_etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def signing_key():
+    """(kid, key) for new tokens, or (None, None) when no ES256 key is configured."""
+    if _active_kid is None:
+        return None, None
+    return _active_kid, _signing_keys[_active_kid]
+
+
+def verification_key(kid: str):
+    return _verify_keys.get(kid)
+
+
+def jwks() -> tuple:
+    """Serialized JWKS document and its ETag."""
+    return _jwks_body, _jwks_etag
+
+
+def generate(directory: str) -> str:
+    """Writes a new P-256 private key and returns its kid."""
+    os.makedirs(directory, exist_ok=True)
+    kid = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + os.urandom(3).hex()
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    path = os.path.join(directory, f"{kid}.pem")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(pem)
+    return kid
+
+
+def retire(directory: str, kid: str):
+    """Keeps only the public half of a key: it still verifies, but can no longer sign."""
+    private_path = os.path.join(directory, f"{kid}.pem")
+    with open(private_path, "rb") as fh:
+        private_key = serialization.load_pem_private_key(fh.read(), password=None)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    with open(os.path.join(directory, f"{kid}.pub.pem"), "wb") as fh:
+        fh.write(public_pem)
+    os.remove(private_path)
+
+
+reload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage ES256 JWT signing keys")
+    parser.add_argument("command", choices=["generate", "retire", "list"])
+    parser.add_argument("--dir", default=JWT_KEYS_DIR, required=JWT_KEYS_DIR is None)
+    parser.add_argument("--kid", help="key to retire")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        kid = generate(args.dir)
+        print(kid)
+        print(f"Restart every worker to publish it, then set JWT_ACTIVE_KID={kid} and restart again.")
+    elif args.command == "retire":
+        if not args.kid:
+            parser.error("retire needs --kid")
+        retire(args.dir, args.kid)
+    else:
+        reload(args.dir)
+        for kid in _verify_keys:
+            role = "active" if kid == _active_kid else ("signing" if kid in _signing_keys else "verify-only")
+            print(f"{kid}  {role}")
+
+
+if __name__ == "__main__":
+    main()
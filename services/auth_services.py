@@ -1,4 +1,5 @@
 from datetime import datetime
+import asyncio
 import re
 
 from db.user_repo import (
@@ -13,12 +14,11 @@ from db.client_repo import (
     update_client_activity
 )
 from models.users import UserRegister, UserLogin
-from ustils.security import hash_password, verify_password
+from services.password_hasher import dummy_verify, hash_password_async, verify_password_async
 from ustils.id_generator import generate_user_id
-from services.token_service import issue_tokens
+from services.token_service import discard_tokens, issue_tokens
+from services.google_id_token import verify_id_token
 import os
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 import random
 
 
@@ -45,12 +45,11 @@ def normalize_username_without_spaces(name: str) -> str:
 # =========================
 # REPLACE the register_user function in auth_services.py
 
-from services.email_services import send_registration_otp
+from services.email_outbox import queue_email
 from db.user_repo import set_registration_otp, get_pending_registration, increment_registration_otp_attempts, delete_pending_registration
 from ustils.otp import generate_otp, hash_otp, otp_expiry_time, MAX_OTP_ATTEMPTS
 from ustils.disposable_email import is_disposable_email
 from ustils.geo import lookup_location
-import asyncio
 
 async def register_user(data: UserRegister, ip_address: str = None):
     """Step 1: Generate OTP and send email (don't create user yet)"""
@@ -61,11 +60,15 @@ async def register_user(data: UserRegister, ip_address: str = None):
     sidhi_id = f"{clean_username}@sidhilynx.id"
     spaceless_username = normalize_username_without_spaces(data.username)
 
-    # Check if email/username already registered
-    if await get_user_by_email(data.email):
+    # Check if email/username already registered (independent lookups, run together)
+    existing_email, existing_sidhi_id = await asyncio.gather(
+        get_user_by_email(data.email),
+        get_user_by_sidhi_id(sidhi_id)
+    )
+    if existing_email:
         raise AuthError("Email already registered")
 
-    if await get_user_by_sidhi_id(sidhi_id):
+    if existing_sidhi_id:
         raise AuthError("Sidhilynx ID already taken")
 
     # Generate OTP
@@ -78,7 +81,7 @@ async def register_user(data: UserRegister, ip_address: str = None):
         "sidhi_id": sidhi_id,
         "username": spaceless_username,
         "email": data.email,
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password_async(data.password),
         "created_at": datetime.utcnow(),
         "is_active": True,
         "auth_provider": "email",
@@ -86,19 +89,20 @@ async def register_user(data: UserRegister, ip_address: str = None):
         "registration_location": lookup_location(ip_address) if ip_address else None
     }
 
+    expires_at = otp_expiry_time()
     await set_registration_otp(
         email=data.email,
         otp_hash=otp_hash,
-        expires_at=otp_expiry_time(),
+        expires_at=expires_at,
         user_data=user_data
     )
 
-    # Send OTP email
-    await asyncio.to_thread(
-        send_registration_otp,
+    # Queue OTP email (delivered by the outbox dispatcher)
+    await queue_email(
+        "registration_otp",
         data.email,
-        otp,
-        spaceless_username
+        {"otp": otp, "username": spaceless_username},
+        expires_at=expires_at
     )
 
     return {
@@ -151,20 +155,64 @@ async def login_user(
     # 1️⃣ Verify user
     user = await get_user_by_sidhi_id(data.sidhi_id)
     if not user:
+        # Spend the same Argon2 time as a wrong password. An unknown ID the Bloom
+        # filter rules out skips Mongo, but its lookup is padded to the median
+        # Mongo lookup time (db/user_repo.py), so it isn't a round trip faster either.
+        await dummy_verify(data.password)
         raise AuthError("Invalid credentials")
 
-    if not verify_password(data.password, user["password_hash"]):
+    # The device lookup only needs user_id, so overlap it with the Argon2 verify.
+    password_ok, client = await asyncio.gather(
+        verify_password_async(data.password, user["password_hash"]),
+        get_client_link(client_id, user["user_id"])
+    )
+    if not password_ok:
         raise AuthError("Invalid credentials")
 
-    # 2️⃣ Client registry (recorded for fraud monitoring, never blocks login)
-    client = await get_client_link(client_id, user["user_id"])
+    # 2️⃣ Client registry + 3️⃣ client-bound tokens
+    tokens = await _record_login_and_issue_tokens(
+        user_id=user["user_id"],
+        client=client,
+        client_id=client_id,
+        public_key=public_key,     # 🔥 STORE PUBLIC KEY
+        platform=platform,
+        app_id=app_id,
+        app_name=app_name,
+        app_version=app_version,
+        ip_address=ip_address
+    )
+
+    return {
+        **tokens,
+        "sidhi_id": user["sidhi_id"]
+    }
+
+
+async def _record_login_and_issue_tokens(
+    user_id: str,
+    client: dict,
+    client_id: str,
+    public_key: str,
+    platform: str,
+    app_id: str,
+    app_name: str,
+    app_version: str,
+    ip_address: str
+):
+    """
+    Post-auth writes. Device registry, login history and the refresh token
+    live in different collections and don't depend on each other, so they go
+    out concurrently: one round trip of wall time instead of three.
+    """
+    if client and client["status"] != "active":
+        raise AuthError("This device has been revoked")
 
     if not client:
         # First time seeing this device+account pair → register it
-        await create_client(
+        client_write = create_client(
             client_id=client_id,
-            user_id=user["user_id"],
-            public_key=public_key,     # 🔥 STORE PUBLIC KEY
+            user_id=user_id,
+            public_key=public_key,
             platform=platform,
             app_id=app_id,
             app_name=app_name,
@@ -172,24 +220,33 @@ async def login_user(
             ip_address=ip_address
         )
     else:
-        if client["status"] != "active":
-            raise AuthError("This device has been revoked")
-
-        await update_client_activity(client_id, ip_address, user_id=user["user_id"])
+        client_write = update_client_activity(client_id, ip_address, user_id=user_id)
 
-    await record_login(user["user_id"], ip_address, lookup_location(ip_address))
-
-    # 3️⃣ Issue client-bound tokens
-    tokens = await issue_tokens(
-        user_id=user["user_id"],
-        client_id=client_id,
-        scopes=["sidhilynx"]
+    client_result, login_result, tokens = await asyncio.gather(
+        client_write,
+        record_login(user_id, ip_address, lookup_location(ip_address)),
+        issue_tokens(
+            user_id=user_id,
+            client_id=client_id,
+            scopes=["sidhilynx"]
+        ),
+        return_exceptions=True
     )
-
-    return {
-        **tokens,
-        "sidhi_id": user["sidhi_id"]
-    }
+    failed = next((r for r in (client_result, login_result, tokens) if isinstance(r, BaseException)), None)
+    if failed is not None:
+        # The token was written alongside a client write that may not have
+        # landed (e.g. a duplicate key from a concurrent first login); it is
+        # never returned, so don't leave it behind.
+        if not isinstance(tokens, BaseException):
+            try:
+                await discard_tokens(tokens)
+            except Exception as e:
+                print(f"[login] failed to discard an unissued refresh token: {e!r}")
+        raise failed
+    # A revoke that lands while the token is being written misses its
+    # client_status copy; refresh_access_token also consults the in-process
+    # revocation set, so that token stops working once the set catches up.
+    return tokens
 
 # =========================
 # LOGIN WITH GOOGLE (CLIENT-AWARE)
@@ -207,9 +264,7 @@ async def login_google_user(
     try:
         # 1️⃣ Verify Google Token
         client_id_google = os.getenv("GOOGLE_CLIENT_ID")
-        idinfo = id_token.verify_oauth2_token(
-            google_token, google_requests.Request(), client_id_google
-        )
+        idinfo = await verify_id_token(google_token, client_id_google)
         
         email = idinfo["email"]
         name = idinfo.get("name", email.split("@")[0])
@@ -236,7 +291,7 @@ async def login_google_user(
                 "sidhi_id": sidhi_id,
                 "username": spaceless_username,
                 "email": email,
-                "password_hash": hash_password(generate_user_id()), # Dummy password, can't login via email/pwd unless reset
+                "password_hash": await hash_password_async(generate_user_id()), # Dummy password, can't login via email/pwd unless reset
                 "created_at": datetime.utcnow(),
                 "is_active": True,
                 "auth_provider": "google"
@@ -247,33 +302,20 @@ async def login_google_user(
     except ValueError as e:
         raise AuthError(f"Invalid Google token: {str(e)}")
 
-    # 3️⃣ Client registry (recorded for fraud monitoring, never blocks login)
-    client = await get_client_link(client_id, user["user_id"])
-
-    if not client:
-        await create_client(
-            client_id=client_id,
-            user_id=user["user_id"],
-            public_key=public_key,
-            platform=platform,
-            app_id=app_id,
-            app_name=app_name,
-            app_version=app_version,
-            ip_address=ip_address
-        )
-    else:
-        if client["status"] != "active":
-            raise AuthError("This device has been revoked")
-
-        await update_client_activity(client_id, ip_address, user_id=user["user_id"])
-
-    await record_login(user["user_id"], ip_address, lookup_location(ip_address))
+    # 3️⃣ Client registry (a brand-new account can't have a device link yet)
+    client = None if is_new_user else await get_client_link(client_id, user["user_id"])
 
     # 4️⃣ Issue client-bound tokens
-    tokens = await issue_tokens(
+    tokens = await _record_login_and_issue_tokens(
         user_id=user["user_id"],
+        client=client,
         client_id=client_id,
-        scopes=["sidhilynx"]
+        public_key=public_key,
+        platform=platform,
+        app_id=app_id,
+        app_name=app_name,
+        app_version=app_version,
+        ip_address=ip_address
     )
 
     return {
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+from db.client_repo import revoked_links, watch_link_status
+
+# =====================
+# Revocation set configuration
+# =====================
+# Each worker mirrors the revoked device links in memory so client_bound_auth
+# can reject them without a Mongo round trip. Kept current by a change stream;
+# deployments without one (standalone mongod) fall back to polling.
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "600"))
+REVOCATION_WATCH_RETRY_SECONDS = float(os.getenv("REVOCATION_WATCH_RETRY_SECONDS", "60"))
+
+# 16-byte digests of "client_id:user_id" rather than the 64+ char strings.
+_revoked = set()
+_task = None
+_metrics = {
+    "mode": "starting",
+    "events": 0,
+    "rebuilds": 0,
+    "last_event_lag_ms": None,
+    "last_sync_at": None,
+}
+
+
+def _key(client_id: str, user_id: str) -> bytes:
+    return hashlib.blake2b(f"{client_id}:{user_id}".encode(), digest_size=16).digest()
+
+
+def is_revoked(client_id: str, user_id: str) -> bool:
+    return _key(client_id, user_id) in _revoked
+
+
+async def rebuild():
+    """Reloads the full set from the repository and swaps it in atomically."""
+    global _revoked
+    fresh = set()
+    async for client_id, user_id in revoked_links():
+        fresh.add(_key(client_id, user_id))
+    _revoked = fresh
+    _metrics["rebuilds"] += 1
+    _metrics["last_sync_at"] = time.time()
+
+
+def _apply_event(event: dict):
+    doc = event.get("fullDocument")
+    if not doc or "client_id" not in doc:
+        return
+
+    key = _key(doc["client_id"], doc.get("user_id"))
+    if doc.get("status") == "revoked":
+        _revoked.add(key)
+    else:
+        _revoked.discard(key)
+
+    _metrics["events"] += 1
+    _metrics["last_sync_at"] = time.time()
+    wall_time = event.get("wallTime")
+    if isinstance(wall_time, datetime):
+        _metrics["last_event_lag_ms"] = round((datetime.utcnow() - wall_time).total_seconds() * 1000, 1)
+    elif event.get("clusterTime") is not None:
+        _metrics["last_event_lag_ms"] = round((time.time() - event["clusterTime"].time) * 1000, 1)
+
+
+async def _watch():
+    # Open the stream before the rebuild so nothing revoked in between is missed;
+    # replayed events are idempotent.
+    async with watch_link_status() as stream:
+        await rebuild()
+        _metrics["mode"] = "change_stream"
+        last_rebuild = time.monotonic()
+        while True:
+            event = await stream.try_next()
+            if event is not None:
+                _apply_event(event)
+            # Deletes carry no client_id; a periodic rebuild clears those out.
+            if time.monotonic() - last_rebuild >= REVOCATION_REBUILD_SECONDS:
+                await rebuild()
+                last_rebuild = time.monotonic()
+
+
+async def _poll(duration: float):
+    _metrics["mode"] = "polling"
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            await rebuild()
+        except PyMongoError as e:
+            print(f"[revocations] poll failed: {e!r}")
+        await asyncio.sleep(REVOCATION_POLL_SECONDS)
+
+
+async def _run():
+    while True:
+        try:
+            await _watch()
+        except PyMongoError as e:
+            print(f"[revocations] change stream unavailable, polling every {REVOCATION_POLL_SECONDS}s: {e!r}")
+            await _poll(REVOCATION_WATCH_RETRY_SECONDS)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def stats() -> dict:
+    last_sync = _metrics["last_sync_at"]
+    return {
+        **_metrics,
+        "size": len(_revoked),
+        "sync_age_s": round(time.time() - last_sync, 1) if last_sync else None,
+    }
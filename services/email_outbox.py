@@ -0,0 +1,214 @@
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+import httpx
+
+from db.outbox_repo import enqueue_email, claim_batch, complete_batch
+from metrics import email_child
+from services.email_services import BREVO_API_URL, BREVO_API_KEY, SENDER, render
+from ustils.percentiles import percentiles
+
+# =====================
+# Dispatcher configuration
+# =====================
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "2"))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "60"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_BACKOFF_BASE = float(os.getenv("EMAIL_BACKOFF_BASE", "2"))
+EMAIL_BACKOFF_MAX = float(os.getenv("EMAIL_BACKOFF_MAX", "300"))
+EMAIL_HTTP_TIMEOUT = float(os.getenv("EMAIL_HTTP_TIMEOUT", "10"))
+EMAIL_MAX_CONNECTIONS = int(os.getenv("EMAIL_MAX_CONNECTIONS", "10"))
+EMAIL_BREAKER_THRESHOLD = int(os.getenv("EMAIL_BREAKER_THRESHOLD", "5"))
+EMAIL_BREAKER_COOLDOWN = float(os.getenv("EMAIL_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive provider failures; after `cooldown` lets a single probe through."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.state == "half_open":
+            self.opened_at = time.monotonic()
+
+
+_breaker = CircuitBreaker(EMAIL_BREAKER_THRESHOLD, EMAIL_BREAKER_COOLDOWN)
+_client = None
+_task = None
+_stopping = False
+_wakeup = asyncio.Event()
+
+_metrics = defaultdict(lambda: {"queued": 0, "sent": 0, "retried": 0, "dead": 0})
+_latencies = defaultdict(lambda: deque(maxlen=512))
+
+
+# =====================
+# PRODUCER SIDE
+# =====================
+async def queue_email(template: str, to: str, params: dict, expires_at: datetime):
+    """
+    Persist the email and nudge the local dispatcher; returns without waiting on the provider.
+    params may hold a plaintext OTP, so expires_at should be the OTP's own expiry: the
+    message is deleted once sent, loses its params when it goes dead, and is never sent
+    or kept (TTL index) past expires_at.
+    """
+    await enqueue_email(template, to, params, expires_at)
+    _metrics[template]["queued"] += 1
+    _wakeup.set()
+
+
+# =====================
+# DELIVERY
+# =====================
+def _backoff(attempts: int) -> datetime:
+    delay = min(EMAIL_BACKOFF_MAX, EMAIL_BACKOFF_BASE * (2 ** attempts))
+    return datetime.utcnow() + timedelta(seconds=delay)
+
+
+async def _send_one(message: dict):
+    """Returns "sent", "retry" or "dead" plus an error string."""
+    template = message["template"]
+    subject, html = render(template, message["params"])
+    start = time.perf_counter()
+    try:
+        response = await _client.post("/smtp/email", json={
+            "sender": SENDER,
+            "to": [{"email": message["to"]}],
+            "subject": subject,
+            "htmlContent": html,
+        })
+    except httpx.HTTPError as e:
+        outcome, error = "retry", repr(e)
+    else:
+        if response.status_code < 300:
+            outcome, error = "sent", None
+        elif response.status_code in (401, 403):
+            # A bad or rotated API key fails every message: a provider fault for the breaker, not a dead letter.
+            outcome, error = "retry", f"HTTP {response.status_code}: Brevo rejected the API key"
+        elif response.status_code == 429 or response.status_code >= 500:
+            outcome, error = "retry", f"HTTP {response.status_code}"
+        else:
+            outcome, error = "dead", f"HTTP {response.status_code}: {response.text[:200]}"
+
+    elapsed = time.perf_counter() - start
+    _latencies[template].append(elapsed)
+    email_child(template, outcome).observe(elapsed)
+    return outcome, error
+
+
+async def _deliver(messages: list):
+    outcomes = await asyncio.gather(*[_send_one(m) for m in messages])
+
+    sent_ids, retries, dead_ids = [], [], []
+    for message, (outcome, error) in zip(messages, outcomes):
+        template = message["template"]
+        if outcome == "sent":
+            sent_ids.append(message["_id"])
+            _metrics[template]["sent"] += 1
+            _breaker.record_success()
+            continue
+
+        if outcome == "retry":
+            _breaker.record_failure()
+            if message.get("attempts", 0) + 1 < EMAIL_MAX_ATTEMPTS:
+                retries.append((message["_id"], _backoff(message.get("attempts", 0)), error))
+                _metrics[template]["retried"] += 1
+                continue
+
+        print(f"[email_outbox] giving up on {template} to {message['to']}: {error}")
+        dead_ids.append(message["_id"])
+        _metrics[template]["dead"] += 1
+
+    await complete_batch(sent_ids, retries, dead_ids)
+
+
+async def _run():
+    while not _stopping:
+        _wakeup.clear()
+        claimed = 0
+        try:
+            if _breaker.allow():
+                batch_size = 1 if _breaker.state == "half_open" else EMAIL_BATCH_SIZE
+                messages = await claim_batch(batch_size, EMAIL_LEASE_SECONDS)
+                claimed = len(messages)
+                if messages:
+                    await _deliver(messages)
+        except Exception as e:
+            print(f"[email_outbox] dispatch round failed: {e!r}")
+
+        # A full batch probably means more is waiting; go again straight away.
+        if claimed == EMAIL_BATCH_SIZE and _breaker.state == "closed":
+            continue
+        try:
+            await asyncio.wait_for(_wakeup.wait(), EMAIL_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start():
+    global _client, _task, _stopping
+    if _task is not None:
+        return
+    _stopping = False
+    _client = httpx.AsyncClient(
+        base_url=BREVO_API_URL,
+        headers={"api-key": BREVO_API_KEY or "", "accept": "application/json"},
+        timeout=EMAIL_HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=EMAIL_MAX_CONNECTIONS,
+            max_keepalive_connections=EMAIL_MAX_CONNECTIONS
+        )
+    )
+    _task = asyncio.create_task(_run())
+
+
+async def stop(timeout: float = 10):
+    """Lets the in-flight batch finish; anything still claimed is re-delivered after its lease expires."""
+    global _client, _task, _stopping
+    _stopping = True
+    _wakeup.set()
+    if _task is not None:
+        try:
+            await asyncio.wait_for(_task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        _task = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def stats() -> dict:
+    templates = {}
+    for template, counts in _metrics.items():
+        send_p50, send_p99 = percentiles(_latencies[template], 0.50, 0.99, scale=1000, ndigits=1)
+        templates[template] = {**counts, "send_p50_ms": send_p50, "send_p99_ms": send_p99}
+    return {
+        "breaker": _breaker.state,
+        "consecutive_failures": _breaker.failures,
+        "templates": templates,
+    }
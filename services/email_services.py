@@ -1,18 +1,13 @@
 import os
-import base64
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
 
 
 # =====================
 # Brevo Configuration
 # =====================
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key['api-key'] =  os.getenv("BREVO_API_KEY")
-
-api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-    sib_api_v3_sdk.ApiClient(configuration)
-)
+# Emails are queued in the outbox and delivered by services/email_outbox.py;
+# this module only renders them.
+BREVO_API_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3")
+BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 
 EMAIL_ID = os.getenv("EMAIL_ID")
 SENDER = {
@@ -21,15 +16,10 @@ SENDER = {
 }
 
 
-class EmailSendError(Exception):
-    pass
-
-
 # =====================
 # OTP EMAIL
 # =====================
-def send_password_reset_otp(email: str, otp: str):
-    print("Function called")
+def render_password_reset_otp(otp: str):
     subject = "Reset your SidhiLynx account password"
 
     html_content = f"""
@@ -87,23 +77,10 @@ def send_password_reset_otp(email: str, otp: str):
 </html>
 """
 
-    send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-        to=[{"email": email}],
-        html_content=html_content,
-        sender=SENDER,
-        subject=subject
-    )
+    return subject, html_content
 
-    try:
-        api_instance.send_transac_email(send_smtp_email)
-        print("Email sent nanba !")
-    except ApiException as e:
-        raise EmailSendError(str(e))
-
-# Add to email_services.py (after send_password_reset_otp)
-
-def send_registration_otp(email: str, otp: str, username: str):
-    """Send OTP for registration verification"""
+def render_registration_otp(otp: str, username: str):
+    """OTP for registration verification"""
     subject = "Verify your SidhiLynx account"
 
     html_content = f"""
@@ -161,15 +138,18 @@ def send_registration_otp(email: str, otp: str, username: str):
 </html>
 """
 
-    send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-        to=[{"email": email}],
-        html_content=html_content,
-        sender=SENDER,
-        subject=subject
-    )
-
-    try:
-        api_instance.send_transac_email(send_smtp_email)
-        print(f"Registration OTP sent to {email}")
-    except ApiException as e:
-        raise EmailSendError(str(e))
\ No newline at end of file
+    return subject, html_content
+
+
+# =====================
+# TEMPLATE REGISTRY
+# =====================
+# Outbox messages store a template name + params; rendering happens at send time.
+TEMPLATES = {
+    "password_reset_otp": render_password_reset_otp,
+    "registration_otp": render_registration_otp,
+}
+
+
+def render(template: str, params: dict):
+    return TEMPLATES[template](**params)
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import re
+import time
+
+import httpx
+from jose import jwk, jwt, JWTError
+
+# =====================
+# Google ID-token verification
+# =====================
+# Google's signing keys are fetched asynchronously, kept for the max-age the
+# endpoint advertises and refreshed in the background before they lapse, so a
+# login never waits on Google. Point GOOGLE_JWKS_URL at a local stub
+# (benchmarks/google_jwks_stub.py) to run offline.
+GOOGLE_JWKS_URL = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+GOOGLE_JWKS_DEFAULT_MAX_AGE = int(os.getenv("GOOGLE_JWKS_DEFAULT_MAX_AGE", "3600"))
+GOOGLE_JWKS_REFRESH_MARGIN = float(os.getenv("GOOGLE_JWKS_REFRESH_MARGIN", "0.1"))
+GOOGLE_JWKS_MIN_REFETCH_SECONDS = float(os.getenv("GOOGLE_JWKS_MIN_REFETCH_SECONDS", "30"))
+GOOGLE_JWKS_TIMEOUT = float(os.getenv("GOOGLE_JWKS_TIMEOUT", "5"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+_keys = {}              # kid -> parsed jose key
+_expires_at = 0.0       # monotonic
+_last_fetch = 0.0       # monotonic
+_fetch_lock = asyncio.Lock()
+_client = None
+_task = None
+_metrics = {"fetches": 0, "fetch_failures": 0, "unknown_kid_refetches": 0, "verified": 0, "rejected": 0}
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=GOOGLE_JWKS_TIMEOUT)
+    return _client
+
+
+def _max_age(cache_control: str) -> int:
+    match = _MAX_AGE.search(cache_control or "")
+    return int(match.group(1)) if match else GOOGLE_JWKS_DEFAULT_MAX_AGE
+
+
+async def _fetch_keys():
+    """Downloads the key set; kids we already hold keep their parsed key objects."""
+    global _keys, _expires_at, _last_fetch
+    _last_fetch = time.monotonic()
+    try:
+        response = await _get_client().get(GOOGLE_JWKS_URL)
+        response.raise_for_status()
+        jwks = response.json()["keys"]
+    except (httpx.HTTPError, ValueError, KeyError):
+        _metrics["fetch_failures"] += 1
+        raise
+
+    fresh = {}
+    for entry in jwks:
+        kid = entry.get("kid")
+        fresh[kid] = _keys.get(kid) or jwk.construct(entry, entry.get("alg", "RS256"))
+    _keys = fresh
+    _expires_at = time.monotonic() + _max_age(response.headers.get("Cache-Control"))
+    _metrics["fetches"] += 1
+
+
+async def _ensure_keys(force: bool = False):
+    async with _fetch_lock:
+        now = time.monotonic()
+        if force:
+            # A burst of tokens with a bogus kid must not turn into a burst of fetches.
+            if now - _last_fetch < GOOGLE_JWKS_MIN_REFETCH_SECONDS:
+                return
+        elif _keys and now < _expires_at:
+            return
+        await _fetch_keys()
+
+
+async def _key_for(kid: str):
+    if not _keys or time.monotonic() >= _expires_at:
+        try:
+            await _ensure_keys()
+        except (httpx.HTTPError, ValueError, KeyError):
+            if not _keys:
+                raise
+            # Google unreachable: stale keys beat failing every Google login.
+    key = _keys.get(kid)
+    if key is None:
+        # Google may have rotated ahead of our refresh.
+        _metrics["unknown_kid_refetches"] += 1
+        await _ensure_keys(force=True)
+        key = _keys.get(kid)
+    return key
+
+
+def _decode(token: str, key, audience: str) -> dict:
+    # No access token comes with a sign-in, so at_hash can't be checked (google-auth skips it too).
+    claims = jwt.decode(token, key, algorithms=["RS256"], audience=audience, options={"verify_at_hash": False})
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise JWTError(f"Wrong issuer: {claims.get('iss')}")
+    return claims
+
+
+async def verify_id_token(token: str, audience: str) -> dict:
+    """
+    Returns the token's claims. Raises ValueError for anything invalid, like
+    google.oauth2.id_token.verify_oauth2_token did.
+    """
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError as e:
+        _metrics["rejected"] += 1
+        raise ValueError(str(e))
+
+    try:
+        key = await _key_for(kid)
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        raise ValueError(f"Could not fetch Google signing keys: {e!r}")
+    if key is None:
+        _metrics["rejected"] += 1
+        raise ValueError(f"Unknown signing key: {kid}")
+
+    # RSA verification is CPU work; keep it off the event loop.
+    try:
+        claims = await asyncio.to_thread(_decode, token, key, audience)
+    except JWTError as e:
+        _metrics["rejected"] += 1
+        raise ValueError(str(e))
+
+    _metrics["verified"] += 1
+    return claims
+
+
+# =====================
+# BACKGROUND REFRESH
+# =====================
+async def _run():
+    retry = 1.0
+    while True:
+        try:
+            # Refresh ahead of expiry; the cached keys stay in use until this succeeds.
+            async with _fetch_lock:
+                await _fetch_keys()
+            retry = 1.0
+            ttl = _expires_at - time.monotonic()
+            await asyncio.sleep(max(1.0, ttl * (1 - GOOGLE_JWKS_REFRESH_MARGIN)))
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            print(f"[google-keys] refresh failed, retrying in {retry:.0f}s: {e!r}")
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, 300.0)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task, _client
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def stats() -> dict:
+    return {
+        **_metrics,
+        "kids": sorted(_keys),
+        "expires_in_s": round(_expires_at - time.monotonic(), 1) if _keys else None,
+    }
@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import ARGON2_HASH, ARGON2_QUEUE_WAIT, ARGON2_VERIFY
+from ustils import spans
+from ustils.percentiles import percentiles
+from ustils.security import hash_password, verify_password
+
+# =====================
+# Pool configuration
+# =====================
+# Argon2 only partly releases the GIL, so hashing runs in worker processes.
+# HASH_POOL_WORKERS=0 falls back to an in-process thread pool (local dev / benchmarks).
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+HASH_TIMEOUT_SECONDS = float(os.getenv("HASH_TIMEOUT_SECONDS", "5"))
+
+_executor = None
+_pending = 0
+_queue_waits = deque(maxlen=1024)
+_dummy_hash_job = None
+_counters = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "timeouts": 0,
+}
+
+
+_HISTOGRAMS = {"hash": ARGON2_HASH, "verify": ARGON2_VERIFY}
+
+
+class HashingBusyError(Exception):
+    pass
+
+
+# Run inside the worker: report when the job actually started and how long the
+# Argon2 work took, so the caller can tell queue wait apart from hashing time.
+def _timed_hash(password: str):
+    started_at = time.time()
+    start = time.perf_counter()
+    result = hash_password(password)
+    return started_at, time.perf_counter() - start, result
+
+
+def _timed_verify(password: str, hashed: str):
+    started_at = time.time()
+    start = time.perf_counter()
+    result = verify_password(password, hashed)
+    return started_at, time.perf_counter() - start, result
+
+
+def start():
+    """Creates the worker pool up front so the first login doesn't pay process spawn cost."""
+    global _executor, _dummy_hash_job
+    if _executor is None:
+        if HASH_POOL_WORKERS > 0:
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(thread_name_prefix="argon2")
+    if _dummy_hash_job is None:
+        # The hash dummy_verify checks against, made once in the pool at startup.
+        _dummy_hash_job = _executor.submit(hash_password, secrets.token_urlsafe(16))
+    return _executor
+
+
+def shutdown():
+    global _executor, _dummy_hash_job
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _dummy_hash_job = None
+
+
+def _decrement_pending():
+    global _pending
+    _pending -= 1
+
+
+def _release(loop):
+    # Done-callbacks run on the pool's thread; the counter belongs to the loop.
+    try:
+        loop.call_soon_threadsafe(_decrement_pending)
+    except RuntimeError:
+        pass    # loop already closed (shutdown)
+
+
+async def _submit(fn, op: str, *args):
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        _counters["rejected"] += 1
+        raise HashingBusyError("Password hashing queue is full")
+
+    _pending += 1
+    _counters["submitted"] += 1
+    submitted_at = time.time()
+    loop = asyncio.get_running_loop()
+    try:
+        job = start().submit(fn, *args)
+    except Exception:
+        _pending -= 1
+        raise
+    # The slot is held until the pool is done with the job, not until the caller
+    # stops waiting: a job that timed out while running still occupies a worker.
+    # Giving up on a job that is still queued cancels it, which frees it at once.
+    job.add_done_callback(lambda _: _release(loop))
+    try:
+        started_at, duration, result = await asyncio.wait_for(asyncio.wrap_future(job), HASH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _counters["timeouts"] += 1
+        raise HashingBusyError("Password hashing timed out")
+
+    queue_wait = max(0.0, started_at - submitted_at)
+    _queue_waits.append(queue_wait)
+    ARGON2_QUEUE_WAIT.observe(queue_wait)
+    _HISTOGRAMS[op].observe(duration)
+    spans.add(f"argon2.{op}", time.time() - submitted_at)
+    _counters["completed"] += 1
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit(_timed_hash, "hash", password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _submit(_timed_verify, "verify", password, hashed)
+
+
+async def dummy_verify(password: str):
+    """The Argon2 work of a failed verify, for logins that matched no user."""
+    start()
+    dummy_hash = await asyncio.wrap_future(_dummy_hash_job)
+    await verify_password_async(password, dummy_hash)
+
+
+def stats() -> dict:
+    wait_p50, wait_p99 = percentiles(_queue_waits, 0.50, 0.99, scale=1000, ndigits=3)
+    return {
+        **_counters,
+        "pending": _pending,
+        "workers": HASH_POOL_WORKERS,
+        "queue_wait_p50_ms": wait_p50,
+        "queue_wait_p99_ms": wait_p99,
+    }
@@ -1,13 +1,14 @@
 from datetime import datetime
-import asyncio
 
-from services.email_services import send_password_reset_otp
+from services.email_outbox import queue_email
 from db.user_repo import (
     get_user_by_email,
     get_user_by_sidhi_id,
     set_reset_otp,
     increment_otp_attempts,
-    clear_reset_otp
+    clear_reset_otp,
+    set_password_hash,
+    RESET_FIELDS
 )
 from ustils.otp import (
     generate_otp,
@@ -15,8 +16,7 @@ from ustils.otp import (
     otp_expiry_time,
     MAX_OTP_ATTEMPTS
 )
-from ustils.security import hash_password
-from database import db
+from services.password_hasher import hash_password_async
 
 
 class PasswordResetError(Exception):
@@ -40,17 +40,19 @@ async def request_password_reset(identifier: str):
     otp = generate_otp()
     otp_hash = hash_otp(otp)
 
+    expires_at = otp_expiry_time()
     await set_reset_otp(
         user_id=user["user_id"],
         otp_hash=otp_hash,
-        expires_at=otp_expiry_time()
+        expires_at=expires_at
     )
 
-    # Send OTP asynchronously (email always from DB)
-    await asyncio.to_thread(
-        send_password_reset_otp,
+    # Queue OTP email (email always from DB)
+    await queue_email(
+        "password_reset_otp",
         user["email"],
-        otp
+        {"otp": otp},
+        expires_at=expires_at
     )
 
 
@@ -58,11 +60,11 @@ async def request_password_reset(identifier: str):
 # RESET PASSWORD
 # =========================
 async def reset_password(identifier: str, otp: str, new_password: str):
-    # Resolve user again
+    # Resolve user again, with the OTP state (uncached)
     if identifier.endswith("@sidhilynx.id"):
-        user = await get_user_by_sidhi_id(identifier)
+        user = await get_user_by_sidhi_id(identifier, fields=RESET_FIELDS)
     else:
-        user = await get_user_by_email(identifier)
+        user = await get_user_by_email(identifier, fields=RESET_FIELDS)
 
     if not user or not user.get("reset_otp_hash"):
         raise PasswordResetError("Invalid OTP or expired")
@@ -80,9 +82,6 @@ async def reset_password(identifier: str, otp: str, new_password: str):
         raise PasswordResetError("Invalid OTP")
 
     # OTP valid → reset password
-    await db.users.update_one(
-        {"user_id": user["user_id"]},
-        {"$set": {"password_hash": hash_password(new_password)}}
-    )
+    await set_password_hash(user["user_id"], await hash_password_async(new_password))
 
     await clear_reset_otp(user["user_id"])
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from datetime import datetime, timezone
+
+from db.user_repo import get_pending_registration
+from models.users import UserRegister
+from services.auth_services import AuthError, register_user
+from ustils.lru import LRUCache
+
+# =====================
+# Registration admission
+# =====================
+# register_user costs an Argon2 hash and an email. Repeat submissions for the
+# same address are settled here first, using only memory and one indexed read.
+REGISTER_RESEND_COOLDOWN_SECONDS = int(os.getenv("REGISTER_RESEND_COOLDOWN_SECONDS", "60"))
+REGISTER_RECENT_CACHE_SIZE = int(os.getenv("REGISTER_RECENT_CACHE_SIZE", "10000"))
+
+
+class RegistrationThrottled(AuthError):
+    def __init__(self, retry_after: int):
+        super().__init__(f"An OTP was sent recently. Try again in {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+# email -> (issued_at, request fingerprint, response) for registrations this worker admitted.
+_recent = LRUCache(maxsize=REGISTER_RECENT_CACHE_SIZE, ttl=REGISTER_RESEND_COOLDOWN_SECONDS)
+_inflight = {}
+# Fingerprints only live in this process's memory; the random key keeps them useless elsewhere.
+_fingerprint_key = os.urandom(32)
+_metrics = {
+    "admitted": 0,
+    "joined_inflight": 0,
+    "deduplicated": 0,
+    "shed_cooldown": 0,
+    "shed_pending": 0,
+}
+
+
+def _fingerprint(data: UserRegister) -> bytes:
+    raw = "\0".join([data.email.lower(), data.username, data.password]).encode()
+    return hmac.new(_fingerprint_key, raw, hashlib.sha256).digest()
+
+
+def _retry_after(issued_at: float) -> int:
+    return max(1, int(issued_at + REGISTER_RESEND_COOLDOWN_SECONDS - time.time()))
+
+
+async def _admit(email: str, data: UserRegister, fingerprint: bytes, ip_address: str):
+    # Another worker may have sent an OTP for this address moments ago.
+    pending = await get_pending_registration(data.email)
+    if pending and pending["otp_expires"] > datetime.utcnow():
+        issued_at = pending["created_at"].replace(tzinfo=timezone.utc).timestamp()
+        if time.time() - issued_at < REGISTER_RESEND_COOLDOWN_SECONDS:
+            _metrics["shed_pending"] += 1
+            raise RegistrationThrottled(_retry_after(issued_at))
+
+    _metrics["admitted"] += 1
+    response = await register_user(data, ip_address=ip_address)
+    _recent.set(email, (time.time(), fingerprint, response))
+    return response
+
+
+async def admit_registration(data: UserRegister, ip_address: str = None):
+    """
+    Front door for register_user:
+    - concurrent requests for the same email share one execution;
+    - an identical resubmission inside the cooldown gets the earlier answer;
+    - anything else inside the cooldown, or while another worker's OTP is
+      younger than the cooldown, is shed with RegistrationThrottled.
+    """
+    email = data.email.lower()
+    fingerprint = _fingerprint(data)
+
+    running = _inflight.get(email)
+    if running is not None:
+        _metrics["joined_inflight"] += 1
+        return await asyncio.shield(running)
+
+    recent = _recent.get(email)
+    if recent is not None:
+        issued_at, recent_fingerprint, response = recent
+        if hmac.compare_digest(recent_fingerprint, fingerprint):
+            _metrics["deduplicated"] += 1
+            return response
+        _metrics["shed_cooldown"] += 1
+        raise RegistrationThrottled(_retry_after(issued_at))
+
+    task = asyncio.ensure_future(_admit(email, data, fingerprint, ip_address))
+    _inflight[email] = task
+    try:
+        return await asyncio.shield(task)
+    finally:
+        if _inflight.get(email) is task:
+            del _inflight[email]
+
+
+def stats() -> dict:
+    return {**_metrics, "inflight": len(_inflight), "recent": len(_recent)}
@@ -1,50 +1,119 @@
 import hashlib
+import hmac
+import os
+import secrets
 from datetime import datetime, timedelta
 
-from auth_utils import create_access_token
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from ustils import spans
+from services.client_revocations import is_revoked
+from auth_utils import create_access_token, decode_access_token_cached
 from db.token_repo import (
     save_refresh_token,
     get_refresh_token,
+    get_refresh_token_by_id,
+    rotate_refresh_token,
     delete_refresh_token
 )
 
 REFRESH_TOKEN_DAYS = 30
+ACCESS_TOKEN_MINUTES = 300
+
+# Issue a fresh refresh secret on every refresh; the old one stops working.
+REFRESH_TOKEN_ROTATION = os.getenv("REFRESH_TOKEN_ROTATION", "0") == "1"
+# Pre-rotation user_id.client_id.timestamp tokens; switch off once they have all expired.
+REFRESH_ACCEPT_LEGACY = os.getenv("REFRESH_ACCEPT_LEGACY", "1") == "1"
+# Upper bound on how long a gateway may cache an introspection answer. An "active"
+# answer goes stale as soon as the client is revoked, so this is how long a revoked
+# device can keep using its token at that gateway. 0 means until exp (no revocation).
+INTROSPECT_MAX_CACHE_SECONDS = int(os.getenv("INTROSPECT_MAX_CACHE_SECONDS", "30"))
 
 
 def _hash_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
+def _new_secret() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def _format_refresh_token(record_id: ObjectId, secret: str) -> str:
+    # <record _id>.<256-bit secret>: the id addresses the record, the secret proves possession.
+    return f"{record_id}.{secret}"
+
+
+def _parse_refresh_token(token: str):
+    record_id, sep, secret = token.partition(".")
+    if not sep or len(record_id) != 24:
+        return None, None
+    try:
+        return ObjectId(record_id), secret
+    except InvalidId:
+        return None, None
+
+
+def _access_token(user_id: str, client_id: str, scopes: list[str]) -> str:
+    return create_access_token(
+        data={
+            "sub": user_id,
+            "cid": client_id,      # 🔒 BIND TO CLIENT
+            "scope": scopes
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    )
+
+
+@spans.timed("issue_tokens")
 async def issue_tokens(
     user_id: str,
     client_id: str,
     scopes: list[str]
 ):
     # ---- Access Token ----
-    access_token = create_access_token(
-    data={
-        "sub": user_id,
-        "cid": client_id,      # 🔒 BIND TO CLIENT
-        "scope": scopes
-    },
-    expires_delta=timedelta(minutes=300)
-)
-
+    access_token = _access_token(user_id, client_id, scopes)
 
     # ---- Refresh Token ----
-    refresh_raw = f"{user_id}.{client_id}.{datetime.utcnow().timestamp()}"
-    refresh_hash = _hash_token(refresh_raw)
+    record_id = ObjectId()
+    secret = _new_secret()
 
     await save_refresh_token(
+        record_id=record_id,
         user_id=user_id,
         client_id=client_id,
-        token_hash=refresh_hash,
+        token_hash=_hash_token(secret),
+        scopes=scopes,
         expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS)
     )
 
     return {
         "access_token": access_token,
-        "refresh_token": refresh_raw,
+        "refresh_token": _format_refresh_token(record_id, secret),
+        "token_type": "bearer"
+    }
+
+
+async def discard_tokens(tokens: dict):
+    """Deletes the refresh token of an issue_tokens result that was never handed out."""
+    record_id, secret = _parse_refresh_token(tokens["refresh_token"])
+    if record_id is not None:
+        await delete_refresh_token(_hash_token(secret))
+
+
+async def _refresh_legacy(refresh_token: str, client_id: str):
+    from db.client_repo import is_client_active
+
+    record = await get_refresh_token(_hash_token(refresh_token))
+    if not record or record["client_id"] != client_id:
+        return None
+    if record["expires_at"] <= datetime.utcnow():
+        return None
+    if not await is_client_active(client_id, record["user_id"]):
+        return None
+
+    return {
+        "access_token": _access_token(record["user_id"], client_id, record.get("scope", ["default"])),
         "token_type": "bearer"
     }
 
@@ -53,29 +122,87 @@ async def refresh_access_token(
     refresh_token: str,
     client_id: str
 ):
-    token_hash = _hash_token(refresh_token)
-    record = await get_refresh_token(token_hash)
-
+    """
+    One indexed read: the record is fetched by _id and carries the client's
+    status, so there is no secondary lookup and no join against clients.
+    A token inserted while its device was being revoked missed that status
+    update; the in-process revocation set catches it without a read.
+    """
+    record_id, secret = _parse_refresh_token(refresh_token)
+    if record_id is None:
+        return await _refresh_legacy(refresh_token, client_id) if REFRESH_ACCEPT_LEGACY else None
+
+    record = await get_refresh_token_by_id(record_id)
     if not record:
         return None
 
-    # 🔒 Client binding enforcement
-    from db.client_repo import is_client_active
+    token_hash = _hash_token(secret)
+    if not hmac.compare_digest(token_hash, record["token_hash"]):
+        return None
 
+    # 🔒 Client binding enforcement
     if record["client_id"] != client_id:
         return None
-
-    if not await is_client_active(client_id, record["user_id"]):
+    if record.get("client_status") != "active" or is_revoked(client_id, record["user_id"]):
+        return None
+    if record["expires_at"] <= datetime.utcnow():
         return None
 
+    scopes = record.get("scope", ["default"])
+    result = {
+        "access_token": _access_token(record["user_id"], client_id, scopes),
+        "token_type": "bearer"
+    }
 
-    # Optional: rotate refresh token later (not now)
-
-    return create_access_token(
-    data={
-        "sub": record["user_id"],
-        "cid": client_id,
-        "scope": record.get("scope", ["default"])
-    },
-    expires_delta=timedelta(minutes=300)
-)
+    if REFRESH_TOKEN_ROTATION:
+        new_secret = _new_secret()
+        rotated = await rotate_refresh_token(
+            record_id,
+            old_hash=token_hash,
+            new_hash=_hash_token(new_secret),
+            expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS)
+        )
+        if not rotated:
+            # A concurrent refresh already spent this secret.
+            return None
+        result["refresh_token"] = _format_refresh_token(record_id, new_secret)
+
+    return result
+
+
+async def introspect_tokens(tokens: list[str]) -> list[dict]:
+    """
+    Validates a batch of access tokens. Signatures are checked locally (through
+    the verified-payload cache); client status for every token comes from one
+    $in query on clients.
+    """
+    from db.client_repo import get_link_statuses
+
+    payloads = [decode_access_token_cached(token) for token in tokens]
+    client_ids = list({p["cid"] for p in payloads if p and p.get("cid")})
+    statuses = await get_link_statuses(client_ids) if client_ids else {}
+
+    now = int(datetime.utcnow().timestamp())
+    results = []
+    for payload in payloads:
+        if not payload or not payload.get("cid"):
+            results.append({"active": False})
+            continue
+
+        client_status = statuses.get((payload["cid"], payload["sub"]), "unknown")
+        # Never past exp; an "active" answer can turn revoked at any moment,
+        # so it is only good for INTROSPECT_MAX_CACHE_SECONDS.
+        cache_ttl = max(0, int(payload["exp"]) - now)
+        if INTROSPECT_MAX_CACHE_SECONDS:
+            cache_ttl = min(cache_ttl, INTROSPECT_MAX_CACHE_SECONDS)
+
+        results.append({
+            "active": client_status == "active",
+            "sub": payload["sub"],
+            "cid": payload["cid"],
+            "scope": payload.get("scope", []),
+            "exp": payload["exp"],
+            "client_status": client_status,
+            "cache_ttl": cache_ttl
+        })
+    return results
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from ustils import disposable_email, geo
+
+# Heavy dependencies are loaded lazily; this preloads them off the event loop
+# right after startup so the first real request doesn't pay for it.
+_LOADERS = {
+    "geoip": geo.warm_up,
+    "disposable_domains": disposable_email.warm_up,
+}
+
+_ready = False
+timings = {}
+
+
+async def _load(name: str, loader):
+    start = time.perf_counter()
+    await asyncio.to_thread(loader)
+    timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def warm_up():
+    global _ready
+    results = await asyncio.gather(
+        *[_load(name, loader) for name, loader in _LOADERS.items()],
+        return_exceptions=True
+    )
+    failures = [(name, r) for name, r in zip(_LOADERS, results) if isinstance(r, Exception)]
+    for name, error in failures:
+        print(f"[warmup] {name} failed: {error!r}")
+
+    # Lazy loaders still work on first use, but don't report ready with a broken dependency.
+    _ready = not failures
+
+
+def is_ready() -> bool:
+    return _ready
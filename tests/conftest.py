@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app imports its modules from the repository root (python main.py / uvicorn main:app).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("REPOSITORY_BACKEND", "memory")
+os.environ.setdefault("HASH_POOL_WORKERS", "0")
+os.environ.pop("MONGO_URI", None)
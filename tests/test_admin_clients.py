@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db import repository
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = repository.create("memory")
+    monkeypatch.setattr(repository, "_backend", backend)
+    monkeypatch.setenv("ADMIN_API_KEY", "admin-key")
+    for i in range(5):
+        asyncio.run(backend.clients.create_client(f"C{i}", "U1", "android", "app", "App", "1", "127.0.0.1", "00" * 32))
+    return backend
+
+
+@pytest.fixture
+def client(backend):
+    return TestClient(main.app)
+
+
+def test_unknown_and_operator_fields_are_rejected(client):
+    for fields in ("status,$where", "location_last_seen.country_code", "password_hash"):
+        response = client.get("/admin/clients/", params={"fields": fields}, headers={"X-Admin-Key": "admin-key"})
+        assert response.status_code == 400
+
+
+def test_pages_are_stable_while_clients_are_active(client, backend):
+    headers = {"X-Admin-Key": "admin-key"}
+    first = client.get("/admin/clients/", params={"limit": 2, "fields": "client_id"}, headers=headers).json()
+
+    # Every device logs in again between pages.
+    for i in range(5):
+        asyncio.run(backend.clients.update_client_activity(f"C{i}", "127.0.0.2", "U1"))
+
+    seen = [item["client_id"] for item in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get("/admin/clients/", params={"limit": 2, "fields": "client_id", "cursor": cursor},
+                          headers=headers).json()
+        seen += [item["client_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+
+    assert sorted(seen) == [f"C{i}" for i in range(5)]
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+# pymongo has no public getter for the active client-side timeout.
+from pymongo import _csot
+
+import database
+import main
+from api.v1 import admin_clients
+from metrics import timed_db
+
+
+@pytest.fixture
+def short_deadline(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_MAX_TIME_MS", 50)
+
+
+def test_client_has_no_global_timeout(monkeypatch, short_deadline):
+    monkeypatch.setattr(database, "MONGO_URI", "mongodb://localhost:1")
+    monkeypatch.setattr(database, "client", None)
+    database.connect()
+    try:
+        assert database.client.options.timeout is None
+    finally:
+        database.close()
+
+
+def test_repository_calls_run_under_the_deadline(short_deadline):
+    @timed_db
+    async def lookup():
+        return _csot.get_timeout()
+
+    assert asyncio.run(lookup()) == pytest.approx(0.05, abs=0.01)
+
+
+class _SlowCursor:
+    """Streams rows more slowly, in total, than the per-operation deadline."""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.deadlines = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if len(self.deadlines) == self.rows:
+            raise StopAsyncIteration
+        await asyncio.sleep(0.02)
+        self.deadlines.append(_csot.get_timeout())
+        return {"_id": len(self.deadlines), "client_id": f"C{len(self.deadlines)}"}
+
+
+def test_long_export_completes(monkeypatch, short_deadline):
+    monkeypatch.setenv("ADMIN_API_KEY", "admin-key")
+    cursor = _SlowCursor(rows=10)
+    monkeypatch.setattr(admin_clients, "find_clients", lambda *args, **kwargs: cursor)
+
+    response = TestClient(main.app).get("/admin/clients/export", headers={"X-Admin-Key": "admin-key"})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["client_id"] for row in rows] == [f"C{i}" for i in range(1, 11)]
+    assert cursor.deadlines == [None] * 10
@@ -0,0 +1,54 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from db import repository
+from services import email_outbox
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    backend = repository.create("memory")
+    monkeypatch.setattr(repository, "_backend", backend)
+    monkeypatch.setattr(email_outbox, "_breaker", email_outbox.CircuitBreaker(threshold=2, cooldown=30))
+    return backend.outbox
+
+
+def _dispatch(outbox, status: int):
+    async def run():
+        email_outbox._client = httpx.AsyncClient(
+            base_url="https://brevo.test",
+            transport=httpx.MockTransport(lambda request: httpx.Response(status, json={}))
+        )
+        try:
+            await email_outbox.queue_email(
+                "password_reset_otp", "a@example.com", {"otp": "123456"},
+                expires_at=datetime.utcnow() + timedelta(minutes=10)
+            )
+            await email_outbox._deliver(await outbox.claim_batch(10, lease_seconds=60))
+        finally:
+            await email_outbox._client.aclose()
+            email_outbox._client = None
+    asyncio.run(run())
+    return list(outbox._messages.values())
+
+
+def test_rejected_api_key_is_retried_and_trips_the_breaker(outbox):
+    for _ in range(2):
+        messages = _dispatch(outbox, 401)
+
+    assert all(m["status"] == "pending" and m["params"] for m in messages)
+    assert email_outbox._breaker.state == "open"
+
+
+def test_dead_message_drops_its_otp(outbox):
+    (message,) = _dispatch(outbox, 400)
+
+    assert message["status"] == "dead"
+    assert "params" not in message
+
+
+def test_sent_message_is_deleted(outbox):
+    assert _dispatch(outbox, 201) == []
@@ -0,0 +1,44 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+from benchmarks.google_jwks_stub import start_stub
+from services import google_id_token
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = start_stub()
+    monkeypatch.setattr(google_id_token, "GOOGLE_JWKS_URL", server.url)
+    monkeypatch.setattr(google_id_token, "_keys", {})
+    monkeypatch.setattr(google_id_token, "_expires_at", 0.0)
+    monkeypatch.setattr(google_id_token, "_fetch_lock", asyncio.Lock())
+    yield server
+    server.shutdown()
+
+
+def _verify(token: str, audience: str = "stub-client-id") -> dict:
+    async def run():
+        try:
+            return await google_id_token.verify_id_token(token, audience)
+        finally:
+            await google_id_token.stop()
+    return asyncio.run(run())
+
+
+def test_accepts_token_with_at_hash(stub):
+    # Google adds at_hash when the sign-in also issued an access token we never see.
+    digest = hashlib.sha256(b"some-access-token").digest()[:16]
+    at_hash = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+    token = stub.mint({"email": "a@example.com", "at_hash": at_hash})
+
+    assert _verify(token)["email"] == "a@example.com"
+
+
+def test_rejects_wrong_audience(stub):
+    token = stub.mint({"email": "a@example.com"}, audience="someone-else")
+
+    with pytest.raises(ValueError):
+        _verify(token)
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+import metrics
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_SCRAPE_TOKEN", "scrape-token")
+    return TestClient(main.app)
+
+
+def test_scrape_exports_service_gauges():
+    body = metrics.render().decode()
+
+    for name in (
+        "mongo_pool_checkout_wait_p50_ms",
+        "mongo_pool_checkout_wait_p99_ms",
+        "revocation_event_lag_ms",
+        'registration_admission_outcomes{outcome="shed_cooldown"}',
+        'registration_admission_outcomes{outcome="deduplicated"}',
+    ):
+        assert name in body
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": "Bearer café".encode()}])
+def test_scrape_requires_the_token(client, headers):
+    assert client.get("/metrics", headers=headers).status_code == 401
+
+
+def test_requests_move_the_route_histogram(client):
+    labels = {"route": "/admin/clients/", "method": "GET"}
+    before = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+
+    assert client.get("/admin/clients/", headers={"X-Admin-Key": "wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+
+    assert response.status_code == 200
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) == before + 1
+    assert 'http_requests_total{method="GET",route="/admin/clients/",status="4xx"}' in response.text
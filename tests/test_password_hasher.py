@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from services import password_hasher
+
+
+def _blocking(release: threading.Event):
+    release.wait(5)
+    return time.time(), 0.0, True
+
+
+@pytest.fixture
+def single_worker(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    dummy_hash = Future()
+    dummy_hash.set_result("unused")
+    monkeypatch.setattr(password_hasher, "_executor", executor)
+    monkeypatch.setattr(password_hasher, "_dummy_hash_job", dummy_hash)
+    monkeypatch.setattr(password_hasher, "_pending", 0)
+    monkeypatch.setattr(password_hasher, "HASH_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(password_hasher, "HASH_MAX_PENDING", 2)
+    yield
+    executor.shutdown(wait=True)
+
+
+def test_timed_out_job_keeps_its_slot_until_the_pool_finishes_it(single_worker):
+    release = threading.Event()
+
+    async def run():
+        # Occupies the only worker past the timeout.
+        with pytest.raises(password_hasher.HashingBusyError):
+            await password_hasher._submit(_blocking, "verify", release)
+        await asyncio.sleep(0)
+        running = password_hasher.stats()["pending"]
+
+        # Queued behind it: the timeout cancels it, so its slot comes back at once.
+        with pytest.raises(password_hasher.HashingBusyError):
+            await password_hasher._submit(_blocking, "verify", release)
+        await asyncio.sleep(0)
+        after_queued = password_hasher.stats()["pending"]
+
+        release.set()
+        for _ in range(100):
+            if password_hasher.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return running, after_queued, password_hasher.stats()["pending"]
+
+    assert asyncio.run(run()) == (1, 1, 0)
+
+
+def test_admission_counts_jobs_still_running_after_a_timeout(single_worker, monkeypatch):
+    monkeypatch.setattr(password_hasher, "HASH_MAX_PENDING", 1)
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(password_hasher.HashingBusyError, match="timed out"):
+            await password_hasher._submit(_blocking, "verify", release)
+        # The pool is still working on it, so there is no room for another job.
+        with pytest.raises(password_hasher.HashingBusyError, match="full"):
+            await password_hasher._submit(_blocking, "verify", release)
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
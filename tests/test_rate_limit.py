@@ -0,0 +1,38 @@
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+import rate_limit
+from rate_limit import PrefilteredRateLimiter
+
+
+def test_app_limiter_uses_the_prefilter():
+    assert isinstance(rate_limit.limiter.limiter, PrefilteredRateLimiter)
+
+
+def test_prefilter_answers_floods_locally():
+    storage = MemoryStorage()
+    limiter = PrefilteredRateLimiter(storage)
+    item = parse("3/minute")
+    before = dict(rate_limit.rejections)
+
+    assert [limiter.hit(item, "flood") for _ in range(5)] == [True, True, True, False, False]
+    assert rate_limit.rejections["prefilter"] - before["prefilter"] == 2
+    assert rate_limit.rejections["shared"] == before["shared"]
+
+
+def test_shared_rejection_does_not_spend_the_local_bucket():
+    storage = MemoryStorage()
+    limiter = PrefilteredRateLimiter(storage)
+    item = parse("3/minute")
+    # Another worker has already used the shared allowance.
+    other_worker = SlidingWindowCounterRateLimiter(storage)
+    for _ in range(3):
+        assert other_worker.hit(item, "busy")
+    before = dict(rate_limit.rejections)
+
+    assert not any(limiter.hit(item, "busy") for _ in range(10))
+    # Every rejection came from the shared store: the bucket was refunded each time
+    # rather than draining below the shared allowance.
+    assert rate_limit.rejections["shared"] - before["shared"] == 10
+    assert rate_limit.rejections["prefilter"] == before["prefilter"]
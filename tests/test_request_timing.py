@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TIMING_KEY", "timing-key")
+    # No lifespan: the middleware doesn't need the background services.
+    return TestClient(main.app)
+
+
+def test_timing_breakdown_with_key(client):
+    response = client.get("/health/live", headers={"X-Debug-Timing": "timing-key"})
+
+    assert response.status_code == 200
+    assert "Server-Timing" in response.headers
+
+
+def test_non_ascii_timing_header_is_ignored(client):
+    response = client.get("/health/live", headers={"X-Debug-Timing": "café".encode()})
+
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from db import telemetry_buffer
+
+
+class _Collection:
+    def __init__(self, error=None):
+        self.error = error
+        self.writes = []
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.error:
+            raise self.error
+        self.writes.extend(ops)
+
+
+@pytest.fixture
+def spill_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "telemetry.spill")
+    monkeypatch.setattr(telemetry_buffer, "TELEMETRY_SPILL_PATH", path)
+    return path
+
+
+def _entries(collection, n):
+    return [(collection, {"user_id": f"U{i}"}, {"$push": {"login_history": i}}, False) for i in range(n)]
+
+
+def test_only_failed_collection_is_spilled(spill_path, monkeypatch):
+    users, clients = _Collection(), _Collection(AutoReconnect("down"))
+    monkeypatch.setattr(telemetry_buffer, "db", {"users": users, "clients": clients})
+    telemetry_buffer._pending.extend(_entries("users", 3) + _entries("clients", 2))
+
+    asyncio.run(telemetry_buffer._flush_once())
+
+    assert len(users.writes) == 3
+    assert [c for c, *_ in telemetry_buffer._take_spill()] == ["clients", "clients"]
+
+
+def test_bulk_write_error_spills_only_failed_ops(spill_path, monkeypatch):
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}], "writeConcernErrors": []})
+    monkeypatch.setattr(telemetry_buffer, "db", {"users": _Collection(error)})
+    telemetry_buffer._pending.extend(_entries("users", 3))
+
+    asyncio.run(telemetry_buffer._flush_once())
+
+    assert [f["user_id"] for _, f, _, _ in telemetry_buffer._take_spill()] == ["U1"]
+
+
+def test_replay_files_of_live_workers_are_left_alone(spill_path):
+    live = f"{spill_path}.{os.getppid()}.replay"
+    telemetry_buffer._spill(_entries("users", 2))
+    os.rename(spill_path, live)
+
+    assert telemetry_buffer._take_spill() == []
+    assert os.path.exists(live)
+
+
+def test_replay_files_of_dead_workers_are_claimed(spill_path):
+    dead_pid = 2 ** 22 + 12345     # above the default pid_max
+    telemetry_buffer._spill(_entries("users", 2))
+    os.rename(spill_path, f"{spill_path}.{dead_pid}.replay")
+
+    assert len(telemetry_buffer._take_spill()) == 2
+    assert telemetry_buffer._take_spill() == []
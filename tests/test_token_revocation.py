@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from db import client_repo, repository
+from services import auth_services, client_revocations, token_service
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = repository.create("memory")
+    monkeypatch.setattr(repository, "_backend", backend)
+    monkeypatch.setattr(client_revocations, "_revoked", set())
+    return backend
+
+
+def test_token_inserted_during_revoke_cannot_refresh(backend, monkeypatch):
+    save = token_service.save_refresh_token
+
+    async def save_after_revoke(**kwargs):
+        # The admin revoke lands between the device check and the token insert.
+        await client_repo.revoke_client("C1")
+        await save(**kwargs)
+
+    monkeypatch.setattr(token_service, "save_refresh_token", save_after_revoke)
+
+    async def run():
+        await backend.clients.create_client("C1", "U1", "android", "app", "App", "1", "127.0.0.1", "00" * 32)
+        client = await backend.clients.get_client_link("C1", "U1")
+        tokens = await auth_services._record_login_and_issue_tokens(
+            user_id="U1", client=client, client_id="C1", public_key="00" * 32, platform="android",
+            app_id="app", app_name="App", app_version="1", ip_address="127.0.0.1"
+        )
+        # The token kept its "active" copy of the status...
+        assert [t["client_status"] for t in backend.tokens._tokens.values()] == ["active"]
+        # ...but once this worker's revocation set has the device, it can't be refreshed.
+        await client_revocations.rebuild()
+        return await token_service.refresh_access_token(tokens["refresh_token"], "C1")
+
+    assert asyncio.run(run()) is None
+
+
+def test_active_device_refreshes(backend):
+    async def run():
+        await backend.clients.create_client("C1", "U1", "android", "app", "App", "1", "127.0.0.1", "00" * 32)
+        client = await backend.clients.get_client_link("C1", "U1")
+        tokens = await auth_services._record_login_and_issue_tokens(
+            user_id="U1", client=client, client_id="C1", public_key="00" * 32, platform="android",
+            app_id="app", app_name="App", app_version="1", ip_address="127.0.0.1"
+        )
+        await client_revocations.rebuild()
+        return await token_service.refresh_access_token(tokens["refresh_token"], "C1")
+
+    assert "access_token" in asyncio.run(run())
+
+
+def test_failed_client_write_leaves_no_refresh_token(backend, monkeypatch):
+    from pymongo.errors import DuplicateKeyError
+
+    async def concurrent_first_login(**kwargs):
+        raise DuplicateKeyError("E11000 duplicate key error collection: clients")
+
+    monkeypatch.setattr(auth_services, "create_client", concurrent_first_login)
+
+    async def run():
+        with pytest.raises(DuplicateKeyError):
+            await auth_services._record_login_and_issue_tokens(
+                user_id="U1", client=None, client_id="C1", public_key="00" * 32, platform="android",
+                app_id="app", app_name="App", app_version="1", ip_address="127.0.0.1"
+            )
+
+    asyncio.run(run())
+
+    assert backend.tokens._tokens == {}
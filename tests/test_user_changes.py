@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from db import repository, user_cache, user_changes, user_filter
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = repository.create("memory")
+    monkeypatch.setattr(repository, "_backend", backend)
+    return backend
+
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+def test_one_stream_feeds_cache_and_filter(backend):
+    user = {"user_id": "U1", "sidhi_id": "a@sidhilynx.id", "email": "a@example.com",
+            "password_hash": "x", "is_active": True}
+
+    async def run():
+        user_changes.start()
+        try:
+            await _settle()
+            assert len(backend.users._watchers) == 1
+            assert user_cache.stats()["mode"] == user_filter.stats()["mode"] == "change_stream"
+
+            # Created "on another worker": straight through the repository.
+            before = user_cache.stats()["remote_invalidations"]
+            await backend.users.create_user(dict(user))
+            await _settle()
+            assert user_filter.might_exist("email", "a@example.com")
+            assert user_cache.stats()["remote_invalidations"] == before + 1
+        finally:
+            await user_changes.stop()
+
+        assert backend.users._watchers == set()
+        assert user_cache.stats()["mode"] == user_filter.stats()["mode"] == "off"
+
+    asyncio.run(run())
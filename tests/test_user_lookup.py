@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from db import repository, user_filter, user_repo
+from services import password_hasher
+from ustils.bloom import BloomFilter
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = repository.create("memory")
+    monkeypatch.setattr(repository, "_backend", backend)
+    return backend
+
+
+def test_filter_miss_waits_like_a_lookup(backend, monkeypatch):
+    monkeypatch.setattr(user_filter, "_filter", BloomFilter(100))
+    monkeypatch.setattr(user_repo, "_fetch_times", [0.05] * 10)
+
+    async def run():
+        start = time.perf_counter()
+        user = await user_repo.get_user_by_sidhi_id("ghost@sidhilynx.id")
+        return user, time.perf_counter() - start
+
+    user, elapsed = asyncio.run(run())
+    assert user is None
+    assert elapsed >= 0.045
+
+
+def test_dummy_verify_only_verifies(monkeypatch):
+    monkeypatch.setattr(password_hasher, "_executor", None)
+    monkeypatch.setattr(password_hasher, "_dummy_hash_job", None)
+
+    async def run():
+        password_hasher.start()
+        before = dict(password_hasher._counters)
+        await password_hasher.dummy_verify("guess")
+        await password_hasher.dummy_verify("guess")
+        return password_hasher._counters["completed"] - before["completed"]
+
+    try:
+        # One verify per miss, the first one included: the hash was made by start().
+        assert asyncio.run(run()) == 2
+    finally:
+        password_hasher.shutdown()
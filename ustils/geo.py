@@ -1,17 +1,140 @@
-from geoip2fast import GeoIP2Fast
+import ipaddress
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from types import MappingProxyType
 
-_geo = GeoIP2Fast()
+from metrics import GEO_LOOKUP
+from ustils import spans
+from ustils.lru import LRUCache
+from ustils.percentiles import percentiles
 
+# Loading the GeoIP database takes a noticeable slice of a cold start, so it
+# happens on first use or from the startup warm-up, not at import.
+_geo = None
+_geo_lock = threading.Lock()
 
-def lookup_location(ip_address: str) -> dict:
-    """Offline IP -> country/city lookup. Never raises; unknown IPs resolve to empty fields."""
+GEO_CACHE_SIZE = int(os.getenv("GEO_CACHE_SIZE", "50000"))
+# Resolve every address in a /24 (IPv4) or /48 (IPv6) from the first lookup.
+# Off by default: it trades city-level precision for hit rate.
+GEO_PREFIX_CACHE = os.getenv("GEO_PREFIX_CACHE", "0") == "1"
+
+_UNKNOWN = MappingProxyType({"country": None, "country_code": None, "city": None, "is_private": None})
+
+# Results are read-only and interned, so every IP in the same place shares one object.
+_interned = {}
+_ip_cache = LRUCache(maxsize=GEO_CACHE_SIZE)
+_prefix_cache = LRUCache(maxsize=GEO_CACHE_SIZE)
+_request_memo = ContextVar("geo_request_memo", default=None)
+_lookup_times = deque(maxlen=2048)
+_memo_hits = 0
+
+
+def _get_geo():
+    global _geo
+    if _geo is None:
+        with _geo_lock:
+            if _geo is None:
+                from geoip2fast import GeoIP2Fast
+                _geo = GeoIP2Fast()
+    return _geo
+
+
+def warm_up():
+    _get_geo()
+
+
+def is_loaded() -> bool:
+    return _geo is not None
+
+
+def start_request_memo():
+    """Scopes a per-request memo so repeated lookups of one IP within a request are free."""
+    return _request_memo.set({})
+
+
+def end_request_memo(token):
+    _request_memo.reset(token)
+
+
+def _intern(country, country_code, city, is_private):
+    key = (country, country_code, city, is_private)
+    result = _interned.get(key)
+    if result is None:
+        result = MappingProxyType({
+            "country": country,
+            "country_code": country_code,
+            "city": city,
+            "is_private": is_private,
+        })
+        _interned[key] = result
+    return result
+
+
+def _prefix_key(ip_address: str):
     try:
-        result = _geo.lookup(ip_address)
-        return {
-            "country": result.country_name or None,
-            "country_code": result.country_code or None,
-            "city": result.city.name or None,
-            "is_private": result.is_private,
-        }
+        packed = ipaddress.ip_address(ip_address).packed
+    except ValueError:
+        return None
+    return packed[:3] if len(packed) == 4 else packed[:6]
+
+
+def _lookup(ip_address: str):
+    start = time.perf_counter()
+    try:
+        result = _get_geo().lookup(ip_address)
+        return _intern(
+            result.country_name or None,
+            result.country_code or None,
+            result.city.name or None,
+            result.is_private,
+        )
     except Exception:
-        return {"country": None, "country_code": None, "city": None, "is_private": None}
+        return _UNKNOWN
+    finally:
+        elapsed = time.perf_counter() - start
+        _lookup_times.append(elapsed)
+        GEO_LOOKUP.observe(elapsed)
+
+
+def lookup_location(ip_address: str):
+    """Offline IP -> country/city lookup. Never raises; unknown IPs resolve to empty fields. The result is read-only."""
+    with spans.span("geo"):
+        return _lookup_location(ip_address)
+
+
+def _lookup_location(ip_address: str):
+    global _memo_hits
+    memo = _request_memo.get()
+    if memo is not None and ip_address in memo:
+        _memo_hits += 1
+        return memo[ip_address]
+
+    result = _ip_cache.get(ip_address)
+    if result is None:
+        prefix = _prefix_key(ip_address) if GEO_PREFIX_CACHE else None
+        if prefix is not None:
+            result = _prefix_cache.get(prefix)
+        if result is None:
+            result = _lookup(ip_address)
+            if prefix is not None:
+                _prefix_cache.set(prefix, result)
+        _ip_cache.set(ip_address, result)
+
+    if memo is not None:
+        memo[ip_address] = result
+    return result
+
+
+def stats() -> dict:
+    lookup_p50, lookup_p99 = percentiles(_lookup_times, 0.50, 0.99, scale=1e6, ndigits=1)
+    return {
+        "memo_hits": _memo_hits,
+        "ip_cache": _ip_cache.stats(),
+        "prefix_cache": _prefix_cache.stats() if GEO_PREFIX_CACHE else None,
+        "interned_results": len(_interned),
+        "lookup_p50_us": lookup_p50,
+        "lookup_p99_us": lookup_p99,
+    }
@@ -0,0 +1,12 @@
+def percentiles(values, *points: float, scale: float = 1.0, ndigits: int = None) -> tuple:
+    """
+    Nearest-rank percentiles of `values` (any iterable, unsorted) at each of
+    `points` (0.5 = median), multiplied by `scale` (e.g. 1000 for seconds ->
+    ms) and optionally rounded. All 0.0 when there are no values.
+    """
+    values = sorted(values)
+    picked = []
+    for point in points:
+        value = values[min(len(values) - 1, int(len(values) * point))] * scale if values else 0.0
+        picked.append(round(value, ndigits) if ndigits is not None else value)
+    return tuple(picked)
@@ -0,0 +1,52 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import time
+
+# =====================
+# Sampled request profiling
+# =====================
+# A sampled (PROFILE_SAMPLE_RATE) or explicitly requested request runs under
+# cProfile and its stats are written to PROFILE_DIR as <time>-<route>-<ms>.prof
+# (open with `python -m pstats` or snakeviz). cProfile hooks the whole event
+# loop thread, so one request is profiled at a time and the capture includes
+# whatever else the loop ran meanwhile; with sampling at 0 and no header this
+# costs a single comparison per request.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/sidhilynx-profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+_active = False
+_written = 0
+
+
+def start(forced: bool = False):
+    """Returns a running profiler if this request should be captured, else None."""
+    global _active
+    if _active or not (forced or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)):
+        return None
+    if _written >= PROFILE_MAX_FILES:
+        return None
+    _active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _dump(profiler: cProfile.Profile, path: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(path)
+
+
+async def finish(profiler: cProfile.Profile, method: str, path: str, seconds: float) -> str:
+    global _active, _written
+    profiler.disable()
+    _active = False
+    _written += 1
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{_SAFE.sub('_', path).strip('_')}-{seconds * 1000:.0f}ms.prof"
+    target = os.path.join(PROFILE_DIR, name)
+    await asyncio.to_thread(_dump, profiler, target)
+    return target
@@ -0,0 +1,177 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+# One counter per slot: key hash, expires_at (epoch seconds), count.
+_SLOT = struct.Struct("<Qdq")
+_PROBE = 16
+_DEFAULT_PATH = "/dev/shm/sidhilynx-ratelimit"
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty slot, so never hand it out as a real hash.
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Rate-limit counters in a fixed-size mmap'd table shared by every worker
+    process on the host (``shm:///dev/shm/<name>``). Operations hold an
+    flock on the file, so each acquire is atomic across workers. When a probe
+    run is full the entry closest to expiry is evicted; limits are best-effort
+    under that kind of pressure rather than unbounded.
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, slots: int = 65536, **_):
+        self.path = urlparse(uri).path if uri else ""
+        self.path = self.path or _DEFAULT_PATH
+        self.slots = int(slots)
+        self._size = self.slots * _SLOT.size
+        self._thread_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    # Opened lazily and per-pid: a forked worker must not share the parent's
+    # open file description, or flock would no longer exclude it.
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self._size:
+                os.ftruncate(fd, self._size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._size)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slot(self, key: str, now: float, create: bool):
+        h = _key_hash(key)
+        start = h % self.slots
+        free, victim, victim_expiry = None, None, float("inf")
+
+        for i in range(_PROBE):
+            idx = (start + i) % self.slots
+            slot_hash, expires_at, _count = _SLOT.unpack_from(self._map, idx * _SLOT.size)
+            if slot_hash == h:
+                return idx, h
+            if slot_hash == 0 or expires_at <= now:
+                if free is None:
+                    free = idx
+            elif expires_at < victim_expiry:
+                victim, victim_expiry = idx, expires_at
+
+        if not create:
+            return None, h
+        idx = free if free is not None else victim
+        _SLOT.pack_into(self._map, idx * _SLOT.size, h, 0.0, 0)
+        return idx, h
+
+    def _read(self, key: str, now: float):
+        idx, _ = self._slot(key, now, create=False)
+        if idx is None:
+            return 0, now
+        _hash, expires_at, count = _SLOT.unpack_from(self._map, idx * _SLOT.size)
+        if expires_at <= now:
+            return 0, now
+        return count, expires_at
+
+    def _add(self, key: str, expiry: float, amount: int, now: float) -> int:
+        idx, h = self._slot(key, now, create=True)
+        _hash, expires_at, count = _SLOT.unpack_from(self._map, idx * _SLOT.size)
+        if expires_at <= now:
+            count, expires_at = 0, now + expiry
+        count = max(count + amount, 0)
+        _SLOT.pack_into(self._map, idx * _SLOT.size, h, expires_at, count)
+        return count
+
+    # ---------- Storage ----------
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        with self._locked():
+            return self._add(key, expiry, amount, time.time())
+
+    def get(self, key: str) -> int:
+        with self._locked():
+            return self._read(key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        with self._locked():
+            return self._read(key, time.time())[1]
+
+    def clear(self, key: str) -> None:
+        with self._locked():
+            idx, _ = self._slot(key, time.time(), create=False)
+            if idx is not None:
+                _SLOT.pack_into(self._map, idx * _SLOT.size, 0, 0.0, 0)
+
+    def check(self) -> bool:
+        try:
+            with self._locked():
+                return True
+        except OSError:
+            return False
+
+    def reset(self):
+        with self._locked():
+            self._map[:] = bytes(self._size)
+        return None
+
+    # ---------- Sliding window ----------
+    def _window(self, key: str, expiry: int, now: float):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._read(previous_key, now)[0]
+        current_count = self._read(current_key, now)[0]
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        with self._locked():
+            now = time.time()
+            previous_count, previous_ttl, current_count, _ = self._window(key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            _, current_key = self.sliding_window_keys(key, expiry, now)
+            self._add(current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int):
+        with self._locked():
+            return self._window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
@@ -0,0 +1,91 @@
+import functools
+import time
+from contextvars import ContextVar
+
+# =====================
+# Per-request span recorder
+# =====================
+# Off unless the request opted in (see main.request_timing); when off, every
+# helper below is one ContextVar read. Tasks spawned with gather/to_thread
+# inherit the same recorder, so concurrent stages all land in one request.
+_recorder = ContextVar("span_recorder", default=None)
+
+
+def start_recording():
+    return _recorder.set({})
+
+
+def stop_recording(token) -> dict:
+    spans = _recorder.get()
+    _recorder.reset(token)
+    return spans or {}
+
+
+def add(name: str, seconds: float):
+    spans = _recorder.get()
+    if spans is None:
+        return
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """`with span("ed25519"):` times a block when the request is being recorded."""
+    return _Span(name) if _recorder.get() is not None else _NO_SPAN
+
+
+def timed(name: str):
+    """Decorator form of span() for coroutines."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _recorder.get() is None:
+                return await fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def server_timing(spans: dict, total_seconds: float) -> str:
+    """Formats spans as a Server-Timing header value, slowest first."""
+    parts = [f"total;dur={total_seconds * 1000:.1f}"]
+    for name, (seconds, count) in sorted(spans.items(), key=lambda item: -item[1][0]):
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    return ", ".join(parts)